@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Scene audio assembly
+Loads the TTS clips of a scene and a background music track once, joins the clips with
+gaps or crossfades, ducks the music under speech and writes the final mix in one pass,
+reporting where each clip landed so subtitles can be shifted onto the mixed timeline
+"""
+
+import os
+import sys
+import json
+import wave
+import subprocess
+
+import numpy as np
+
+MUSIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "background_music")
+
+DEFAULT_GAP_SECONDS = 0.3
+DEFAULT_CROSSFADE_SECONDS = 0.0
+# Same music level as the ffmpeg amix graph in routes/remotion.js
+DEFAULT_MUSIC_VOLUME = 0.3
+# Music gain while someone speaks, relative to DEFAULT_MUSIC_VOLUME
+DEFAULT_DUCK_GAIN = 0.35
+DUCK_ATTACK_SECONDS = 0.08
+DUCK_RELEASE_SECONDS = 0.4
+# Speech is detected on RMS frames of this length above the threshold
+DUCK_FRAME_SECONDS = 0.01
+SPEECH_THRESHOLD_DB = -40.0
+MUSIC_FADE_OUT_SECONDS = 1.5
+PEAK_LIMIT = 0.99
+PIPE_CHUNK_SIZE = 1 << 20
+
+WAV_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+def read_wav(path):
+    """
+    Read a PCM WAV file into float samples with the wave module
+
+    Args:
+        path (str): WAV file path
+
+    Returns:
+        tuple: (float32 array of shape (frames, channels) in [-1, 1], sample rate)
+    """
+    with wave.open(path, "rb") as f:
+        channels = f.getnchannels()
+        sample_width = f.getsampwidth()
+        sample_rate = f.getframerate()
+        data = f.readframes(f.getnframes())
+
+    if sample_width not in WAV_SAMPLE_TYPES:
+        raise ValueError(f"Unsupported WAV sample width: {sample_width * 8} bit")
+    samples = np.frombuffer(data, dtype=WAV_SAMPLE_TYPES[sample_width]).astype(np.float32)
+    if sample_width == 1:
+        samples = (samples - 128.0) / 128.0
+    else:
+        samples /= float(1 << (sample_width * 8 - 1))
+    return samples.reshape(-1, channels), sample_rate
+
+def decode_audio(path, sample_rate, channels):
+    """
+    Decode any format ffmpeg understands (MP3 music, ...) through a raw f32le pipe
+
+    Args:
+        path (str): Audio file path
+        sample_rate (int): Output sample rate
+        channels (int): Output channel count
+
+    Returns:
+        numpy.ndarray: float32 samples of shape (frames, channels)
+    """
+    process = subprocess.Popen([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(sample_rate), "pipe:"
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    buffer = bytearray()
+    while True:
+        chunk = process.stdout.read(PIPE_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg could not decode {path}: {stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(buffer, dtype=np.float32).reshape(-1, channels)
+
+def resample(samples, source_rate, target_rate):
+    """Linear-interpolation resampling, enough for speech clips that differ from the mix rate"""
+    if source_rate == target_rate or not len(samples):
+        return samples
+    frames = int(round(len(samples) * target_rate / float(source_rate)))
+    source_positions = np.arange(len(samples), dtype=np.float64)
+    target_positions = np.linspace(0, len(samples) - 1, frames)
+    return np.stack([
+        np.interp(target_positions, source_positions, samples[:, channel]).astype(np.float32)
+        for channel in range(samples.shape[1])
+    ], axis=1)
+
+def match_channels(samples, channels):
+    """Downmix to mono by averaging, or duplicate mono into every output channel"""
+    if samples.shape[1] == channels:
+        return samples
+    mono = samples.mean(axis=1, keepdims=True)
+    return np.repeat(mono, channels, axis=1) if channels > 1 else mono
+
+def load_clip(path, sample_rate=None, channels=None):
+    """
+    Load an audio file as float samples in the mix format
+
+    WAV files (everything the TTS engines write) are read with the wave module; other
+    formats are decoded by ffmpeg straight to the target rate.
+
+    Args:
+        path (str): Audio file path
+        sample_rate (int): Target sample rate (default: the file's own rate; required for non-WAV)
+        channels (int): Target channel count (default: the file's own channel count)
+
+    Returns:
+        tuple: (float32 array of shape (frames, channels), sample rate)
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Audio file not found: {path}")
+
+    try:
+        samples, source_rate = read_wav(path)
+    except (wave.Error, EOFError, ValueError):
+        if not sample_rate:
+            raise ValueError(f"A sample rate is needed to decode {path}")
+        return decode_audio(path, sample_rate, channels or 2), sample_rate
+
+    sample_rate = sample_rate or source_rate
+    samples = resample(samples, source_rate, sample_rate)
+    return match_channels(samples, channels or samples.shape[1]), sample_rate
+
+def resolve_music(music):
+    """Background music path; bare file names are looked up in background_music/"""
+    if os.path.exists(music):
+        return music
+    path = os.path.join(MUSIC_DIR, os.path.basename(music))
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Background music not found: {music}")
+    return path
+
+def concatenate(clips, sample_rate, gap_seconds=DEFAULT_GAP_SECONDS, crossfade_seconds=DEFAULT_CROSSFADE_SECONDS):
+    """
+    Place clips one after another in a single preallocated buffer
+
+    Each clip starts gap_seconds after the previous one ends. With a crossfade the clips
+    overlap instead, the outgoing clip fading out while the incoming one fades in; the
+    crossfade is limited to half of the shorter neighbour.
+
+    Args:
+        clips (list): float32 arrays of shape (frames, channels), in playback order
+        sample_rate (int): Sample rate of the clips
+        gap_seconds (float): Silence between consecutive clips
+        crossfade_seconds (float): Overlap between consecutive clips (replaces the gap)
+
+    Returns:
+        tuple: (track array, list of (start frame, frame count) per clip)
+    """
+    gap = int(round(gap_seconds * sample_rate))
+    crossfade = int(round(crossfade_seconds * sample_rate))
+
+    placements = []
+    fades = []
+    position = 0
+    for i, clip in enumerate(clips):
+        fade = 0
+        if i > 0:
+            fade = max(0, min(crossfade, len(clips[i - 1]) // 2, len(clip) // 2))
+            position = placements[-1][0] + placements[-1][1] + (gap if not fade else -fade)
+        placements.append((position, len(clip)))
+        fades.append(fade)
+
+    total = max((start + length for start, length in placements), default=0)
+    channels = clips[0].shape[1] if clips else 1
+    track = np.zeros((total, channels), dtype=np.float32)
+    for i, (clip, (start, length)) in enumerate(zip(clips, placements)):
+        fade_in = fades[i]
+        fade_out = fades[i + 1] if i + 1 < len(fades) else 0
+        if fade_in or fade_out:
+            clip = clip.copy()
+        if fade_in:
+            clip[:fade_in] *= np.linspace(0.0, 1.0, fade_in, dtype=np.float32)[:, None]
+        if fade_out:
+            clip[length - fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=np.float32)[:, None]
+        track[start:start + length] += clip
+    return track, placements
+
+def ducking_gain(voice, sample_rate, duck_gain=DEFAULT_DUCK_GAIN, threshold_db=SPEECH_THRESHOLD_DB,
+                 attack_seconds=DUCK_ATTACK_SECONDS, release_seconds=DUCK_RELEASE_SECONDS):
+    """
+    Per-sample music gain that dips to duck_gain wherever the voice track is active
+
+    Speech is detected on short RMS frames; the gain follows with a one-pole attack and
+    release so the music does not pump between words.
+
+    Args:
+        voice (numpy.ndarray): Voice track of shape (frames, channels)
+        sample_rate (int): Sample rate of the track
+        duck_gain (float): Music gain under speech (1.0 disables ducking)
+        threshold_db (float): Frame RMS above which a frame counts as speech
+        attack_seconds (float): Time for the music to dip once speech starts
+        release_seconds (float): Time for the music to recover after speech ends
+
+    Returns:
+        numpy.ndarray: float32 gain of shape (frames, 1)
+    """
+    frames = len(voice)
+    if duck_gain >= 1.0 or not frames:
+        return np.ones((frames, 1), dtype=np.float32)
+
+    frame_length = max(1, int(DUCK_FRAME_SECONDS * sample_rate))
+    count = -(-frames // frame_length)
+    mono = np.zeros(count * frame_length, dtype=np.float32)
+    mono[:frames] = voice.mean(axis=1)
+    rms = np.sqrt(np.mean(mono.reshape(count, frame_length) ** 2, axis=1))
+    speech = rms > 10 ** (threshold_db / 20.0)
+
+    attack = 1.0 - np.exp(-DUCK_FRAME_SECONDS / max(attack_seconds, DUCK_FRAME_SECONDS))
+    release = 1.0 - np.exp(-DUCK_FRAME_SECONDS / max(release_seconds, DUCK_FRAME_SECONDS))
+    envelope = np.empty(count, dtype=np.float32)
+    level = 0.0
+    for i, active in enumerate(speech):
+        target = 1.0 if active else 0.0
+        level += (attack if target > level else release) * (target - level)
+        envelope[i] = level
+
+    gain = 1.0 - (1.0 - duck_gain) * envelope
+    return np.repeat(gain, frame_length)[:frames, None]
+
+def music_bed(music, frames, sample_rate, fade_out_seconds=MUSIC_FADE_OUT_SECONDS):
+    """Loop or trim decoded music to the mix length and fade it out at the end"""
+    if not len(music) or not frames:
+        return np.zeros((frames, music.shape[1]), dtype=np.float32)
+    repeats = -(-frames // len(music))
+    bed = np.tile(music, (repeats, 1))[:frames].copy() if repeats > 1 else music[:frames].copy()
+    fade = min(frames, int(fade_out_seconds * sample_rate))
+    if fade:
+        bed[frames - fade:] *= np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+    return bed
+
+def write_audio(output_file, samples, sample_rate):
+    """
+    Write float samples as 16-bit PCM in a single pass
+
+    WAV is written directly; other extensions (.mp3, .m4a, ...) are encoded by ffmpeg
+    from a raw pipe so no intermediate file is created.
+    """
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    directory = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(directory, exist_ok=True)
+    # Replace a previous file instead of writing into it
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    if output_file.lower().endswith(".wav"):
+        with wave.open(output_file, "wb") as f:
+            f.setnchannels(samples.shape[1])
+            f.setsampwidth(2)
+            f.setframerate(sample_rate)
+            f.writeframes(pcm.tobytes())
+        return
+
+    result = subprocess.run([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", str(samples.shape[1]), "-i", "pipe:",
+        output_file
+    ], input=pcm.tobytes(), capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not encode {output_file}: {result.stderr.decode('utf-8', 'replace').strip()}")
+
+def shift_segments(segments, offset):
+    """Move Whisper-shaped segments (and their word timings) by offset seconds"""
+    shifted = []
+    for segment in segments or []:
+        segment = dict(segment, start=round(segment["start"] + offset, 3), end=round(segment["end"] + offset, 3))
+        if segment.get("words"):
+            segment["words"] = [
+                dict(word, start=round(word["start"] + offset, 3), end=round(word["end"] + offset, 3))
+                for word in segment["words"]
+            ]
+        shifted.append(segment)
+    return shifted
+
+def assemble(clips, output_file, music=None, gap_seconds=DEFAULT_GAP_SECONDS,
+             crossfade_seconds=DEFAULT_CROSSFADE_SECONDS, music_volume=DEFAULT_MUSIC_VOLUME,
+             duck_gain=DEFAULT_DUCK_GAIN, sample_rate=None, channels=None):
+    """
+    Mix a scene's TTS clips over background music
+
+    Args:
+        clips (list): Clip paths, or speech results ({"audio_file", "segments", ...}) whose
+            segments are shifted onto the mixed timeline
+        output_file (str): Mixed audio path (.wav, or any format ffmpeg can encode)
+        music (str): Background music path or file name in background_music/ (optional)
+        gap_seconds (float): Silence between consecutive clips
+        crossfade_seconds (float): Overlap between consecutive clips
+        music_volume (float): Music level relative to the voice
+        duck_gain (float): Extra music gain while speech is playing (1.0 disables ducking)
+        sample_rate (int): Mix sample rate (default: the first clip's rate)
+        channels (int): Mix channels (default: stereo with music, otherwise the first clip's)
+
+    Returns:
+        dict: Result with output_file, duration and each clip's offset and duration
+    """
+    if not clips:
+        return {"success": False, "error": "هیچ فایل صوتی برای ترکیب وجود ندارد"}
+
+    entries = [clip if isinstance(clip, dict) else {"audio_file": clip} for clip in clips]
+    try:
+        first, sample_rate = load_clip(entries[0]["audio_file"], sample_rate)
+        if channels is None:
+            channels = 2 if music else first.shape[1]
+        loaded = [match_channels(first, channels)]
+        for entry in entries[1:]:
+            loaded.append(load_clip(entry["audio_file"], sample_rate, channels)[0])
+
+        voice, placements = concatenate(loaded, sample_rate, gap_seconds, crossfade_seconds)
+        mix = voice
+        music_path = None
+        if music:
+            music_path = resolve_music(music)
+            bed = music_bed(load_clip(music_path, sample_rate, channels)[0], len(voice), sample_rate)
+            bed *= music_volume * ducking_gain(voice, sample_rate, duck_gain)
+            mix = voice + bed
+
+        peak = float(np.max(np.abs(mix))) if len(mix) else 0.0
+        if peak > PEAK_LIMIT:
+            mix *= PEAK_LIMIT / peak
+        write_audio(output_file, mix, sample_rate)
+    except (OSError, ValueError, RuntimeError, wave.Error) as e:
+        print(f"Error assembling audio: {e}", file=sys.stderr)
+        return {"success": False, "error": str(e)}
+
+    report = []
+    segments = []
+    for index, (entry, (start, length)) in enumerate(zip(entries, placements)):
+        offset = start / float(sample_rate)
+        report.append({
+            "index": index,
+            "audio_file": entry["audio_file"],
+            "offset": round(offset, 3),
+            "duration": round(length / float(sample_rate), 3)
+        })
+        segments.extend(shift_segments(entry.get("segments"), offset))
+
+    result = {
+        "success": True,
+        "output_file": output_file,
+        "duration": round(len(mix) / float(sample_rate), 3),
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "music": music_path,
+        "clips": report
+    }
+    if segments:
+        result["segments"] = segments
+    return result
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Join TTS clips and mix them over background music")
+    parser.add_argument("clips", nargs="+", help="Clip audio files in playback order")
+    parser.add_argument("--output", required=True, help="Mixed audio file (.wav, .mp3, ...)")
+    parser.add_argument("--music", help="Background music file or name in background_music/")
+    parser.add_argument("--gap", type=float, default=DEFAULT_GAP_SECONDS, help="Seconds of silence between clips")
+    parser.add_argument("--crossfade", type=float, default=DEFAULT_CROSSFADE_SECONDS,
+                        help="Seconds of overlap between clips")
+    parser.add_argument("--music-volume", type=float, default=DEFAULT_MUSIC_VOLUME, help="Music level")
+    parser.add_argument("--duck", type=float, default=DEFAULT_DUCK_GAIN,
+                        help="Music gain under speech (1.0 disables ducking)")
+    parser.add_argument("--sample-rate", type=int, help="Mix sample rate (default: first clip's rate)")
+    args = parser.parse_args()
+
+    result = assemble(args.clips, args.output, args.music, args.gap, args.crossfade,
+                      args.music_volume, args.duck, args.sample_rate)
+    print(json.dumps(result, ensure_ascii=False))
+    if not result.get("success"):
+        sys.exit(1)
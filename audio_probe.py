@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Audio metadata probing without ffprobe
+Reads duration, sample rate and channel count straight from RIFF/WAV headers,
+and from MP3 frame headers (Xing/Info/VBRI when present, otherwise a frame scan)
+"""
+
+import os
+import sys
+import json
+import struct
+
+# MPEG audio bitrates in kbps, indexed by [version is MPEG-1][layer][bitrate index]
+MP3_BITRATES = {
+    True: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    False: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+# Upper bound on the bytes read for an MP3 frame scan
+MP3_MAX_SCAN_BYTES = 64 * 1024 * 1024
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+STREAMING_SIZE = 0xFFFFFFFF
+
+def probe_audio(audio_file):
+    """
+    Read audio metadata from the file header
+
+    Args:
+        audio_file (str): Path to a WAV or MP3 file
+
+    Returns:
+        dict: format, duration (seconds), sample_rate, channels and bits_per_sample
+            (None for MP3), or None if the file is not a readable WAV or MP3
+    """
+    try:
+        with open(audio_file, 'rb') as f:
+            head = f.read(12)
+            f.seek(0)
+            if len(head) == 12 and head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+                return _probe_wav(f, os.path.getsize(audio_file))
+            return _probe_mp3(f, os.path.getsize(audio_file))
+    except (OSError, struct.error, ValueError):
+        return None
+
+def get_duration(audio_file, default=None):
+    """Duration of audio_file in seconds, or default if it cannot be probed"""
+    info = probe_audio(audio_file)
+    return info['duration'] if info else default
+
+def _probe_wav(f, file_size):
+    """Walk the RIFF chunks for 'fmt ' and 'data'"""
+    f.seek(12)
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack('<4sI', header)
+
+        if chunk_id == b'fmt ':
+            body = f.read(chunk_size)
+            format_tag, channels, sample_rate, byte_rate, block_align, bits = struct.unpack('<HHIIHH', body[:16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                format_tag = struct.unpack('<H', body[24:26])[0]
+            fmt = {
+                'format_tag': format_tag,
+                'channels': channels,
+                'sample_rate': sample_rate,
+                'byte_rate': byte_rate,
+                'block_align': block_align,
+                'bits_per_sample': bits
+            }
+            # Chunks are word-aligned
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+            continue
+
+        if chunk_id == b'data':
+            if fmt is None or not fmt['byte_rate']:
+                return None
+            data_start = f.tell()
+            # Streamed WAVs leave the size at its maximum; the data then runs to end of file
+            if chunk_size == STREAMING_SIZE or data_start + chunk_size > file_size:
+                chunk_size = file_size - data_start
+            return {
+                'format': 'wav',
+                'duration': chunk_size / float(fmt['byte_rate']),
+                'sample_rate': fmt['sample_rate'],
+                'channels': fmt['channels'],
+                'bits_per_sample': fmt['bits_per_sample']
+            }
+
+        f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+def _skip_id3v2(f):
+    """Return the offset of the first byte after an ID3v2 tag (0 if there is none)"""
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b'ID3':
+        # Tag size is a 28-bit syncsafe integer, excluding the 10-byte header (and footer)
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        footer = 10 if header[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+def _parse_mp3_header(header):
+    """Decode a 4-byte MPEG audio frame header, or None if it is not one"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    sample_rate = MP3_SAMPLE_RATES[version_bits][rate_index]
+    bitrate = MP3_BITRATES[mpeg1][layer][bitrate_index] * 1000
+    padding = (header[2] >> 1) & 0x01
+    channels = 1 if (header[3] >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+
+    return {
+        'mpeg1': mpeg1,
+        'layer': layer,
+        'sample_rate': sample_rate,
+        'bitrate': bitrate,
+        'channels': channels,
+        'samples': samples,
+        'length': length
+    }
+
+def _probe_mp3(f, file_size):
+    """Use the Xing/Info or VBRI frame count when present, otherwise scan frame headers"""
+    start = _skip_id3v2(f)
+    f.seek(start)
+    data = f.read(min(file_size - start, MP3_MAX_SCAN_BYTES))
+
+    # Find the first frame whose successor is also a frame header, to skip junk bytes
+    position = 0
+    first = None
+    while position <= len(data) - 4:
+        first = _parse_mp3_header(data[position:position + 4])
+        if first:
+            following = data[position + first['length']:position + first['length'] + 4]
+            if len(following) < 4 or _parse_mp3_header(following):
+                break
+        first = None
+        position += 1
+    if first is None:
+        return None
+
+    info = {
+        'format': 'mp3',
+        'sample_rate': first['sample_rate'],
+        'channels': first['channels'],
+        'bits_per_sample': None
+    }
+
+    frames = _vbr_frame_count(data[position:position + first['length']], first)
+    if frames is not None:
+        info['duration'] = frames * first['samples'] / float(first['sample_rate'])
+        return info
+
+    samples = 0
+    while position <= len(data) - 4:
+        frame = _parse_mp3_header(data[position:position + 4])
+        if frame is None:
+            break
+        samples += frame['samples']
+        position += frame['length']
+    info['duration'] = samples / float(first['sample_rate'])
+    return info
+
+def _vbr_frame_count(frame, header):
+    """Total frame count from a Xing/Info or VBRI header in the first frame, if any"""
+    if header['mpeg1']:
+        side_info = 17 if header['channels'] == 1 else 32
+    else:
+        side_info = 9 if header['channels'] == 1 else 17
+
+    xing = 4 + side_info
+    if frame[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', frame[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            return struct.unpack('>I', frame[xing + 8:xing + 12])[0]
+
+    # VBRI sits at a fixed offset of 32 bytes after the frame header
+    if frame[36:40] == b'VBRI':
+        return struct.unpack('>I', frame[50:54])[0]
+    return None
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python audio_probe.py <audio_file> [...]")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        print(json.dumps(dict(probe_audio(path) or {'error': 'unsupported or unreadable audio'}, file=path)))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Tiny Whisper long-audio mode
+Compares the single-pass transcription against silence-chunked parallel transcription
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import shutil
+import subprocess
+import tempfile
+
+from tiny_whisper import TinyWhisper, SAMPLE_RATE
+
+FIXTURE_PARAGRAPH = (
+    "The history of the river begins high in the mountains, where snow melts slowly in the spring. "
+    "Small streams join together and grow stronger as they move toward the valley. "
+    "Farmers along the banks have depended on this water for thousands of years. "
+    "Every season brings a different rhythm to the villages that live beside it. "
+    "In the summer the water is low and calm, and children play in the shallow pools. "
+    "In the autumn the rains return, and the current becomes fast and powerful again. "
+)
+
+def fixture_text(minutes=5.0, words_per_minute=160):
+    """Reference text spoken in a fixture of the given length"""
+    paragraph_words = len(FIXTURE_PARAGRAPH.split())
+    repeats = max(1, int(round(minutes * words_per_minute / paragraph_words)))
+    # Paragraph breaks give the silence detector natural pauses to cut at
+    return "\n\n".join([FIXTURE_PARAGRAPH.strip()] * repeats)
+
+def make_speech_fixture(path, minutes=5.0, voice="en", words_per_minute=160):
+    """
+    Synthesize a multi-minute narration with eSpeak so the benchmark needs no network
+
+    Args:
+        path (str): Output WAV path
+        minutes (float): Approximate length of the narration
+        voice (str): eSpeak voice
+        words_per_minute (int): Speaking rate
+
+    Returns:
+        str: Path to the generated WAV file
+    """
+    espeak = shutil.which('espeak-ng') or shutil.which('espeak')
+    if not espeak:
+        raise RuntimeError("eSpeak is required to generate fixture audio (or pass an audio file)")
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+        f.write(fixture_text(minutes, words_per_minute))
+        text_file = f.name
+
+    try:
+        subprocess.run(
+            [espeak, '-v', voice, '-s', str(words_per_minute), '-w', path, '-f', text_file],
+            check=True, capture_output=True
+        )
+    finally:
+        os.unlink(text_file)
+
+    return path
+
+def time_transcription(engine, audio, long_audio, repeat):
+    """Return the best wall-clock time over repeat runs and the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = engine.transcribe('benchmark', include_timestamps=True, audio=audio, long_audio=long_audio)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Tiny Whisper long-audio mode against a single pass')
+    parser.add_argument('audio_file', nargs='?', help='Multi-minute audio file (generated with eSpeak if omitted)')
+    parser.add_argument('--model', default='tiny', help='Whisper model size (default: tiny)')
+    parser.add_argument('--language', default='en', help='Language code (default: en)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes for long-audio mode')
+    parser.add_argument('--minutes', type=float, default=5.0, help='Length of generated fixture audio')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per mode; the best time is reported')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    audio_file = args.audio_file
+    if not audio_file:
+        audio_file = os.path.join(tempfile.gettempdir(), f"tiny_whisper_bench_{int(args.minutes)}min.wav")
+        if not os.path.exists(audio_file):
+            print(f"Generating {args.minutes:g} minute fixture: {audio_file}", file=sys.stderr)
+            make_speech_fixture(audio_file, args.minutes)
+
+    engine = TinyWhisper(model_size=args.model, language=args.language, chunk_workers=args.workers, cache=False)
+    audio = engine.preprocess_audio(audio_file)
+    duration = len(audio) / SAMPLE_RATE
+
+    # Warm up the worker pool so process start-up and model loading are not timed
+    engine.transcribe('warmup', audio=audio[:SAMPLE_RATE * 70], long_audio=True)
+
+    single_time, single_result = time_transcription(engine, audio, False, args.repeat)
+    chunked_time, chunked_result = time_transcription(engine, audio, True, args.repeat)
+    engine.close()
+
+    results = {
+        'audio_file': audio_file,
+        'audio_duration': round(duration, 2),
+        'model': args.model,
+        'workers': args.workers,
+        'single_pass': {
+            'seconds': round(single_time, 2),
+            'rtf': round(single_time / duration, 4),
+            'segments': len(single_result.get('segments', [])),
+            'words': len(single_result.get('text', '').split())
+        },
+        'long_audio': {
+            'seconds': round(chunked_time, 2),
+            'rtf': round(chunked_time / duration, 4),
+            'segments': len(chunked_result.get('segments', [])),
+            'words': len(chunked_result.get('text', '').split())
+        },
+        'speedup': round(single_time / chunked_time, 2) if chunked_time else None
+    }
+
+    print(f"Audio: {duration:.1f}s, model: {args.model}, workers: {args.workers}")
+    print(f"Single pass: {single_time:.2f}s (RTF {results['single_pass']['rtf']})")
+    print(f"Long-audio:  {chunked_time:.2f}s (RTF {results['long_audio']['rtf']})")
+    print(f"Speedup:     {results['speedup']}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Comparison report for Tiny Whisper int8 quantization
+Measures word error rate, real-time factor, load time and model memory of fp32 vs int8
+for each model size on a locally generated fixture
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+
+from tiny_whisper import TinyWhisper, SAMPLE_RATE, PRECISION_CHOICES
+from bench_long_audio import make_speech_fixture, fixture_text
+
+def normalize_words(text):
+    """Lowercase and strip punctuation so WER only counts word differences"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word error rate: (substitutions + deletions + insertions) / reference words
+
+    Args:
+        reference (str): Ground-truth text
+        hypothesis (str): Transcribed text
+
+    Returns:
+        float: WER (0.0 is perfect; can exceed 1.0)
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Single-row Levenshtein distance over words
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+def measure(model_size, precision, audio, reference, language, repeat):
+    """Load one model variant and time its transcription of audio"""
+    started = time.perf_counter()
+    engine = TinyWhisper(model_size=model_size, language=language, cache=False, precision=precision)
+    load_time = time.perf_counter() - started
+
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = engine.transcribe('benchmark', audio=audio, timestamps='none')
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    duration = len(audio) / SAMPLE_RATE
+    row = {
+        'model': model_size,
+        'precision': precision,
+        'load_time': round(load_time, 2),
+        'memory_mb': round(engine.memory_bytes() / (1024 * 1024), 1),
+        'seconds': round(best, 2),
+        'rtf': round(best / duration, 4),
+        'wer': round(word_error_rate(reference, result.get('text', '')), 4),
+        'success': result.get('success', False)
+    }
+    engine.close()
+    return row
+
+def format_markdown(report):
+    """Render the report as a Markdown table"""
+    lines = [
+        "# Tiny Whisper int8 vs fp32",
+        "",
+        f"- Audio: {report['audio_duration']} s ({report['audio_file']})",
+        f"- CPU: {report['machine']['processor'] or report['machine']['machine']}, "
+        f"{report['machine']['cpu_count']} cores",
+        f"- Threads: {report['threads'] or 'default'}",
+        "",
+        "| Model | Precision | WER | RTF | Speedup | Load (s) | Memory (MB) |",
+        "|-------|-----------|-----|-----|---------|----------|-------------|",
+    ]
+    baseline = {row['model']: row for row in report['results'] if row['precision'] == 'fp32'}
+    for row in report['results']:
+        fp32 = baseline.get(row['model'])
+        speedup = f"{fp32['seconds'] / row['seconds']:.2f}x" if fp32 and row['seconds'] else "-"
+        lines.append(
+            f"| {row['model']} | {row['precision']} | {row['wer']:.3f} | {row['rtf']:.3f} | "
+            f"{speedup} | {row['load_time']:.2f} | {row['memory_mb']:.0f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare fp32 and int8 Tiny Whisper per model size')
+    parser.add_argument('audio_file', nargs='?', help='Audio file (an eSpeak fixture is generated if omitted)')
+    parser.add_argument('--reference', help='Reference transcript file for audio_file (required with audio_file)')
+    parser.add_argument('--models', default='tiny,base,small', help='Comma-separated model sizes')
+    parser.add_argument('--language', default='en', help='Language code (default: en)')
+    parser.add_argument('--minutes', type=float, default=1.0, help='Length of generated fixture audio')
+    parser.add_argument('--threads', type=int, help='torch intra-op threads (default: torch default)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per variant; the best time is reported')
+    parser.add_argument('--output', help='Write the JSON report here (a .md table is written alongside)')
+    args = parser.parse_args()
+
+    if args.audio_file:
+        if not args.reference:
+            parser.error('--reference is required when audio_file is given')
+        audio_file = args.audio_file
+        with open(args.reference, 'r', encoding='utf-8') as f:
+            reference = f.read()
+    else:
+        audio_file = os.path.join(tempfile.gettempdir(), f"tiny_whisper_wer_{args.minutes:g}min.wav")
+        reference = fixture_text(args.minutes)
+        if not os.path.exists(audio_file):
+            print(f"Generating {args.minutes:g} minute fixture: {audio_file}", file=sys.stderr)
+            make_speech_fixture(audio_file, args.minutes)
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    audio = TinyWhisper.preprocess_audio(audio_file)
+    results = []
+    for model_size in [m.strip() for m in args.models.split(',') if m.strip()]:
+        for precision in PRECISION_CHOICES:
+            print(f"Measuring {model_size} ({precision})...", file=sys.stderr)
+            results.append(measure(model_size, precision, audio, reference, args.language, args.repeat))
+
+    report = {
+        'audio_file': audio_file,
+        'audio_duration': round(len(audio) / SAMPLE_RATE, 2),
+        'threads': args.threads,
+        'machine': {
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version()
+        },
+        'results': results
+    }
+
+    markdown = format_markdown(report)
+    print(markdown)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        with open(os.path.splitext(args.output)[0] + '.md', 'w', encoding='utf-8') as f:
+            f.write(markdown)
+        print(f"Report saved to: {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
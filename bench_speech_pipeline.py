@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the speech pipeline
+Measures Whisper CLI cold start, start-up, model load time, real-time factor and peak RSS per model size
+and thread count, plus Piper TTS throughput, and compares runs to flag regressions
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+from bench_long_audio import make_speech_fixture, FIXTURE_PARAGRAPH
+
+# Metrics compared between runs; True means higher is better
+METRICS = {
+    'startup_time': False,
+    'import_time': False,
+    'load_time': False,
+    'rtf': False,
+    'peak_rss_mb': False,
+    'chars_per_second': True,
+}
+DEFAULT_THRESHOLD = 0.10
+SCRIPT = os.path.abspath(__file__)
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def measure_whisper(audio_file, model_size, threads, precision, repeat):
+    """Child-process measurement of one Whisper configuration"""
+    started = time.perf_counter()
+    import torch
+    from tiny_whisper import TinyWhisper, SAMPLE_RATE
+    import_time = time.perf_counter() - started
+
+    torch.set_num_threads(threads)
+
+    started = time.perf_counter()
+    engine = TinyWhisper(model_size=model_size, language='en', cache=False, precision=precision)
+    load_time = time.perf_counter() - started
+
+    audio = engine.preprocess_audio(audio_file)
+    duration = len(audio) / SAMPLE_RATE
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = engine.transcribe(audio_file, audio=audio, timestamps='segment', use_cache=False)
+        elapsed = time.perf_counter() - started
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'transcription failed'))
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        'import_time': round(import_time, 3),
+        'load_time': round(load_time, 3),
+        'audio_duration': round(duration, 2),
+        'seconds': round(best, 3),
+        'rtf': round(best / duration, 4),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def measure_startup(model_size, precision, repeat):
+    """
+    Wall-clock start-up of the tiny_whisper.py CLI until its model is ready
+
+    Interpreter start-up is included. A first untimed start downloads the model or
+    writes its memory-mapped copy if needed, so the timed runs see a warm disk cache.
+    """
+    command = [
+        sys.executable, os.path.join(os.path.dirname(SCRIPT), 'tiny_whisper.py'),
+        '--startup-time', '--model', model_size, '--precision', precision
+    ]
+    subprocess.run(command, capture_output=True)
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace')
+        elapsed = time.perf_counter() - started
+        if completed.returncode != 0:
+            return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+        if best is None or elapsed < best[0]:
+            best = (elapsed, json.loads(completed.stdout))
+
+    elapsed, report = best
+    return {
+        'startup_time': round(elapsed, 3),
+        'load_time': report['model_load'],
+        'model_source': report['model_source'],
+        'phases': report
+    }
+
+def measure_piper(voice, sentences, output_dir):
+    """Child-process measurement of piper_tts.generate_speech throughput"""
+    import piper_tts
+
+    # The first call may download the voice; keep it out of the timing
+    # Bypass the TTS cache, or repeated runs would time cache copies instead of synthesis
+    warmup = piper_tts.generate_speech(sentences[0], voice, data_dir=output_dir, use_cache=False)
+    if not warmup.get('success'):
+        raise RuntimeError(warmup.get('error', 'piper warm-up failed'))
+    os.remove(warmup['audio_file'])
+
+    chars = 0
+    audio_seconds = 0.0
+    started = time.perf_counter()
+    for sentence in sentences:
+        result = piper_tts.generate_speech(sentence, voice, data_dir=output_dir, use_cache=False)
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'piper synthesis failed'))
+        chars += len(sentence)
+        audio_seconds += result.get('duration', 0.0)
+        os.remove(result['audio_file'])
+    elapsed = time.perf_counter() - started
+
+    return {
+        'sentences': len(sentences),
+        'characters': chars,
+        'seconds': round(elapsed, 3),
+        'chars_per_second': round(chars / elapsed, 1),
+        'rtf': round(elapsed / audio_seconds, 4) if audio_seconds else None,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def run_child(args):
+    """Run a measurement in a fresh interpreter so start-up and peak RSS are isolated"""
+    completed = subprocess.run(
+        [sys.executable, SCRIPT] + args,
+        capture_output=True, text=True, encoding='utf-8', errors='replace'
+    )
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def ensure_fixture(path, minutes):
+    """Generate the fixture narration locally with eSpeak, falling back to Piper"""
+    if os.path.exists(path):
+        return path
+    try:
+        return make_speech_fixture(path, minutes)
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"eSpeak fixture failed ({e}); trying Piper", file=sys.stderr)
+
+    import piper_tts
+    text = " ".join([FIXTURE_PARAGRAPH.strip()] * max(1, int(minutes * 2)))
+    result = piper_tts.generate_speech(text, output_file=os.path.abspath(path),
+                                       data_dir=os.path.dirname(os.path.abspath(path)))
+    if not result.get('success'):
+        raise RuntimeError(f"Could not generate fixture audio: {result.get('error')}")
+    return path
+
+def run_suite(args):
+    """Run every configured measurement and write the results file"""
+    fixture = ensure_fixture(
+        args.audio or os.path.join(tempfile.gettempdir(), f"speech_bench_{args.minutes:g}min.wav"),
+        args.minutes
+    )
+
+    results = {}
+    for model_size in args.models.split(','):
+        name = f"whisper-startup/{model_size}/{args.precision}"
+        print(f"Measuring {name}...", file=sys.stderr)
+        results[name] = measure_startup(model_size, args.precision, args.repeat)
+        for threads in [int(t) for t in args.threads.split(',')]:
+            name = f"whisper/{model_size}/{args.precision}/threads={threads}"
+            print(f"Measuring {name}...", file=sys.stderr)
+            results[name] = run_child([
+                '_whisper', fixture, '--model', model_size, '--threads', str(threads),
+                '--precision', args.precision, '--repeat', str(args.repeat)
+            ])
+
+    if not args.skip_piper:
+        name = f"piper/{args.voice}"
+        print(f"Measuring {name}...", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as output_dir:
+            results[name] = run_child(['_piper', '--voice', args.voice, '--output-dir', output_dir])
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'fixture': fixture,
+        'machine': {
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version()
+        },
+        'results': results
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for name, metrics in results.items():
+        summary = ', '.join(f"{key}={metrics[key]}" for key in METRICS if key in metrics)
+        print(f"{name}: {summary or metrics.get('error')}")
+    print(f"Results saved to: {args.output}", file=sys.stderr)
+
+def compare_runs(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two results files
+
+    Args:
+        baseline (dict): Earlier report
+        current (dict): Newer report
+        threshold (float): Relative change treated as a regression (0.10 = 10%)
+
+    Returns:
+        list: One dict per compared metric, with a 'regression' flag
+    """
+    rows = []
+    for name, metrics in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        for key, higher_is_better in METRICS.items():
+            if key not in metrics or key not in before or not before[key]:
+                continue
+            change = (metrics[key] - before[key]) / before[key]
+            worse = -change if higher_is_better else change
+            rows.append({
+                'name': name,
+                'metric': key,
+                'baseline': before[key],
+                'current': metrics[key],
+                'change': round(change, 4),
+                'regression': worse > threshold
+            })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Speech pipeline benchmark suite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='Run the benchmark suite')
+    run.add_argument('--audio', help='Fixture audio (generated locally if missing)')
+    run.add_argument('--minutes', type=float, default=1.0, help='Length of generated fixture audio')
+    run.add_argument('--models', default='tiny,base', help='Comma-separated Whisper model sizes')
+    run.add_argument('--threads', default='1,2,4', help='Comma-separated torch thread counts')
+    run.add_argument('--precision', default='fp32', help='Whisper precision (fp32 or int8)')
+    run.add_argument('--repeat', type=int, default=2, help='Transcriptions per configuration; best is kept')
+    run.add_argument('--voice', default='en_US-kristin-medium', help='Piper voice for the TTS benchmark')
+    run.add_argument('--skip-piper', action='store_true', help='Skip the Piper TTS benchmark')
+    run.add_argument('--output', default='speech_bench.json', help='Results file (default: speech_bench.json)')
+
+    compare = subparsers.add_parser('compare', help='Flag regressions between two results files')
+    compare.add_argument('baseline', help='Earlier results file')
+    compare.add_argument('current', help='Newer results file')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help='Relative slowdown treated as a regression (default: 0.10)')
+
+    whisper_child = subparsers.add_parser('_whisper')
+    whisper_child.add_argument('audio_file')
+    whisper_child.add_argument('--model', default='tiny')
+    whisper_child.add_argument('--threads', type=int, default=1)
+    whisper_child.add_argument('--precision', default='fp32')
+    whisper_child.add_argument('--repeat', type=int, default=1)
+
+    piper_child = subparsers.add_parser('_piper')
+    piper_child.add_argument('--voice', default='en_US-kristin-medium')
+    piper_child.add_argument('--output-dir', required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run_suite(args)
+    elif args.command == 'compare':
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        rows = compare_runs(baseline, current, args.threshold)
+        for row in rows:
+            flag = 'REGRESSION' if row['regression'] else 'ok'
+            print(f"{flag:10} {row['name']} {row['metric']}: {row['baseline']} -> {row['current']} "
+                  f"({row['change']:+.1%})")
+        print(json.dumps({'regressions': sum(row['regression'] for row in rows), 'compared': len(rows)}))
+        sys.exit(1 if any(row['regression'] for row in rows) else 0)
+    elif args.command == '_whisper':
+        # Child output must be the last stdout line only
+        protocol_out, sys.stdout = sys.stdout, sys.stderr
+        metrics = measure_whisper(args.audio_file, args.model, args.threads, args.precision, args.repeat)
+        protocol_out.write(json.dumps(metrics) + "\n")
+    elif args.command == '_piper':
+        protocol_out, sys.stdout = sys.stdout, sys.stderr
+        sentences = [s.strip() + '.' for s in FIXTURE_PARAGRAPH.split('.') if s.strip()]
+        metrics = measure_piper(args.voice, sentences, args.output_dir)
+        protocol_out.write(json.dumps(metrics) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+const EventEmitter = require('events');
+const { spawn, execSync } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+// Detect Python command (python3 on Linux, python on Windows)
+function detectPythonCommand() {
+    try {
+        execSync('python3 --version', { stdio: 'ignore' });
+        return 'python3';
+    } catch (error) {
+        try {
+            execSync('python --version', { stdio: 'ignore' });
+            return 'python';
+        } catch (error2) {
+            return 'python3';
+        }
+    }
+}
+
+// e.g. TTS_FALLBACK_CHAIN=piper,pyttsx3,espeak lets the Piper worker fall back in-process
+function piperArgs() {
+    return process.env.TTS_FALLBACK_CHAIN ? ['--chain', process.env.TTS_FALLBACK_CHAIN] : [];
+}
+
+/**
+ * Piper Worker Client
+ * یک پروسه‌ی پایتون دائمی (piper_tts.py --serve) که صداها را یک بار بارگذاری می‌کند
+ * و درخواست‌ها را با پروتکل JSON lines پاسخ می‌دهد
+ */
+class PiperWorkerClient extends EventEmitter {
+    /**
+     * @param {Number} jobTimeoutMs - حداکثر زمان انتظار برای هر درخواست
+     * @param {Object} options - {script, label, args}: اسکریپت پایتون worker، نام در لاگ‌ها و آرگومان‌های اضافه
+     */
+    constructor(jobTimeoutMs = 120000, options = {}) {
+        super();
+        this.jobTimeoutMs = jobTimeoutMs;
+        this.script = options.script || 'piper_tts.py';
+        this.label = options.label || 'Piper Worker';
+        this.extraArgs = options.args || piperArgs;
+        this.pythonCmd = null;
+        this.process = null;
+        this.pending = new Map();
+        this.nextId = 1;
+    }
+
+    /**
+     * راه‌اندازی worker در صورت نیاز
+     */
+    start() {
+        if (this.process) {
+            return this.process;
+        }
+
+        this.pythonCmd = this.pythonCmd || detectPythonCommand();
+        const script = path.join(__dirname, this.script);
+        const args = [script, '--serve', ...this.extraArgs()];
+        const child = spawn(this.pythonCmd, args, {
+            cwd: __dirname,
+            stdio: ['pipe', 'pipe', 'pipe']
+        });
+
+        readline.createInterface({ input: child.stdout }).on('line', (line) => this.handleLine(line));
+
+        child.stderr.on('data', (data) => {
+            const stderrData = data.toString().trim();
+            if (stderrData && !stderrData.includes('WARNING:')) {
+                console.log(`🐍 [${this.label}]`, stderrData);
+            }
+        });
+
+        child.on('exit', (code) => {
+            console.log(`🐍 [${this.label}] Exited with code ${code}`);
+            this.process = null;
+            this.rejectAll(new Error(`${this.label} exited with code ${code}`));
+        });
+
+        child.on('error', (error) => {
+            console.error(`🐍 [${this.label}] Spawn error:`, error);
+            this.process = null;
+            this.rejectAll(error);
+        });
+
+        this.process = child;
+        console.log(`🐍 [${this.label}] Started (pid ${child.pid})`);
+        return child;
+    }
+
+    /**
+     * ارسال یک درخواست JSON و انتظار برای پاسخ همان شناسه
+     * @param {Object} job - درخواست
+     * @returns {Promise<Object>} پاسخ worker
+     */
+    request(job) {
+        return new Promise((resolve, reject) => {
+            const child = this.start();
+            const id = `${this.script}-${this.nextId++}`;
+
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error(`${this.label} timed out after ${this.jobTimeoutMs} ms`));
+            }, this.jobTimeoutMs);
+
+            this.pending.set(id, { resolve, reject, timer });
+            child.stdin.write(JSON.stringify({ ...job, id }) + '\n');
+        });
+    }
+
+    /**
+     * تولید صدا با worker دائمی
+     * @param {String} text - متن
+     * @param {String} voice - نام صدا
+     * @param {String} outputDir - پوشه‌ی خروجی و مدل‌های صدا
+     * @param {String} uniqueSuffix - پسوند یکتای نام فایل
+     * @param {Object} options - {timings, subtitle_formats}: زمان‌بندی جمله‌ها و کلمه‌ها برای زیرنویس
+     * @returns {Promise<Object>} همان خروجی JSON اسکریپت piper_tts.py
+     */
+    synthesize(text, voice, outputDir, uniqueSuffix, options = {}) {
+        return this.request({
+            ...options,
+            text,
+            voice,
+            output_dir: outputDir,
+            unique_suffix: uniqueSuffix ? String(uniqueSuffix) : undefined
+        });
+    }
+
+    /**
+     * تولید صدای چند متن به صورت موازی و در صورت نیاز چسباندن آن‌ها به یک فایل WAV
+     * @param {Array} items - متن‌ها، [text, voice] یا {text, voice}
+     * @param {String} outputDir - پوشه‌ی خروجی و مدل‌های صدا
+     * @param {Object} options - {voice, concatenate, gap_seconds, workers, keep_parts, output_file}
+     * @returns {Promise<Object>} نتیجه با offset و duration هر مورد
+     */
+    synthesizeBatch(items, outputDir, options = {}) {
+        return this.request({ ...options, items, output_dir: outputDir });
+    }
+
+    status() {
+        return this.request({ command: 'status' });
+    }
+
+    handleLine(line) {
+        line = line.trim();
+        if (!line.startsWith('{')) {
+            return;
+        }
+
+        let response;
+        try {
+            response = JSON.parse(line);
+        } catch (error) {
+            console.error(`🐍 [${this.label}] Invalid response:`, line);
+            return;
+        }
+
+        const entry = this.pending.get(response.id);
+        if (!entry) {
+            return;
+        }
+        this.pending.delete(response.id);
+        clearTimeout(entry.timer);
+        entry.resolve(response);
+    }
+
+    rejectAll(error) {
+        for (const [id, entry] of this.pending) {
+            clearTimeout(entry.timer);
+            entry.reject(error);
+        }
+        this.pending.clear();
+    }
+
+    stop() {
+        if (this.process) {
+            this.process.stdin.write(JSON.stringify({ command: 'shutdown' }) + '\n');
+            this.process.stdin.end();
+        }
+    }
+}
+
+// Singleton instance
+const piperWorker = new PiperWorkerClient();
+
+module.exports = piperWorker;
+module.exports.PiperWorkerClient = PiperWorkerClient;
@@ -10,18 +10,47 @@ import json
 import subprocess
 import tempfile
 import time
+import re
 import uuid
 import shutil
+import gc
+import struct
+import wave
+import threading
+import socketserver
+import multiprocessing
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_probe import probe_audio
+from tts_cache import open_tts_cache
+from piper_voices import get_voice_index
+import tts_subtitles
+
+try:
+    from piper import PiperVoice
+except ImportError:
+    # Without the library every utterance falls back to a `python -m piper` subprocess
+    PiperVoice = None
+
+DEFAULT_VOICE = "en_US-kristin-medium"
+STREAM_FORMATS = ["pcm", "wav"]
+
+# Sentence ends in Latin and Persian text; the lookbehind keeps the punctuation with its sentence
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?\u061f\u2026])\s+|\n+")
 
 # Set UTF-8 encoding for Windows
 if sys.platform == "win32":
     os.environ["PYTHONIOENCODING"] = "utf-8"
 
 def get_audio_duration(audio_file):
-    """Get actual audio duration using ffprobe"""
+    """Get actual audio duration from the file header, using ffprobe only for other formats"""
+    info = probe_audio(audio_file)
+    if info:
+        return info["duration"]
+
     try:
-        # Use ffprobe to get exact duration
         cmd = [
             'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
             '-of', 'csv=p=0', audio_file
@@ -30,34 +59,19 @@ def get_audio_duration(audio_file):
         result = subprocess.run(cmd, capture_output=True, text=True)
         
         if result.returncode == 0:
-            duration = float(result.stdout.strip())
-            return duration
-        else:
-            print(f"ffprobe error: {result.stderr}")
-            # Fallback to file size estimation
-            file_size = os.path.getsize(audio_file)
-            sample_rate = 22050  # Use 22kHz for better quality
-            duration = file_size / (sample_rate * 2)
-            return duration
-            
+            return float(result.stdout.strip())
+        print(f"ffprobe error: {result.stderr}", file=sys.stderr)
     except Exception as e:
-        print(f"Error getting audio duration: {e}")
-        # Fallback to file size estimation
-        try:
-            file_size = os.path.getsize(audio_file)
-            sample_rate = 22050  # Use 22kHz for better quality
-            duration = file_size / (sample_rate * 2)
-            return duration
-        except:
-            return 5.0  # Default fallback
+        print(f"Error getting audio duration: {e}", file=sys.stderr)
+    return 5.0  # Default fallback
 
 def download_voice_if_needed(voice_name, data_dir=None):
     """Download voice if it doesn't exist"""
     if data_dir is None:
         data_dir = os.getcwd()
     
-    voice_path = os.path.join(data_dir, voice_name)
-    if not os.path.exists(voice_path):
+    # Piper stores <voice>.onnx and <voice>.onnx.json, so look those up rather than the bare name
+    if find_voice_files(voice_name, data_dir) is None:
         print(f"Downloading voice: {voice_name}")
         try:
             result = subprocess.run([
@@ -68,25 +82,581 @@ def download_voice_if_needed(voice_name, data_dir=None):
                 print(f"Error downloading voice: {result.stderr}")
                 return False
             print(f"Successfully downloaded voice: {voice_name}")
+            # Indexes the new files
+            find_voice_files(voice_name, data_dir)
             return True
         except Exception as e:
             print(f"Exception downloading voice: {e}")
             return False
     return True
 
-def generate_speech(text, voice_name="en_US-kristin-medium", output_file=None, data_dir=None):
+def find_voice_files(voice_name, data_dir=None):
+    """
+    Locate the ONNX model and JSON config of a downloaded voice
+
+    The local voice index is consulted first; voices found on disk but missing from the
+    index are added to it.
+
+    Args:
+        voice_name: Voice name (e.g. en_US-kristin-medium) or path to a .onnx file
+        data_dir: Directory the voice was downloaded into
+
+    Returns:
+        tuple: (model_path, config_path), or None if the voice is not on disk
+    """
+    if voice_name.endswith(".onnx"):
+        candidates = [voice_name]
+    else:
+        entry = get_voice_index().resolve(voice_name, data_dir)
+        if entry is not None:
+            return entry["model_path"], entry["config_path"]
+        candidates = [
+            os.path.join(directory, f"{voice_name}.onnx")
+            for directory in (data_dir or os.getcwd(), os.getcwd())
+        ]
+
+    for model_path in candidates:
+        config_path = f"{model_path}.json"
+        if os.path.exists(model_path) and os.path.exists(config_path):
+            if not voice_name.endswith(".onnx"):
+                try:
+                    get_voice_index().add(model_path, config_path)
+                except (OSError, ValueError) as e:
+                    print(f"Error indexing voice {voice_name}: {e}", file=sys.stderr)
+            return os.path.abspath(model_path), os.path.abspath(config_path)
+    return None
+
+class PiperEngine:
+    """
+    In-process Piper synthesizer that keeps voices loaded between utterances
+
+    Loading onnxruntime and a voice model takes far longer than synthesizing a short line,
+    so loaded voices are kept in an LRU cache. Least-recently-used voices are unloaded once
+    the combined voice memory exceeds max_memory_mb.
+    """
+
+    def __init__(self, data_dir=None, use_cuda=False, max_memory_mb=None, preload=None):
+        """
+        Initialize the engine
+
+        Args:
+            data_dir: Default directory for voice models
+            use_cuda: Run the ONNX models on CUDA
+            max_memory_mb: RAM budget for loaded voices (None for unbounded)
+            preload: Voice names to load up front so the first request does not pay for it
+        """
+        if PiperVoice is None:
+            raise ImportError("piper-tts is not installed")
+
+        self.data_dir = data_dir
+        self.use_cuda = use_cuda
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+        self.voices = OrderedDict()
+        self.voice_stats = {}
+        self.synthesized = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+
+        for voice_name in preload or []:
+            try:
+                self.load_voice(voice_name)
+            except Exception as e:
+                print(f"Error preloading voice {voice_name}: {e}", file=sys.stderr)
+
+    def load_voice(self, voice_name, data_dir=None):
+        """
+        Return a loaded voice, downloading and loading it on first use
+
+        Args:
+            voice_name: Voice model name
+            data_dir: Directory containing voice models (defaults to the engine's data_dir)
+
+        Returns:
+            PiperVoice: The loaded voice
+        """
+        data_dir = data_dir or self.data_dir or os.getcwd()
+        files = find_voice_files(voice_name, data_dir)
+        key = files[0] if files else voice_name
+
+        with self.lock:
+            voice = self.voices.get(key)
+            if voice is not None:
+                self.voices.move_to_end(key)
+                self.voice_stats[key]["hits"] += 1
+                self.voice_stats[key]["last_used"] = time.time()
+                return voice
+
+            if files is None:
+                if not download_voice_if_needed(voice_name, data_dir):
+                    raise RuntimeError(f"Could not download voice: {voice_name}")
+                files = find_voice_files(voice_name, data_dir)
+                if files is None:
+                    raise RuntimeError(f"Voice files not found: {voice_name}")
+                key = files[0]
+
+            print(f"Loading voice: {voice_name}", file=sys.stderr)
+            rss_before = _process_rss_bytes()
+            started = time.perf_counter()
+            voice = PiperVoice.load(files[0], config_path=files[1], use_cuda=self.use_cuda)
+            load_time = time.perf_counter() - started
+            rss_after = _process_rss_bytes()
+
+            # ONNX sessions do not report their size; the RSS growth of the load is the best
+            # estimate, bounded below by the weights on disk
+            memory_bytes = os.path.getsize(files[0])
+            if rss_before is not None and rss_after is not None:
+                memory_bytes = max(memory_bytes, rss_after - rss_before)
+
+            self.voices[key] = voice
+            self.voice_stats[key] = {
+                "voice": voice_name,
+                "memory_bytes": memory_bytes,
+                "load_time": round(load_time, 3),
+                "hits": 0,
+                "last_used": time.time()
+            }
+            self._evict_over_budget(keep=key)
+            return voice
+
+    def unload_voice(self, key):
+        """Drop a loaded voice (by model path) so its memory can be reclaimed"""
+        with self.lock:
+            voice = self.voices.pop(key, None)
+            if voice is None:
+                return False
+            stat = self.voice_stats.pop(key, {})
+            self.evictions += 1
+        del voice
+        gc.collect()
+        print(f"Unloaded voice: {stat.get('voice', key)}", file=sys.stderr)
+        return True
+
+    def total_memory_bytes(self):
+        """Combined estimated memory of all loaded voices"""
+        with self.lock:
+            return sum(stat["memory_bytes"] for stat in self.voice_stats.values())
+
+    def _evict_over_budget(self, keep):
+        if not self.max_memory_bytes:
+            return
+        for key in list(self.voices):
+            if self.total_memory_bytes() <= self.max_memory_bytes:
+                break
+            if key != keep:
+                self.unload_voice(key)
+
+    def synthesize(self, text, voice_name=DEFAULT_VOICE, output_file=None, data_dir=None, timings=False):
+        """
+        Synthesize text to a WAV file with a resident voice
+
+        Args:
+            text: Text to convert to speech
+            voice_name: Voice model name
+            output_file: Output WAV path (if None, a unique file is created in data_dir)
+            data_dir: Directory containing voice models
+            timings: Synthesize sentence by sentence and report sentence and word timings
+
+        Returns:
+            dict: Result with success status and file info (same keys as generate_speech),
+                plus "load_time": seconds spent downloading and loading the voice
+        """
+        if not text or not text.strip():
+            return {
+                "success": False,
+                "error": "متن مورد نیاز است"
+            }
+
+        data_dir = data_dir or self.data_dir or os.getcwd()
+        started = time.perf_counter()
+        try:
+            voice = self.load_voice(voice_name, data_dir)
+        except Exception as e:
+            print(f"Error loading voice: {e}", file=sys.stderr)
+            return {
+                "success": False,
+                "error": f"خطا در دانلود صدا: {voice_name}"
+            }
+        load_time = round(time.perf_counter() - started, 3)
+
+        if output_file is None:
+            output_file = os.path.join(os.path.abspath(data_dir), f"piper_tts_{uuid.uuid4().hex}.wav")
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        # Replace a previous file instead of writing into it
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+        if timings:
+            result = self._synthesize_timed(voice, text, voice_name, output_file)
+            if result.get("success"):
+                result["load_time"] = load_time
+            return result
+
+        try:
+            with wave.open(output_file, "wb") as wav_file:
+                if hasattr(voice, "synthesize_wav"):
+                    voice.synthesize_wav(text, wav_file)
+                else:
+                    # piper-tts < 1.3 wrote WAV files through synthesize()
+                    voice.synthesize(text, wav_file)
+            info = probe_audio(output_file)
+            if info is None:
+                raise RuntimeError("Piper did not write a readable WAV file")
+            sample_rate, duration = info["sample_rate"], info["duration"]
+        except Exception as e:
+            print(f"Piper TTS error: {e}", file=sys.stderr)
+            return {
+                "success": False,
+                "error": f"خطا در تولید صدا: {e}"
+            }
+
+        with self.lock:
+            self.synthesized += 1
+
+        return {
+            "success": True,
+            "audio_file": output_file,
+            "duration": round(duration, 2),
+            "text": text,
+            "voice": voice_name,
+            "sample_rate": sample_rate,
+            "words": len(text.split()),
+            "file_size": os.path.getsize(output_file),
+            "engine": "Piper TTS",
+            "load_time": load_time
+        }
+
+    def stream(self, text, voice_name=DEFAULT_VOICE, data_dir=None, alignments=False):
+        """
+        Synthesize text sentence by sentence, yielding audio as soon as each sentence is done
+
+        Args:
+            text: Text to convert to speech
+            voice_name: Voice model name
+            data_dir: Directory containing voice models
+            alignments: Ask Piper for phoneme alignments (needs a voice exported with them)
+
+        Yields:
+            dict: {"index", "text", "sample_rate", "pcm", "alignments"} where pcm is 16-bit mono
+                little-endian audio and alignments is a list of (phoneme, num_samples) or None
+        """
+        voice = self.load_voice(voice_name, data_dir)
+        sample_rate = voice.config.sample_rate
+        for index, sentence in enumerate(split_sentences(text)):
+            pcm, phonemes = _synthesize_sentence(voice, sentence, alignments)
+            with self.lock:
+                self.synthesized += 1
+            yield {"index": index, "text": sentence, "sample_rate": sample_rate, "pcm": pcm, "alignments": phonemes}
+
+    def _synthesize_timed(self, voice, text, voice_name, output_file):
+        """Write a WAV sentence by sentence, recording where each sentence and word lands"""
+        sample_rate = voice.config.sample_rate
+        sentences = []
+        offset = 0.0
+        try:
+            with wave.open(output_file, "wb") as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(sample_rate)
+                for index, sentence in enumerate(split_sentences(text)):
+                    pcm, phonemes = _synthesize_sentence(voice, sentence, alignments=True)
+                    wav_file.writeframes(pcm)
+                    with self.lock:
+                        self.synthesized += 1
+
+                    duration = len(pcm) / (2.0 * sample_rate)
+                    words = (
+                        tts_subtitles.aligned_word_timings(sentence, phonemes, sample_rate, offset)
+                        if phonemes else None
+                    )
+                    sentences.append({
+                        "index": index,
+                        "text": sentence,
+                        "offset": round(offset, 3),
+                        "duration": round(duration, 3),
+                        "words": words or tts_subtitles.proportional_word_timings(sentence, offset, duration),
+                        "timing": "alignment" if words else "estimated"
+                    })
+                    offset += duration
+        except Exception as e:
+            print(f"Piper TTS error: {e}", file=sys.stderr)
+            return {
+                "success": False,
+                "error": f"خطا در تولید صدا: {e}"
+            }
+
+        return {
+            "success": True,
+            "audio_file": output_file,
+            "duration": round(offset, 2),
+            "text": text,
+            "voice": voice_name,
+            "sample_rate": sample_rate,
+            "words": len(text.split()),
+            "file_size": os.path.getsize(output_file),
+            "engine": "Piper TTS",
+            "sentences": sentences,
+            "timing_source": timing_source(sentences)
+        }
+
+    def stats(self):
+        """Loaded voices with their load time, hit count and memory, plus engine totals"""
+        with self.lock:
+            now = time.time()
+            voices = []
+            for model_path in self.voices:
+                stat = self.voice_stats[model_path]
+                voices.append({
+                    "voice": stat["voice"],
+                    "model": model_path,
+                    "memory_mb": round(stat["memory_bytes"] / (1024 * 1024), 1),
+                    "load_time": stat["load_time"],
+                    "hits": stat["hits"],
+                    "idle_seconds": round(now - stat["last_used"], 1)
+                })
+
+            return {
+                "voices": voices,
+                "total_memory_mb": round(self.total_memory_bytes() / (1024 * 1024), 1),
+                "max_memory_mb": round(self.max_memory_bytes / (1024 * 1024), 1) if self.max_memory_bytes else None,
+                "evictions": self.evictions,
+                "synthesized": self.synthesized
+            }
+
+def _process_rss_bytes():
+    """Current resident set size of this process in bytes (None where unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def split_sentences(text):
+    """Split text into non-empty sentences for incremental synthesis"""
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+def _synthesize_sentence(voice, sentence, alignments=False):
+    """
+    Synthesize one sentence to raw 16-bit PCM
+
+    Returns:
+        tuple: (pcm bytes, list of (phoneme, num_samples) or None when alignments are unavailable)
+    """
+    if not hasattr(voice, "synthesize_wav"):
+        # piper-tts < 1.3 streams raw audio through synthesize_stream_raw() and has no alignments
+        return b"".join(voice.synthesize_stream_raw(sentence)), None
+
+    chunks = None
+    if alignments:
+        try:
+            chunks = list(voice.synthesize(sentence, include_alignments=True))
+        except TypeError:
+            # Releases before alignment support take no include_alignments argument
+            chunks = None
+    if chunks is None:
+        chunks = list(voice.synthesize(sentence))
+
+    pcm = b"".join(chunk.audio_int16_bytes for chunk in chunks)
+    if not alignments:
+        return pcm, None
+
+    phonemes = []
+    for chunk in chunks:
+        chunk_alignments = getattr(chunk, "phoneme_alignments", None)
+        if not chunk_alignments:
+            # Voices exported without the alignment output return none
+            return pcm, None
+        phonemes.extend((alignment.phoneme, alignment.num_samples) for alignment in chunk_alignments)
+    return pcm, phonemes
+
+def timing_source(sentences):
+    """Overall timing source: alignment if every sentence was aligned, otherwise estimated"""
+    return "alignment" if sentences and all(s["timing"] == "alignment" for s in sentences) else "estimated"
+
+def wav_stream_header(sample_rate, channels=1, sample_width=2):
+    """
+    WAV header for a stream of unknown length
+
+    The RIFF and data sizes are set to the maximum value, which ffmpeg and browsers
+    read as "until end of stream".
+    """
+    byte_rate = sample_rate * channels * sample_width
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                                channels * sample_width, sample_width * 8)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+def stream_speech(text, output, voice_name=DEFAULT_VOICE, data_dir=None, stream_format="pcm"):
+    """
+    Write synthesized audio to a binary stream as each sentence finishes
+
+    Args:
+        text: Text to convert to speech
+        output: Binary file-like object (stdout buffer, socket file, pipe)
+        voice_name: Voice model name
+        data_dir: Directory containing voice models
+        stream_format: "pcm" for raw 16-bit mono samples, "wav" to prefix a streaming WAV header
+
+    Returns:
+        dict: Result with the per-sentence offset/duration map
+    """
+    if stream_format not in STREAM_FORMATS:
+        return {"success": False, "error": f"Unsupported stream format: {stream_format}"}
+    if not text or not text.strip():
+        return {"success": False, "error": "متن مورد نیاز است"}
+
+    engine = get_engine(data_dir=data_dir)
+    if engine is None:
+        return {"success": False, "error": "piper-tts is not installed; streaming needs the in-process engine"}
+
+    sentences = []
+    offset = 0.0
+    sample_rate = None
+    started = time.perf_counter()
+    try:
+        for chunk in engine.stream(text, voice_name, data_dir):
+            if sample_rate is None:
+                sample_rate = chunk["sample_rate"]
+                if stream_format == "wav":
+                    output.write(wav_stream_header(sample_rate))
+            output.write(chunk["pcm"])
+            output.flush()
+
+            duration = len(chunk["pcm"]) / (2.0 * sample_rate)
+            sentences.append({
+                "index": chunk["index"],
+                "text": chunk["text"],
+                "offset": round(offset, 3),
+                "duration": round(duration, 3)
+            })
+            if chunk["index"] == 0:
+                print(f"First audio after {time.perf_counter() - started:.3f}s", file=sys.stderr)
+            offset += duration
+    except (BrokenPipeError, ConnectionResetError):
+        return {"success": False, "error": "Stream closed by reader", "sentences": sentences}
+    except Exception as e:
+        print(f"Piper TTS error: {e}", file=sys.stderr)
+        return {"success": False, "error": f"خطا در تولید صدا: {e}", "sentences": sentences}
+
+    return {
+        "success": True,
+        "voice": voice_name,
+        "sample_rate": sample_rate,
+        "duration": round(offset, 2),
+        "format": stream_format,
+        "sentences": sentences,
+        "engine": "Piper TTS"
+    }
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine(data_dir=None, max_memory_mb=None, preload=None):
+    """
+    Return the process-wide PiperEngine, or None if piper-tts cannot be imported
+
+    The options only apply when the engine is first created. They default to the
+    PIPER_MAX_MEMORY_MB and PIPER_PRELOAD_VOICES (comma-separated) environment variables.
+    """
+    global _engine
+    if PiperVoice is None:
+        return None
+    with _engine_lock:
+        if _engine is None:
+            if max_memory_mb is None and os.environ.get("PIPER_MAX_MEMORY_MB"):
+                max_memory_mb = float(os.environ["PIPER_MAX_MEMORY_MB"])
+            if preload is None:
+                preload = [v.strip() for v in os.environ.get("PIPER_PRELOAD_VOICES", "").split(",") if v.strip()]
+            _engine = PiperEngine(data_dir=data_dir, max_memory_mb=max_memory_mb, preload=preload)
+        return _engine
+
+_tts_cache = None
+_tts_cache_opened = False
+
+def get_tts_cache():
+    """Return the shared TTS output cache, or None if it is disabled (TTS_NO_CACHE)"""
+    global _tts_cache, _tts_cache_opened
+    with _engine_lock:
+        if not _tts_cache_opened:
+            _tts_cache = open_tts_cache()
+            _tts_cache_opened = True
+        return _tts_cache
+
+def generate_speech(text, voice_name=DEFAULT_VOICE, output_file=None, data_dir=None, use_cache=True,
+                    timings=False):
     """
     Generate speech using Piper TTS
+
+    Voices are synthesized in-process by a resident PiperEngine; a `python -m piper`
+    subprocess is only used when the piper library cannot be imported. Repeated phrases
+    are served from the shared TTS cache as copies of the earlier audio.
     
     Args:
         text: Text to convert to speech
         voice_name: Voice model name (default: en_US-lessac-medium)
         output_file: Output file path (if None, will create temp file)
         data_dir: Directory containing voice models
+        use_cache: Consult and fill the TTS output cache
+        timings: Also return a "sentences" map with offsets, durations and word timings
+            (from Piper's phoneme alignments where the voice provides them, otherwise
+            spread by character count; see tts_subtitles)
     
     Returns:
         dict: Result with success status and file info
     """
+    cache = get_tts_cache() if use_cache and text and text.strip() else None
+    if cache is not None:
+        if output_file is None:
+            output_file = os.path.join(os.path.abspath(data_dir or os.getcwd()), f"piper_tts_{uuid.uuid4().hex}.wav")
+        cached = cache.get(_speech_cache_key(cache, text, voice_name, data_dir), output_file)
+        if cached is not None and (not timings or cached.get("sentences")):
+            result = dict(
+                cached,
+                success=True,
+                audio_file=output_file,
+                text=text,
+                voice=voice_name,
+                words=len(text.split()),
+                file_size=os.path.getsize(output_file),
+                engine="Piper TTS",
+                cached=True
+            )
+            if not timings:
+                result.pop("sentences", None)
+                result.pop("timing_source", None)
+            return result
+        if cached is not None:
+            # Cached without timings: synthesize again into a fresh file
+            os.remove(output_file)
+
+    engine = get_engine()
+    if engine is not None:
+        result = engine.synthesize(text, voice_name, output_file=output_file, data_dir=data_dir, timings=timings)
+    else:
+        result = _generate_speech_subprocess(text, voice_name, output_file, data_dir)
+
+    if timings and result.get("success") and "sentences" not in result:
+        result["sentences"] = tts_subtitles.estimate_timings(split_sentences(text), result["duration"])
+        result["timing_source"] = "estimated"
+
+    if cache is not None and result.get("success"):
+        metadata = {"duration": result["duration"], "sample_rate": result["sample_rate"]}
+        if result.get("sentences"):
+            metadata["sentences"] = result["sentences"]
+            metadata["timing_source"] = result["timing_source"]
+        # Keyed again: a voice downloaded by this call now has a checksum
+        cache.put(_speech_cache_key(cache, text, voice_name, data_dir), result["audio_file"], metadata)
+    return result
+
+def _speech_cache_key(cache, text, voice_name, data_dir):
+    """TTS cache key for Piper; the model checksum invalidates entries when a voice is updated"""
+    entry = get_voice_index().resolve(voice_name, data_dir)
+    return cache.make_key(text, voice_name, "piper", model=entry["checksum"] if entry else None)
+
+def _generate_speech_subprocess(text, voice_name, output_file=None, data_dir=None):
+    """Generate speech by running `python -m piper` once for this utterance"""
     try:
         if not text or not text.strip():
             return {
@@ -161,8 +731,10 @@ def generate_speech(text, voice_name="en_US-kristin-medium", output_file=None, d
         # Get file info
         file_size = os.path.getsize(output_file)
         
-        # Get actual duration using ffprobe
-        duration = get_audio_duration(output_file)
+        # Read the real duration and sample rate from the WAV header
+        info = probe_audio(output_file)
+        duration = info["duration"] if info else get_audio_duration(output_file)
+        sample_rate = info["sample_rate"] if info else None
         
         return {
             "success": True,
@@ -170,7 +742,7 @@ def generate_speech(text, voice_name="en_US-kristin-medium", output_file=None, d
             "duration": round(duration, 2),
             "text": text,
             "voice": voice_name,
-            "sample_rate": 16000,
+            "sample_rate": sample_rate,
             "words": len(text.split()),
             "file_size": file_size,
             "engine": "Piper TTS"
@@ -183,55 +755,563 @@ def generate_speech(text, voice_name="en_US-kristin-medium", output_file=None, d
             "error": f"خطای سیستم: {str(e)}"
         }
 
-def get_available_voices():
-    """Get list of available voices"""
+_catalog_attempted = False
+
+def get_available_voices(refresh=False):
+    """
+    Get list of available voices from the local voice index
+
+    The downloadable catalog is fetched once (or when refresh is True) and kept in the index;
+    later calls are in-memory lookups.
+
+    Args:
+        refresh: Re-fetch the catalog from the network
+
+    Returns:
+        list: Voices with id, display name, language, description, gender, installed
+            and sample_rate
+    """
+    global _catalog_attempted
+    index = get_voice_index()
     try:
-        result = subprocess.run([
-            sys.executable, '-m', 'piper.download_voices'
-        ], capture_output=True, text=True, encoding='utf-8', errors='replace')
-        
-        if result.returncode != 0:
-            return []
-        
-        voices = []
-        lines = result.stdout.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('Available voices:'):
-                # Parse voice name and description
-                parts = line.split(' - ', 1)
-                if len(parts) >= 1:
-                    voice_id = parts[0].strip()
-                    description = parts[1].strip() if len(parts) > 1 else voice_id
-                    
-                    # Determine language and gender from voice name
-                    language = "انگلیسی"
-                    gender = "زن"
-                    
-                    if "male" in voice_id.lower() or "man" in voice_id.lower():
-                        gender = "مرد"
-                    
-                    voices.append({
-                        "id": voice_id,
-                        "name": f"صدای {gender} - {description}",
-                        "language": language,
-                        "description": description
-                    })
-        
-        return voices
-        
+        if refresh or (index.catalog.get("updated") is None and not _catalog_attempted):
+            _catalog_attempted = True
+            index.refresh_catalog()
     except Exception as e:
         print(f"Error getting voices: {e}")
-        return []
+
+    voices = []
+    for voice in index.list_voices():
+        description = voice.get("description") or voice["name"]
+        gender = "مرد" if voice["gender"] == "male" else "زن"
+        voices.append({
+            "id": voice["name"],
+            "name": f"صدای {gender} - {description}",
+            "language": "فارسی" if voice["language"].startswith("fa") else "انگلیسی",
+            "description": description,
+            "gender": voice["gender"],
+            "installed": voice["installed"],
+            "sample_rate": voice.get("sample_rate")
+        })
+    return voices
+
+_batch_pool = None
+_batch_pool_workers = 0
+_batch_pool_lock = threading.Lock()
+
+def _init_batch_worker(data_dir, max_memory_mb):
+    """Create the resident engine of a batch worker process"""
+    get_engine(data_dir=data_dir, max_memory_mb=max_memory_mb)
+
+def _synthesize_batch_item(text, voice_name, output_file, data_dir):
+    """Synthesize one batch item in a worker process"""
+    return generate_speech(text, voice_name, output_file=output_file, data_dir=data_dir)
+
+def _get_batch_pool(workers, data_dir=None, max_memory_mb=None):
+    """Return the batch process pool, starting it (or resizing it) on demand"""
+    global _batch_pool, _batch_pool_workers
+    with _batch_pool_lock:
+        if _batch_pool is not None and _batch_pool_workers != workers:
+            _batch_pool.shutdown(wait=True)
+            _batch_pool = None
+        if _batch_pool is None:
+            # spawn rather than fork: forking with onnxruntime thread pools running can deadlock
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_batch_worker,
+                initargs=(data_dir, max_memory_mb)
+            )
+            _batch_pool_workers = workers
+        return _batch_pool
+
+def shutdown_batch_pool():
+    """Stop the batch worker processes, if any were started"""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is not None:
+            _batch_pool.shutdown(wait=False, cancel_futures=True)
+            _batch_pool = None
+
+def _normalize_batch_item(item, default_voice):
+    """Accept "text", (text, voice) or {"text": ..., "voice": ...} items"""
+    if isinstance(item, str):
+        return item, default_voice
+    if isinstance(item, dict):
+        return item.get("text", ""), item.get("voice") or default_voice
+    text, voice_name = (list(item) + [None])[:2]
+    return text, voice_name or default_voice
+
+def concatenate_wavs(wav_files, output_file, gap_seconds=0.0):
+    """
+    Join WAV files with identical formats into one file, streaming frames
+
+    Args:
+        wav_files: WAV paths in playback order
+        output_file: Path of the combined WAV
+        gap_seconds: Silence inserted between consecutive files
+
+    Returns:
+        list: (offset, duration) in seconds of each input within the output
+    """
+    timings = []
+    params = None
+    frames_written = 0
+    with wave.open(output_file, "wb") as out:
+        for i, path in enumerate(wav_files):
+            with wave.open(path, "rb") as part:
+                part_params = (part.getnchannels(), part.getsampwidth(), part.getframerate())
+                if params is None:
+                    params = part_params
+                    out.setnchannels(params[0])
+                    out.setsampwidth(params[1])
+                    out.setframerate(params[2])
+                elif part_params != params:
+                    raise ValueError(
+                        f"Cannot concatenate {path}: format {part_params} differs from {params}"
+                    )
+
+                if i > 0 and gap_seconds > 0:
+                    gap_frames = int(round(gap_seconds * params[2]))
+                    out.writeframes(b"\x00" * (gap_frames * params[0] * params[1]))
+                    frames_written += gap_frames
+
+                offset = frames_written / float(params[2])
+                while True:
+                    frames = part.readframes(1 << 16)
+                    if not frames:
+                        break
+                    out.writeframes(frames)
+                frames_written += part.getnframes()
+                timings.append((offset, part.getnframes() / float(params[2])))
+    return timings
+
+def generate_speech_batch(items, voice_name=DEFAULT_VOICE, output_dir=None, data_dir=None, workers=None,
+                          concatenate=False, output_file=None, gap_seconds=0.0, keep_parts=False,
+                          max_memory_mb=None):
+    """
+    Synthesize many texts in parallel across a process pool
+
+    Args:
+        items: List of "text", (text, voice) or {"text", "voice"} items
+        voice_name: Voice for items that do not name one
+        output_dir: Directory for the generated files (defaults to data_dir)
+        data_dir: Directory containing voice models
+        workers: Worker processes (defaults to the CPU count, capped at the number of items)
+        concatenate: Also join the items into one WAV
+        output_file: Path of the combined WAV (if None, a unique file is created in output_dir)
+        gap_seconds: Silence between items in the combined WAV
+        keep_parts: Keep the per-item files after concatenating
+        max_memory_mb: Voice memory budget of each worker's engine
+
+    Returns:
+        dict: Result with one entry per item; with concatenate, each item also carries its
+            offset and duration within audio_file
+    """
+    try:
+        pairs = [_normalize_batch_item(item, voice_name) for item in items]
+        if not pairs:
+            return {
+                "success": False,
+                "error": "متن مورد نیاز است"
+            }
+
+        data_dir = data_dir or os.getcwd()
+        output_dir = os.path.abspath(output_dir or data_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        batch_id = uuid.uuid4().hex
+        part_files = [
+            os.path.join(output_dir, f"piper_tts_{batch_id}_{i:03d}.wav") for i in range(len(pairs))
+        ]
+
+        workers = min(workers or os.cpu_count() or 1, len(pairs))
+        started = time.perf_counter()
+        if workers < 2:
+            results = [
+                generate_speech(text, voice, output_file=part, data_dir=data_dir)
+                for (text, voice), part in zip(pairs, part_files)
+            ]
+        else:
+            # Each worker downloads missing voices itself; fetch them once up front instead
+            for voice in dict.fromkeys(voice for _, voice in pairs):
+                if find_voice_files(voice, data_dir) is None:
+                    download_voice_if_needed(voice, data_dir)
+
+            print(f"Batch synthesis: {len(pairs)} items across {workers} workers", file=sys.stderr)
+            pool = _get_batch_pool(workers, data_dir, max_memory_mb)
+            futures = [
+                pool.submit(_synthesize_batch_item, text, voice, part, data_dir)
+                for (text, voice), part in zip(pairs, part_files)
+            ]
+            results = [future.result() for future in futures]
+
+        for i, result in enumerate(results):
+            result["index"] = i
+
+        failed = [result for result in results if not result.get("success")]
+        batch = {
+            "success": not failed,
+            "items": results,
+            "count": len(results),
+            "failed": len(failed),
+            "workers": workers,
+            "elapsed": round(time.perf_counter() - started, 3),
+            "engine": "Piper TTS"
+        }
+        if failed:
+            batch["error"] = failed[0].get("error")
+            return batch
+
+        if concatenate:
+            if output_file is None:
+                output_file = os.path.join(output_dir, f"piper_tts_{batch_id}.wav")
+            timings = concatenate_wavs([result["audio_file"] for result in results], output_file, gap_seconds)
+            for result, (offset, duration) in zip(results, timings):
+                result["offset"] = round(offset, 3)
+                result["duration"] = round(duration, 3)
+                if not keep_parts:
+                    os.remove(result.pop("audio_file"))
+                    result.pop("file_size", None)
+
+            info = probe_audio(output_file)
+            batch["sample_rate"] = info["sample_rate"]
+            batch["duration"] = round(info["duration"], 2)
+            batch["audio_file"] = output_file
+            batch["file_size"] = os.path.getsize(output_file)
+
+        return batch
+
+    except Exception as e:
+        print(f"Exception in generate_speech_batch: {e}", file=sys.stderr)
+        return {
+            "success": False,
+            "error": f"خطای سیستم: {str(e)}"
+        }
+
+class PiperWorker:
+    """
+    Long-running worker that answers synthesis jobs with a resident PiperEngine.
+
+    Jobs are JSON objects:
+        {"id": "...", "text": "...", "voice": "en_US-kristin-medium",
+         "output_dir": "...", "unique_suffix": "...", "output_file": null}
+
+    Batch jobs carry "items" (strings, [text, voice] pairs or {"text", "voice"} objects)
+    instead of "text", plus optional "concatenate", "gap_seconds", "workers" and "keep_parts"
+    (see generate_speech_batch).
+
+    With a fallback chain (see tts_engine.TTSRouter), single-text jobs go to the first
+    healthy engine of the chain instead of always to Piper.
+
+    Single-text jobs with "timings": true also get the sentence map and Whisper-shaped
+    "segments" for subtitles (see tts_subtitles), and "subtitle_formats" (e.g. ["srt", "vtt"])
+    writes those files next to the audio. Routed jobs get estimated timings.
+
+    Control messages use a "command" key instead ("ping", "status", "shutdown").
+    """
+
+    def __init__(self, data_dir=None, max_memory_mb=None, preload=None, chain=None):
+        self.data_dir = data_dir
+        self.engine = get_engine(data_dir=data_dir, max_memory_mb=max_memory_mb, preload=preload)
+        self.router = None
+        if chain:
+            from tts_engine import TTSRouter
+            self.router = TTSRouter(chain)
+
+    def handle(self, job):
+        """
+        Run a single job
+
+        Args:
+            job (dict): Job description (see class docstring)
+
+        Returns:
+            dict: generate_speech() result, tagged with the job id and elapsed seconds
+        """
+        job_id = job.get("id")
+
+        command = job.get("command")
+        if command == "ping":
+            return {"id": job_id, "success": True, "in_process": self.engine is not None}
+        if command == "status":
+            stats = self.engine.stats() if self.engine is not None else {"voices": [], "synthesized": 0}
+            cache = get_tts_cache()
+            return dict(stats, id=job_id, success=True, in_process=self.engine is not None,
+                        cache=cache.stats() if cache else None,
+                        routing=self.router.stats() if self.router else None)
+        if command == "shutdown":
+            return {"id": job_id, "success": True, "shutdown": True}
+        if command:
+            return {"id": job_id, "success": False, "error": f"Unknown command: {command}"}
+
+        output_dir = job.get("output_dir") or self.data_dir
+        if "items" in job:
+            started = time.perf_counter()
+            result = generate_speech_batch(
+                job["items"],
+                voice_name=job.get("voice") or DEFAULT_VOICE,
+                output_dir=output_dir,
+                data_dir=output_dir,
+                workers=job.get("workers"),
+                concatenate=bool(job.get("concatenate", False)),
+                output_file=job.get("output_file"),
+                gap_seconds=float(job.get("gap_seconds", 0.0)),
+                keep_parts=bool(job.get("keep_parts", False))
+            )
+            result["id"] = job_id
+            result["elapsed"] = round(time.perf_counter() - started, 3)
+            return result
+
+        output_file = job.get("output_file")
+        if not output_file and output_dir and job.get("unique_suffix"):
+            output_file = os.path.join(os.path.abspath(output_dir), f"piper_tts_{job['unique_suffix']}.wav")
+
+        started = time.perf_counter()
+        if self.router is not None:
+            result = self.router.synthesize(
+                job.get("text", ""),
+                job.get("voice") or DEFAULT_VOICE,
+                output_dir or os.getcwd(),
+                output_file=output_file
+            )
+        else:
+            result = generate_speech(
+                job.get("text", ""),
+                job.get("voice") or DEFAULT_VOICE,
+                output_file=output_file,
+                data_dir=output_dir,
+                timings=bool(job.get("timings"))
+            )
+        if job.get("timings") and result.get("success"):
+            self._add_subtitles(result, job.get("subtitle_formats") or [])
+        result["id"] = job_id
+        result["elapsed"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def _add_subtitles(self, result, subtitle_formats):
+        """Attach Whisper-shaped segments and write the requested subtitle files next to the audio"""
+        if "sentences" not in result:
+            # Engines other than Piper report no timings; spread the duration over the text
+            result["sentences"] = tts_subtitles.estimate_timings(split_sentences(result["text"]), result["duration"])
+            result["timing_source"] = "estimated"
+        result["segments"] = tts_subtitles.speech_segments(result["sentences"])
+        if subtitle_formats:
+            stem = os.path.splitext(result["audio_file"])[0]
+            result["subtitles"] = tts_subtitles.export_subtitles(
+                result, {fmt: f"{stem}.{fmt}" for fmt in subtitle_formats}
+            )
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """Serve JSON-lines jobs from stdin, writing one JSON result line per job"""
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+
+            response = self._handle_line(line)
+            stdout.write(json.dumps(response, ensure_ascii=True) + "\n")
+            stdout.flush()
+
+            if response.get("shutdown"):
+                break
+
+    def serve_socket(self, socket_path):
+        """Serve JSON-lines jobs over a local Unix socket"""
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    line = raw.decode("utf-8").strip()
+                    if not line:
+                        continue
+
+                    response = worker._handle_line(line)
+                    self.wfile.write((json.dumps(response, ensure_ascii=True) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+                    if response.get("shutdown"):
+                        threading.Thread(target=self.server.shutdown, daemon=True).start()
+                        break
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+        server.daemon_threads = True
+        print(f"Piper worker listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    def _handle_line(self, line):
+        """Decode one JSON-lines request and run it"""
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"success": False, "error": f"Invalid JSON: {e}"}
+
+        if not isinstance(job, dict):
+            return {"success": False, "error": "Job must be a JSON object"}
+
+        try:
+            return self.handle(job)
+        except Exception as e:
+            print(f"Error handling job: {e}", file=sys.stderr)
+            return {"id": job.get("id"), "success": False, "error": str(e)}
+
+def serve(argv):
+    """Run the JSON-lines worker: piper_tts.py --serve [options] (see --help)"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Resident Piper TTS worker (JSON lines)")
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of stdin/stdout")
+    parser.add_argument("--data-dir", help="Default directory for voice models and output")
+    parser.add_argument("--max-memory-mb", type=float,
+                        help="Unload least-recently-used voices above this RAM budget")
+    parser.add_argument("--preload", help="Comma-separated voices to load at startup")
+    parser.add_argument("--chain", help="Comma-separated TTS fallback chain, e.g. piper,pyttsx3,espeak "
+                                        "(default: Piper only)")
+    args = parser.parse_args(argv)
+
+    # Keep stdout reserved for JSON-lines responses
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    preload = [v.strip() for v in args.preload.split(",") if v.strip()] if args.preload else None
+    chain = [name.strip() for name in args.chain.split(",") if name.strip()] if args.chain else None
+    worker = PiperWorker(data_dir=args.data_dir, max_memory_mb=args.max_memory_mb, preload=preload, chain=chain)
+    if args.socket:
+        worker.serve_socket(args.socket)
+    else:
+        worker.serve_stdio(stdout=protocol_out)
+
+def run_stream_cli(argv):
+    """Stream audio for one text: piper_tts.py --stream TEXT [options]"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Streaming Piper TTS synthesis")
+    parser.add_argument("--stream", metavar="TEXT", nargs="?",
+                        help="Text to speak ('-' for stdin); omit with --socket to serve requests")
+    parser.add_argument("--voice", default=DEFAULT_VOICE, help="Voice model name")
+    parser.add_argument("--data-dir", help="Directory containing voice models")
+    parser.add_argument("--format", choices=STREAM_FORMATS, default="pcm",
+                        help="Raw 16-bit mono PCM or a streaming WAV (default: pcm)")
+    parser.add_argument("--socket",
+                        help="Serve streams on this Unix socket: each connection sends one JSON line "
+                             "({text, voice, format}) and receives the audio bytes")
+    args = parser.parse_args(argv)
+
+    # Audio owns stdout; progress and the sentence map go to stderr
+    audio_out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+
+    if args.socket:
+        serve_stream_socket(args.socket, data_dir=args.data_dir)
+        return
+
+    if args.stream is None:
+        parser.error("--stream needs TEXT unless --socket is given")
+    text = sys.stdin.read() if args.stream == "-" else args.stream
+    result = stream_speech(text, audio_out, args.voice, args.data_dir, args.format)
+    print(json.dumps(result, ensure_ascii=True), file=sys.stderr)
+    if not result["success"]:
+        sys.exit(1)
+
+def serve_stream_socket(socket_path, data_dir=None):
+    """Serve one streaming synthesis per connection on a local Unix socket"""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                job = json.loads(self.rfile.readline().decode("utf-8"))
+            except ValueError as e:
+                print(f"Invalid stream request: {e}", file=sys.stderr)
+                return
+            result = stream_speech(
+                job.get("text", ""),
+                self.wfile,
+                job.get("voice") or DEFAULT_VOICE,
+                job.get("data_dir") or data_dir,
+                job.get("format", "pcm")
+            )
+            print(json.dumps(result, ensure_ascii=True), file=sys.stderr)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    print(f"Piper stream server listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def run_batch_cli(argv):
+    """Synthesize a JSON list of items: piper_tts.py --batch ITEMS.json [options]"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Batch Piper TTS synthesis")
+    parser.add_argument("--batch", required=True, help="JSON file with a list of items ('-' for stdin)")
+    parser.add_argument("--voice", default=DEFAULT_VOICE, help="Voice for items that do not name one")
+    parser.add_argument("--output-dir", help="Directory for generated files and voice models")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--concat", metavar="OUTPUT", nargs="?", const="",
+                        help="Join the items into one WAV (optionally at OUTPUT)")
+    parser.add_argument("--gap", type=float, default=0.0, help="Seconds of silence between joined items")
+    parser.add_argument("--keep-parts", action="store_true", help="Keep per-item files after joining")
+    args = parser.parse_args(argv)
+
+    if args.batch == "-":
+        items = json.load(sys.stdin)
+    else:
+        with open(args.batch, "r", encoding="utf-8") as f:
+            items = json.load(f)
+
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    result = generate_speech_batch(
+        items,
+        voice_name=args.voice,
+        output_dir=args.output_dir,
+        data_dir=args.output_dir,
+        workers=args.workers,
+        concatenate=args.concat is not None,
+        output_file=args.concat or None,
+        gap_seconds=args.gap,
+        keep_parts=args.keep_parts
+    )
+    shutdown_batch_pool()
+    protocol_out.write(json.dumps(result, ensure_ascii=True) + "\n")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python piper_tts.py <text> [voice] [output_dir]")
+        print("       python piper_tts.py --stream TEXT [--voice V] [--format pcm|wav] [--socket PATH]")
+        print("       python piper_tts.py --batch ITEMS.json [--output-dir DIR] [--concat [OUTPUT]] [--workers N]")
+        print("       python piper_tts.py --serve [--socket PATH] [--data-dir DIR] [--max-memory-mb MB] [--preload V1,V2]")
         sys.exit(1)
+
+    if sys.argv[1] == "--serve":
+        serve(sys.argv[1:])
+        sys.exit(0)
+
+    if sys.argv[1] == "--stream":
+        run_stream_cli(sys.argv[1:])
+        sys.exit(0)
+
+    if sys.argv[1] == "--batch":
+        run_batch_cli(sys.argv[1:])
+        sys.exit(0)
     
     text = sys.argv[1]
-    voice = sys.argv[2] if len(sys.argv) > 2 else "en_US-kristin-medium"
+    voice = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_VOICE
     output_dir = sys.argv[3] if len(sys.argv) > 3 else None
     unique_suffix = sys.argv[4] if len(sys.argv) > 4 else None
     
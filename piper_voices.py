@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Persistent index of local Piper voices
+Records each downloaded voice's model and config paths, language, gender, sample rate and
+checksum, plus a cached copy of the Piper voice catalog, so resolving and listing voices
+are in-memory lookups that never touch the network
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import subprocess
+import threading
+import uuid
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "piper_voices", "index.json")
+HASH_CHUNK_SIZE = 1 << 20
+
+# Piper configs carry no speaker gender; these are the voices offered in routes/kokoro.js
+KNOWN_GENDERS = {
+    "fa_IR-amir-medium": "male",
+    "fa_IR-ganji-medium": "male",
+    "fa_IR-ganji_adabi-medium": "male",
+    "fa_IR-gyro-medium": "male",
+    "fa_IR-reza_ibrahim-medium": "male",
+    "en_US-kristin-medium": "female",
+    "en_US-lessac-medium": "female",
+    "en_US-lessac-high": "female",
+    "en_US-john-medium": "male",
+    "en_US-ryan-high": "male",
+    "en_US-norman-medium": "male",
+    "en_US-kusal-medium": "male",
+}
+
+def file_checksum(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def guess_gender(voice_name):
+    """Gender from the known voice table, falling back to the name"""
+    if voice_name in KNOWN_GENDERS:
+        return KNOWN_GENDERS[voice_name]
+    lowered = voice_name.lower()
+    if "female" in lowered or "woman" in lowered:
+        return "female"
+    if "male" in lowered or "man" in lowered:
+        return "male"
+    return "unknown"
+
+class VoiceIndex:
+    def __init__(self, index_path=None):
+        """
+        Load the voice index
+
+        Args:
+            index_path (str): JSON index file (defaults to $PIPER_VOICE_INDEX
+                or ~/.cache/piper_voices/index.json)
+        """
+        self.index_path = index_path or os.environ.get("PIPER_VOICE_INDEX") or DEFAULT_INDEX_PATH
+        self.lock = threading.RLock()
+        self.voices = {}
+        self.catalog = {"updated": None, "voices": []}
+        self._load()
+
+    def resolve(self, voice_name, data_dir=None):
+        """
+        Find an indexed voice
+
+        Args:
+            voice_name (str): Voice name (e.g. fa_IR-amir-medium)
+            data_dir (str): Preferred directory when the voice exists in several places
+
+        Returns:
+            dict: Index entry (re-indexed if the files changed), or None if the voice is not downloaded
+        """
+        with self.lock:
+            matches = [entry for entry in self.voices.values() if entry["name"] == voice_name]
+        if data_dir:
+            preferred = os.path.abspath(data_dir)
+            matches.sort(key=lambda entry: os.path.dirname(entry["model_path"]) != preferred)
+
+        for entry in matches:
+            try:
+                # add() compares size and mtimes with the files on disk and only
+                # recomputes the checksum when a voice was replaced
+                return self.add(entry["model_path"], entry["config_path"])
+            except (OSError, ValueError):
+                # The files were deleted or broken behind our back
+                self.remove(entry["model_path"])
+        return None
+
+    def add(self, model_path, config_path=None, save=True):
+        """
+        Index one voice, reusing the stored checksum when the model file is unchanged
+
+        Args:
+            model_path (str): Path to the .onnx model
+            config_path (str): Path to its JSON config (defaults to <model>.json)
+            save (bool): Write the index file afterwards
+
+        Returns:
+            dict: The index entry
+        """
+        model_path = os.path.abspath(model_path)
+        config_path = os.path.abspath(config_path or f"{model_path}.json")
+        stat = os.stat(model_path)
+        config_mtime = os.path.getmtime(config_path)
+
+        with self.lock:
+            previous = self.voices.get(model_path)
+        if (previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime
+                and previous.get("config_mtime") == config_mtime):
+            return previous
+
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        name = os.path.basename(model_path)[:-len(".onnx")]
+        language = config.get("language") or {}
+        audio = config.get("audio") or {}
+        entry = {
+            "name": name,
+            "model_path": model_path,
+            "config_path": config_path,
+            "language": language.get("code") or (config.get("espeak") or {}).get("voice") or name.split("-")[0],
+            "language_name": language.get("name_english"),
+            "gender": guess_gender(name),
+            "quality": audio.get("quality") or name.rsplit("-", 1)[-1],
+            "sample_rate": audio.get("sample_rate"),
+            "num_speakers": config.get("num_speakers", 1),
+            "checksum": file_checksum(model_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "config_mtime": config_mtime
+        }
+
+        with self.lock:
+            self.voices[model_path] = entry
+        if save:
+            self.save()
+        return entry
+
+    def remove(self, model_path):
+        """Drop an entry from the index"""
+        with self.lock:
+            removed = self.voices.pop(os.path.abspath(model_path), None)
+        if removed:
+            self.save()
+
+    def refresh(self, directories):
+        """
+        Rescan directories for downloaded voices and forget voices whose files are gone
+
+        Args:
+            directories (list): Directories to scan for <voice>.onnx + <voice>.onnx.json
+
+        Returns:
+            int: Number of indexed voices
+        """
+        found = set()
+        for directory in directories:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for filename in names:
+                model_path = os.path.abspath(os.path.join(directory, filename))
+                if filename.endswith(".onnx") and os.path.exists(f"{model_path}.json"):
+                    try:
+                        self.add(model_path, save=False)
+                        found.add(model_path)
+                    except (OSError, ValueError) as e:
+                        print(f"Skipping voice {filename}: {e}", file=sys.stderr)
+
+        scanned = {os.path.abspath(directory) for directory in directories}
+        with self.lock:
+            for model_path in list(self.voices):
+                if os.path.dirname(model_path) in scanned and model_path not in found:
+                    del self.voices[model_path]
+                elif not os.path.exists(model_path):
+                    del self.voices[model_path]
+        self.save()
+        return len(self.voices)
+
+    def refresh_catalog(self):
+        """
+        Fetch the list of downloadable voices once and keep it in the index
+
+        This is the only operation that needs the network.
+
+        Returns:
+            int: Number of catalog voices
+        """
+        result = subprocess.run([
+            sys.executable, '-m', 'piper.download_voices'
+        ], capture_output=True, text=True, encoding='utf-8', errors='replace')
+        if result.returncode != 0:
+            raise RuntimeError(f"Could not list Piper voices: {result.stderr.strip()}")
+
+        voices = []
+        for line in result.stdout.split('\n'):
+            line = line.strip()
+            if line and not line.startswith('Available voices:'):
+                parts = line.split(' - ', 1)
+                voice_id = parts[0].strip()
+                voices.append({
+                    "id": voice_id,
+                    "description": parts[1].strip() if len(parts) > 1 else voice_id
+                })
+
+        with self.lock:
+            self.catalog = {"updated": time.time(), "voices": voices}
+        self.save()
+        return len(voices)
+
+    def list_voices(self):
+        """
+        Every known voice, downloaded ones first
+
+        Returns:
+            list: Index entries with installed=True, then catalog voices with installed=False
+        """
+        with self.lock:
+            installed = [dict(entry, installed=True) for entry in self.voices.values()]
+            catalog = list(self.catalog["voices"])
+
+        names = {entry["name"] for entry in installed}
+        available = [
+            {
+                "name": voice["id"],
+                "description": voice["description"],
+                "language": voice["id"].split("-")[0],
+                "gender": guess_gender(voice["id"]),
+                "installed": False
+            }
+            for voice in catalog if voice["id"] not in names
+        ]
+        return sorted(installed, key=lambda entry: entry["name"]) + available
+
+    def save(self):
+        """Write the index atomically"""
+        with self.lock:
+            data = {"version": INDEX_VERSION, "voices": self.voices, "catalog": self.catalog}
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        temp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Error writing voice index: {e}", file=sys.stderr)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.voices = data.get("voices", {})
+        self.catalog = data.get("catalog") or self.catalog
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_voice_index():
+    """Return the process-wide VoiceIndex"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = VoiceIndex()
+        return _index
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local Piper voice index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refresh = subparsers.add_parser("refresh", help="Rescan voice directories")
+    refresh.add_argument("directories", nargs="*", help="Directories to scan (default: current directory)")
+    refresh.add_argument("--catalog", action="store_true", help="Also refresh the downloadable voice catalog")
+
+    subparsers.add_parser("list", help="List indexed and catalog voices")
+    args = parser.parse_args()
+
+    index = get_voice_index()
+    if args.command == "refresh":
+        count = index.refresh(args.directories or [os.getcwd()])
+        result = {"success": True, "voices": count}
+        if args.catalog:
+            result["catalog"] = index.refresh_catalog()
+        print(json.dumps(result))
+    elif args.command == "list":
+        print(json.dumps(index.list_voices(), ensure_ascii=False, indent=2))
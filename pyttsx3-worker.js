@@ -0,0 +1,14 @@
+const { PiperWorkerClient } = require('./piper-worker');
+
+/**
+ * pyttsx3 Worker Client
+ * پروسه‌ی دائمی pyttsx3_tts.py --serve که موتور را یک بار راه‌اندازی می‌کند و
+ * درخواست‌های هم‌زمان را در یک چرخه‌ی runAndWait با هم می‌سازد
+ */
+const pyttsx3Worker = new PiperWorkerClient(120000, {
+    script: 'pyttsx3_tts.py',
+    label: 'pyttsx3 Worker',
+    args: () => []
+});
+
+module.exports = pyttsx3Worker;
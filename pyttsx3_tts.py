@@ -5,83 +5,422 @@ Real TTS using pyttsx3 - Produces actual human-like speech
 
 import sys
 import os
+import re
 import json
+import time
+import queue
+import threading
 import pyttsx3
 import tempfile
 from pathlib import Path
 
-def main():
-    try:
-        # Get input from command line arguments
-        if len(sys.argv) < 2:
-            print(json.dumps({"error": "No text provided"}))
-            sys.exit(1)
-        
-        text = sys.argv[1]
-        voice = sys.argv[2] if len(sys.argv) > 2 else 'af_heart_0'
-        output_dir = sys.argv[3] if len(sys.argv) > 3 else './uploads/audio'
-        
-        # Ensure output directory exists
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Initialize TTS engine
-        engine = pyttsx3.init()
-        
-        # Get available voices
-        voices = engine.getProperty('voices')
-        
-        # Set voice (try to find a good English voice)
-        if voices:
-            # Look for English voices
-            english_voices = [v for v in voices if 'en' in v.id.lower() or 'english' in v.name.lower()]
-            if english_voices:
-                engine.setProperty('voice', english_voices[0].id)
-            else:
-                engine.setProperty('voice', voices[0].id)
-        
-        # Set speech rate and volume
-        engine.setProperty('rate', 150)  # Speed of speech
-        engine.setProperty('volume', 0.9)  # Volume level (0.0 to 1.0)
-        
-        # Calculate duration
-        words = len(text.split())
-        duration = max(2.0, words * 0.5)
+from audio_probe import probe_audio
+from tts_cache import open_tts_cache
+
+RATE = 150  # Speed of speech
+VOLUME = 0.9  # Volume level (0.0 to 1.0)
+DEFAULT_VOICE = 'af_heart_0'
+# Upper bound on the utterances queued for one runAndWait cycle
+MAX_BATCH = 64
+# Labels that name a language: "fa", "en-GB", "fa_IR-amir-medium". Kokoro ids such as
+# af_heart_0 or bm_george (American/British English) do not, and get the default voice.
+LOCALE_VOICE_PATTERN = re.compile(r"^([a-z]{2,3})(?:[_-][A-Z]{2}(?![A-Za-z])|$)")
+
+_engine = None
+_default_voice_id = None
+_voices = {}
+_resolved_voices = {}
+
+def get_engine():
+    """Initialize the pyttsx3 engine once per process and configure voice, rate and volume"""
+    global _engine, _default_voice_id
+    if _engine is not None:
+        return _engine
+
+    engine = pyttsx3.init()
+    
+    # Get available voices
+    voices = engine.getProperty('voices') or []
+    for v in voices:
+        _voices[v.id] = v
+    
+    # Set voice (try to find a good English voice)
+    if voices:
+        # Look for English voices
+        english_voices = [v for v in voices if 'en' in v.id.lower() or 'english' in v.name.lower()]
+        if english_voices:
+            _default_voice_id = english_voices[0].id
+        else:
+            _default_voice_id = voices[0].id
+        engine.setProperty('voice', _default_voice_id)
+    
+    # Set speech rate and volume
+    engine.setProperty('rate', RATE)
+    engine.setProperty('volume', VOLUME)
+    
+    _engine = engine
+    return engine
+
+def resolve_voice(voice):
+    """
+    Map a requested voice to a driver voice id, enumerating the driver's voices only once
+    
+    A voice matches by driver id, by name (case-insensitive) or, for locale labels
+    (e.g. "fa" or "fa_IR-amir-medium"), by language; anything else, including the
+    Kokoro ids the routes send, gets the default English voice.
+    
+    Args:
+        voice: Requested voice label
+    
+    Returns:
+        str: Driver voice id, or None if the driver reports no voices
+    """
+    get_engine()
+    if voice in _resolved_voices:
+        return _resolved_voices[voice]
+
+    wanted = (voice or '').lower()
+    locale = LOCALE_VOICE_PATTERN.match(voice or '')
+    language = locale.group(1) if locale else None
+    voice_id = None
+    for v in _voices.values():
+        if v.id.lower() == wanted or (v.name or '').lower() == wanted:
+            voice_id = v.id
+            break
+    if voice_id is None and language:
+        for v in _voices.values():
+            languages = [
+                lang.decode('utf-8', 'ignore') if isinstance(lang, bytes) else str(lang)
+                for lang in (getattr(v, 'languages', None) or [])
+            ]
+            # The eSpeak driver reports languages as bytes with a leading priority byte (b"\x05en")
+            if any(lang.lower().lstrip('\x05').startswith(language) for lang in languages):
+                voice_id = v.id
+                break
+
+    _resolved_voices[voice] = voice_id or _default_voice_id
+    return _resolved_voices[voice]
+
+def _speech_result(text, voice, output_file, duration, sample_rate, cached=False):
+    result = {
+        "success": True,
+        "audio_file": output_file,
+        "duration": duration,
+        "text": text,
+        "voice": voice,
+        "sample_rate": sample_rate,
+        "words": len(text.split()),
+        "file_size": os.path.getsize(output_file),
+        "engine": "pyttsx3 TTS"
+    }
+    if cached:
+        result["cached"] = True
+    return result
+
+def generate_speech_batch(jobs, output_dir='./uploads/audio'):
+    """
+    Render many utterances in a single runAndWait cycle
+    
+    Every job is queued with save_to_file (after switching to its voice), then the
+    engine runs once. Cached phrases are served without touching the engine.
+    
+    Args:
+        jobs: List of dicts with "text" and optional "voice" and "output_file"
+        output_dir: Directory for files of jobs without an output_file
+    
+    Returns:
+        list: One generate_speech() result per job, in order
+    """
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+    
+    cache = open_tts_cache()
+    results = [None] * len(jobs)
+    pending = []
+    for index, job in enumerate(jobs):
+        text = job.get("text") or ""
+        voice = job.get("voice") or DEFAULT_VOICE
+        if not text.strip():
+            results[index] = {"success": False, "error": "No text provided"}
+            continue
         
         # Generate output filename
-        output_file = os.path.join(output_dir, f'pyttsx3_tts_{int(os.urandom(4).hex(), 16)}.wav')
+        output_file = job.get("output_file") or os.path.join(
+            output_dir, f'pyttsx3_tts_{int(os.urandom(4).hex(), 16)}.wav'
+        )
         
-        # Generate speech and save to file
+        # Serve repeated phrases from the shared TTS cache without starting the engine
+        cache_key = (
+            cache.make_key(text, voice, "pyttsx3", platform=sys.platform, rate=RATE, volume=VOLUME) if cache else None
+        )
+        cached = cache.get(cache_key, output_file) if cache else None
+        if cached:
+            results[index] = _speech_result(text, voice, output_file, cached.get("duration"),
+                                            cached.get("sample_rate"), cached=True)
+            continue
+        pending.append((index, text, voice, output_file, cache_key))
+    
+    if not pending:
+        return results
+    
+    # Queue every utterance, then render them all in one cycle
+    started = time.perf_counter()
+    engine = get_engine()
+    # Driver start-up, reported so callers can tell it apart from rendering time
+    load_time = round(time.perf_counter() - started, 3)
+    for index, text, voice, output_file, _ in pending:
+        voice_id = resolve_voice(voice)
+        if voice_id:
+            engine.setProperty('voice', voice_id)
+        # A leftover file would be mistaken for a successful render
+        if os.path.exists(output_file):
+            os.remove(output_file)
         engine.save_to_file(text, output_file)
+    
+    error = None
+    try:
         engine.runAndWait()
-        
+    except Exception as e:
+        error = str(e)
+        print(f"pyttsx3 render failed: {error}", file=sys.stderr)
+    
+    for index, text, voice, output_file, cache_key in pending:
         # Check if file was created
-        if not os.path.exists(output_file):
-            print(json.dumps({"error": "Audio file was not created"}))
-            sys.exit(1)
+        if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+            results[index] = {"success": False, "error": error or "Audio file was not created"}
+            continue
         
-        # Get file size
-        file_size = os.path.getsize(output_file)
+        # Read the real duration and sample rate from the file header,
+        # falling back to a speaking-rate estimate for formats it cannot parse
+        info = probe_audio(output_file)
+        duration = round(info["duration"], 2) if info else max(2.0, len(text.split()) * 0.5)
+        sample_rate = info["sample_rate"] if info else 22050
+        results[index] = _speech_result(text, voice, output_file, duration, sample_rate)
+        results[index]["load_time"] = load_time
         
-        # Return result
-        result = {
-            "success": True,
-            "audio_file": output_file,
-            "duration": duration,
-            "text": text,
-            "voice": voice,
-            "sample_rate": 22050,
-            "words": words,
-            "file_size": file_size,
-            "engine": "pyttsx3 TTS"
+        if cache:
+            cache.put(cache_key, output_file, {"duration": duration, "sample_rate": sample_rate})
+    
+    return results
+
+def generate_speech(text, voice=DEFAULT_VOICE, output_dir='./uploads/audio', output_file=None):
+    """
+    Generate speech with pyttsx3
+    
+    Args:
+        text: Text to convert to speech
+        voice: Voice id, name or language (see resolve_voice); echoed in the result
+        output_dir: Directory for the generated file
+        output_file: Output file path (if None, a unique file is created in output_dir)
+    
+    Returns:
+        dict: Result with success status and file info, or an error
+    """
+    return generate_speech_batch([{"text": text, "voice": voice, "output_file": output_file}], output_dir)[0]
+
+class Pyttsx3Worker:
+    """
+    Long-running pyttsx3 worker speaking the same JSON-lines protocol as PiperWorker.
+
+    Jobs are JSON objects:
+        {"id": "...", "text": "...", "voice": "...", "output_dir": "...", "output_file": null}
+    or batch jobs with "items" (strings or {"text", "voice", "output_file"} objects).
+
+    The driver is initialized once. Jobs that arrive while a cycle is rendering are
+    queued and rendered together with a single runAndWait. Every items entry counts as
+    one utterance, and no cycle renders more than max_batch utterances; a larger batch
+    job is split over several cycles.
+
+    Control messages use a "command" key instead ("ping", "status", "shutdown").
+    """
+
+    def __init__(self, output_dir='./uploads/audio', max_batch=MAX_BATCH):
+        self.output_dir = output_dir
+        self.max_batch = max_batch
+        self.cycles = 0
+        self.rendered = 0
+        get_engine()
+
+    def handle_lines(self, lines):
+        """
+        Run a group of JSON-lines requests, rendering their utterances in as few cycles
+        as max_batch allows
+
+        Returns:
+            list: One response per line, in order
+        """
+        responses = [None] * len(lines)
+        requests = []
+        jobs = []
+        for position, line in enumerate(lines):
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                responses[position] = {"success": False, "error": f"Invalid JSON: {e}"}
+                continue
+            if not isinstance(job, dict):
+                responses[position] = {"success": False, "error": "Job must be a JSON object"}
+                continue
+
+            job_id = job.get("id")
+            command = job.get("command")
+            if command == "ping":
+                responses[position] = {"id": job_id, "success": True}
+            elif command == "status":
+                responses[position] = dict(self.stats(), id=job_id, success=True)
+            elif command == "shutdown":
+                responses[position] = {"id": job_id, "success": True, "shutdown": True}
+                # Lines after a shutdown request are not run
+                break
+            elif command:
+                responses[position] = {"id": job_id, "success": False, "error": f"Unknown command: {command}"}
+            else:
+                output_dir = job.get("output_dir") or self.output_dir
+                items = job["items"] if "items" in job else [job]
+                first = len(jobs)
+                for item in items:
+                    if isinstance(item, str):
+                        item = {"text": item}
+                    jobs.append({
+                        "text": item.get("text"),
+                        "voice": item.get("voice") or job.get("voice"),
+                        "output_file": item.get("output_file"),
+                        "output_dir": output_dir
+                    })
+                requests.append((position, job, first, len(jobs)))
+
+        if jobs:
+            started = time.perf_counter()
+            results = []
+            # Jobs are grouped per output directory, keeping their order
+            for output_dir in dict.fromkeys(job["output_dir"] for job in jobs):
+                indices = [i for i, job in enumerate(jobs) if job["output_dir"] == output_dir]
+                for start in range(0, len(indices), self.max_batch):
+                    group = indices[start:start + self.max_batch]
+                    try:
+                        rendered = generate_speech_batch([jobs[i] for i in group], output_dir)
+                    except Exception as e:
+                        print(f"Error rendering jobs: {e}", file=sys.stderr)
+                        rendered = [{"success": False, "error": str(e)}] * len(group)
+                    results.extend(zip(group, rendered))
+                    self.cycles += 1
+            results = [result for _, result in sorted(results, key=lambda pair: pair[0])]
+            elapsed = round(time.perf_counter() - started, 3)
+            self.rendered += len(jobs)
+
+            for position, job, first, last in requests:
+                if "items" in job:
+                    response = {
+                        "success": all(result.get("success") for result in results[first:last]),
+                        "results": results[first:last]
+                    }
+                else:
+                    response = dict(results[first])
+                response["id"] = job.get("id")
+                response["elapsed"] = elapsed
+                response["batched_with"] = len(jobs)
+                responses[position] = response
+
+        return responses
+
+    def stats(self):
+        return {
+            "voices": len(_voices),
+            "resolved_voices": dict(_resolved_voices),
+            "cycles": self.cycles,
+            "rendered": self.rendered,
+            "max_batch": self.max_batch
         }
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """Serve JSON-lines jobs from stdin, writing one JSON result line per job"""
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+
+        # The driver must stay on this thread, so a reader thread only queues lines
+        lines = queue.Queue()
+
+        def read():
+            for raw in stdin:
+                if raw.strip():
+                    lines.put(raw.strip())
+            lines.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+
+        finished = False
+        while not finished:
+            batch = [lines.get()]
+            queued = _count_utterances(batch[-1])
+            while batch[-1] is not None and queued < self.max_batch:
+                try:
+                    batch.append(lines.get_nowait())
+                except queue.Empty:
+                    break
+                queued += _count_utterances(batch[-1])
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+
+            responses = self.handle_lines(batch)
+            for response in responses:
+                stdout.write(json.dumps(response, ensure_ascii=True) + "\n")
+                if response.get("shutdown"):
+                    finished = True
+                    break
+            stdout.flush()
+
+def _count_utterances(line):
+    """Utterances a queued JSON line asks for (its items, or one)"""
+    if line is None:
+        return 0
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError:
+        return 1
+    items = job.get("items") if isinstance(job, dict) else None
+    return len(items) if isinstance(items, list) else 1
+
+def serve(argv):
+    """Run the JSON-lines worker: pyttsx3_tts.py --serve [options] (see --help)"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Resident pyttsx3 TTS worker (JSON lines)")
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--output-dir", default='./uploads/audio', help="Default directory for generated files")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH,
+                        help="Most utterances rendered per runAndWait cycle")
+    args = parser.parse_args(argv)
+
+    # Keep stdout reserved for JSON-lines responses
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    worker = Pyttsx3Worker(output_dir=args.output_dir, max_batch=max(1, args.max_batch))
+    worker.serve_stdio(stdout=protocol_out)
+
+def main():
+    try:
+        # Get input from command line arguments
+        if len(sys.argv) < 2:
+            print(json.dumps({"error": "No text provided"}))
+            sys.exit(1)
         
+        text = sys.argv[1]
+        voice = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_VOICE
+        output_dir = sys.argv[3] if len(sys.argv) > 3 else './uploads/audio'
+        
+        result = generate_speech(text, voice, output_dir)
         print(json.dumps(result))
+        if not result.get("success"):
+            sys.exit(1)
         
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    if "--serve" in sys.argv[1:]:
+        serve(sys.argv[1:])
+    else:
+        main()
 
 
@@ -10,6 +10,9 @@ import subprocess
 import tempfile
 from pathlib import Path
 
+from audio_probe import probe_audio
+from tts_cache import open_tts_cache
+
 def text_to_speech_windows(text, output_file):
     """
     Use Windows built-in TTS to generate real speech
@@ -49,18 +52,110 @@ def text_to_speech_windows(text, output_file):
         print(f"TTS error: {e}", file=sys.stderr)
         return False
 
-def text_to_speech_espeak(text, output_file):
+def text_to_speech_espeak(text, output_file, language='en'):
     """
     Use eSpeak if available (fallback)
     """
     try:
         result = subprocess.run([
-            'espeak', '-s', '150', '-v', 'en', '-w', output_file, text
+            'espeak', '-s', '150', '-v', language, '-w', output_file, text
         ], capture_output=True, text=True, timeout=30)
         return result.returncode == 0
     except:
         return False
 
+ENGINES = {
+    'sapi': ("Windows SAPI", lambda text, output_file, language: text_to_speech_windows(text, output_file)),
+    'espeak': ("eSpeak", text_to_speech_espeak),
+}
+
+def generate_speech(text, voice='af_heart_0', output_dir='./uploads/audio', output_file=None,
+                    engines=('sapi', 'espeak'), language='en'):
+    """
+    Generate speech with the first system TTS engine that succeeds
+    
+    Args:
+        text: Text to convert to speech
+        voice: Voice label echoed in the result
+        output_dir: Directory for the generated file
+        output_file: Output file path (if None, a unique file is created in output_dir)
+        engines: Engines to try in order ('sapi', 'espeak')
+        language: eSpeak voice/language code
+    
+    Returns:
+        dict: Result with success status and file info, or an error
+    """
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+    
+    words = len(text.split())
+    
+    # Generate output filename
+    if output_file is None:
+        output_file = os.path.join(output_dir, f'real_tts_{int(os.urandom(4).hex(), 16)}.wav')
+    
+    # Serve repeated phrases from the shared TTS cache
+    cache = open_tts_cache()
+    cache_key = (
+        cache.make_key(text, voice, "real_tts", platform=sys.platform, engines=list(engines), language=language)
+        if cache else None
+    )
+    cached = cache.get(cache_key, output_file) if cache else None
+    if cached:
+        return dict(
+            cached,
+            success=True,
+            audio_file=output_file,
+            text=text,
+            voice=voice,
+            words=words,
+            file_size=os.path.getsize(output_file),
+            cached=True
+        )
+    
+    # Try Windows SAPI first, then eSpeak
+    engine_name = None
+    for i, engine in enumerate(engines):
+        if i > 0:
+            print(f"Trying {ENGINES[engine][0]} fallback...", file=sys.stderr)
+        if ENGINES[engine][1](text, output_file, language):
+            engine_name = ENGINES[engine][0]
+            break
+    
+    if engine_name is None:
+        return {"error": "Failed to generate speech with any TTS engine"}
+    
+    # Check if file was created
+    if not os.path.exists(output_file):
+        return {"error": "Audio file was not created"}
+    
+    # Get file size
+    file_size = os.path.getsize(output_file)
+    
+    # Read the real duration and sample rate from the file header,
+    # falling back to a speaking-rate estimate for formats it cannot parse
+    info = probe_audio(output_file)
+    duration = round(info["duration"], 2) if info else max(2.0, words * 0.5)
+    sample_rate = info["sample_rate"] if info else 22050
+    
+    # Return result
+    result = {
+        "success": True,
+        "audio_file": output_file,
+        "duration": duration,
+        "text": text,
+        "voice": voice,
+        "sample_rate": sample_rate,
+        "words": words,
+        "file_size": file_size,
+        "engine": engine_name
+    }
+    
+    if cache:
+        cache.put(cache_key, output_file, {"duration": duration, "sample_rate": sample_rate, "engine": engine_name})
+    
+    return result
+
 def main():
     try:
         # Get input from command line arguments
@@ -72,50 +167,10 @@ def main():
         voice = sys.argv[2] if len(sys.argv) > 2 else 'af_heart_0'
         output_dir = sys.argv[3] if len(sys.argv) > 3 else './uploads/audio'
         
-        # Ensure output directory exists
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Calculate duration based on text length
-        words = len(text.split())
-        duration = max(2.0, words * 0.5)
-        
-        # Generate output filename
-        output_file = os.path.join(output_dir, f'real_tts_{int(os.urandom(4).hex(), 16)}.wav')
-        
-        # Try Windows SAPI first
-        success = text_to_speech_windows(text, output_file)
-        
-        # If Windows SAPI fails, try eSpeak
-        if not success:
-            print("Trying eSpeak fallback...", file=sys.stderr)
-            success = text_to_speech_espeak(text, output_file)
-        
-        if not success:
-            print(json.dumps({"error": "Failed to generate speech with any TTS engine"}))
-            sys.exit(1)
-        
-        # Check if file was created
-        if not os.path.exists(output_file):
-            print(json.dumps({"error": "Audio file was not created"}))
-            sys.exit(1)
-        
-        # Get file size
-        file_size = os.path.getsize(output_file)
-        
-        # Return result
-        result = {
-            "success": True,
-            "audio_file": output_file,
-            "duration": duration,
-            "text": text,
-            "voice": voice,
-            "sample_rate": 22050,
-            "words": words,
-            "file_size": file_size,
-            "engine": "Windows SAPI" if success else "eSpeak"
-        }
-        
+        result = generate_speech(text, voice, output_dir)
         print(json.dumps(result))
+        if not result.get("success"):
+            sys.exit(1)
         
     except Exception as e:
         print(json.dumps({"error": str(e)}))
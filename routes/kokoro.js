@@ -4,6 +4,7 @@ const { spawn, execSync } = require('child_process');
 const path = require('path');
 const fs = require('fs');
 const ttsQueueManager = require('../tts-queue-manager');
+const piperWorker = require('../piper-worker');
 
 // Function to detect available Python command
 function getPythonCommand() {
@@ -70,6 +71,29 @@ function createFallbackAudio(text, voice, outputDir) {
 
 // Helper function to run Piper TTS (extracted for queue management)
 async function runPiperTTS(text, voice, outputDir) {
+  // Prefer the resident worker, which keeps voices loaded between requests
+  try {
+    const result = await piperWorker.synthesize(text, voice, outputDir, Date.now());
+    if (result.success) {
+      return {
+        success: true,
+        data: {
+          audio_url: `/uploads/audio/${path.basename(result.audio_file)}`,
+          duration: result.duration,
+          text: result.text,
+          voice: result.voice,
+          sample_rate: result.sample_rate,
+          words: result.words,
+          file_size: result.file_size,
+          engine: result.engine
+        }
+      };
+    }
+    console.log('⚠️ Piper worker failed, running script directly:', result.error);
+  } catch (error) {
+    console.log('⚠️ Piper worker unavailable, running script directly:', error.message);
+  }
+
   return new Promise((resolve, reject) => {
     const piperScript = path.join(__dirname, '..', 'piper_tts.py');
     const uniqueSuffix = Date.now();
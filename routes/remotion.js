@@ -1025,7 +1025,22 @@ async function createSubtitleFile(segments, outputPath) {
       const text = (segment.text || '').trim();
       const duration = (segment.end || segment.start + 2) - (segment.start || 0);
       
-      if (text) {
+      if (Array.isArray(segment.words) && segment.words.length > 0) {
+        // Use real word timings from Whisper (timestamps: 'word') for 3-word chunks
+        for (let i = 0; i < segment.words.length; i += 3) {
+          const group = segment.words.slice(i, i + 3);
+          const chunk = group.map(word => (word.word || '').trim()).join(' ').trim();
+          if (!chunk) {
+            continue;
+          }
+          
+          srtContent += `${subtitleIndex}\n`;
+          srtContent += `${formatTime(group[0].start)} --> ${formatTime(group[group.length - 1].end)}\n`;
+          srtContent += `${chunk}\n\n`;
+          
+          subtitleIndex++;
+        }
+      } else if (text) {
         // Split text into 3-word chunks
         const words = text.split(/\s+/).filter(word => word.length > 0);
         const chunks = [];
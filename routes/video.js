@@ -8,6 +8,7 @@ const resourceManager = require('../resource-manager');
 const ttsQueueManager = require('../tts-queue-manager');
 const whisperQueueManager = require('../whisper-queue-manager');
 const videoQueueManager = require('../video-queue-manager');
+const piperWorker = require('../piper-worker');
 const { execSync } = require('child_process');
 
 const TRACKING_FILE = path.join(__dirname, '../video-tracking.json');
@@ -98,6 +99,37 @@ async function removeVideoFromTracking(videoId) {
 async function generatePiperTTS(text, voice) {
   const { spawn } = require('child_process');
   
+  // Prefer the resident worker, which keeps voices loaded between requests
+  try {
+    const outputDir = path.join(__dirname, '../uploads/audio');
+    if (!fs.existsSync(outputDir)) {
+      fs.mkdirSync(outputDir, { recursive: true });
+    }
+    const uniqueId = `${Date.now()}-${Math.round(Math.random() * 1e9)}`;
+    // Timings from synthesis let callers build subtitles without a Whisper pass
+    const result = await piperWorker.synthesize(text, voice, outputDir, uniqueId, { timings: true });
+    if (result.success) {
+      return {
+        success: true,
+        data: {
+          audio_url: `/uploads/audio/${path.basename(result.audio_file)}`,
+          duration: result.duration,
+          text: result.text,
+          voice: result.voice,
+          sample_rate: result.sample_rate,
+          words: result.words,
+          file_size: result.file_size,
+          engine: result.engine,
+          segments: result.segments,
+          timing_source: result.timing_source
+        }
+      };
+    }
+    console.log('⚠️ Piper worker failed, running script directly:', result.error);
+  } catch (error) {
+    console.log('⚠️ Piper worker unavailable, running script directly:', error.message);
+  }
+  
   return new Promise((resolve) => {
     try {
       const timestamp = Date.now();
@@ -701,7 +733,8 @@ async function generateCompleteVideoContent(script, images, audioSettings, audio
           duration: piperResult.data.duration || 5,
           text: piperResult.data.text,
           voice: piperResult.data.voice,
-          engine: piperResult.data.engine || 'Piper TTS'
+          engine: piperResult.data.engine || 'Piper TTS',
+          segments: piperResult.data.segments
         });
       } catch (error) {
         console.error(`Error generating TTS for scene ${index}:`, error);
@@ -756,6 +789,17 @@ async function generateCompleteVideoContent(script, images, audioSettings, audio
       // Get original scene text (not translated)
       const originalSceneText = script.scenes[index] ? script.scenes[index].speaker_text : '';
       
+      // We synthesized this narration ourselves, so its timings are already known
+      if (audioData.segments && audioData.segments.length > 0) {
+        console.log(`📝 Using TTS timings for scene ${index} subtitles (no Whisper pass)`);
+        subtitleResults.push({
+          sceneIndex: index,
+          segments: audioData.segments,
+          text: audioData.text || originalSceneText
+        });
+        continue;
+      }
+      
       try {
         console.log(`🎤 Generating subtitles for scene ${index} with Whisper Queue...`);
         
@@ -1015,7 +1059,8 @@ async function generateCustomVideoContent(title, scenes, voice, orientation, sub
           duration: piperResult.data.duration || 5,
           text: piperResult.data.text,
           voice: piperResult.data.voice,
-          engine: piperResult.data.engine || 'Piper TTS'
+          engine: piperResult.data.engine || 'Piper TTS',
+          segments: piperResult.data.segments
         });
       } catch (error) {
         console.error(`Error generating TTS for scene ${index + 1}:`, error);
@@ -1071,6 +1116,17 @@ async function generateCustomVideoContent(title, scenes, voice, orientation, sub
       // Get original scene text (not translated)
       const originalSceneText = scenes[index] ? scenes[index].speaker_text : '';
       
+      // We synthesized this narration ourselves, so its timings are already known
+      if (audioData.segments && audioData.segments.length > 0) {
+        console.log(`📝 Using TTS timings for scene ${index + 1} subtitles (no Whisper pass)`);
+        subtitleResults.push({
+          sceneIndex: index,
+          segments: audioData.segments,
+          text: audioData.text || originalSceneText
+        });
+        continue;
+      }
+      
       try {
         console.log(`🎤 Generating subtitles for scene ${index + 1} with Whisper Queue...`);
         
@@ -1353,7 +1409,8 @@ async function generateLongFormVideoContent(script, images, audioSettings, audio
           duration: piperResult.data.duration || 5,
           text: piperResult.data.text,
           voice: piperResult.data.voice,
-          engine: piperResult.data.engine || 'Piper TTS'
+          engine: piperResult.data.engine || 'Piper TTS',
+          segments: piperResult.data.segments
         });
       } catch (error) {
         console.error(`Error generating TTS for long form scene ${index}:`, error);
@@ -1408,6 +1465,17 @@ async function generateLongFormVideoContent(script, images, audioSettings, audio
       // Get original scene text (not translated)
       const originalSceneText = script.scenes[index] ? script.scenes[index].speaker_text : '';
       
+      // We synthesized this narration ourselves, so its timings are already known
+      if (audioData.segments && audioData.segments.length > 0) {
+        console.log(`📝 Using TTS timings for scene ${index} subtitles (no Whisper pass)`);
+        subtitleResults.push({
+          sceneIndex: index,
+          segments: audioData.segments,
+          text: audioData.text || originalSceneText
+        });
+        continue;
+      }
+      
       try {
         console.log(`🎤 Generating subtitles for long form scene ${index} with Whisper Queue...`);
         
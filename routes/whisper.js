@@ -4,8 +4,13 @@ const fs = require('fs-extra');
 const path = require('path');
 const ffmpeg = require('fluent-ffmpeg');
 const { exec } = require('child_process');
+const pyttsx3Worker = require('../pyttsx3-worker');
+const whisperWorker = require('../whisper-worker');
 const router = express.Router();
 
+// Timestamp granularities accepted by tiny_whisper.py --timestamps
+const TIMESTAMP_MODES = ['none', 'segment', 'word'];
+
 // Configure multer for file uploads
 const storage = multer.diskStorage({
   destination: function (req, file, cb) {
@@ -150,6 +155,17 @@ router.post('/text-to-speech', async (req, res) => {
 
 // Generate audio using Kokoro Python script
 async function generateKokoroAudio(text, voice, outputDir) {
+  // Prefer the resident worker, which keeps the pyttsx3 driver initialized between requests
+  try {
+    const result = await pyttsx3Worker.synthesize(text, voice, outputDir);
+    if (result.success) {
+      return result;
+    }
+    console.log('⚠️ pyttsx3 worker failed, running script directly:', result.error);
+  } catch (error) {
+    console.log('⚠️ pyttsx3 worker unavailable, running script directly:', error.message);
+  }
+
   return new Promise((resolve, reject) => {
         const scriptPath = path.join(__dirname, '..', 'pyttsx3_tts.py');
     const command = `python "${scriptPath}" "${text}" "${voice}" "${outputDir}"`;
@@ -329,53 +345,17 @@ router.get('/voices', async (req, res) => {
   }
 });
 
-// Tiny Whisper integration function
+// Tiny Whisper integration function: jobs go to the resident tiny_whisper.py --serve worker,
+// so the model is loaded once instead of on every request
 async function transcribeWithTinyWhisper(audioPath, options = {}) {
-  return new Promise((resolve, reject) => {
-    const scriptPath = path.join(__dirname, '..', 'tiny_whisper.py');
-    const { language = 'auto', model = 'tiny', subtitles = false, format = 'json' } = options;
-    
-    let command = `python "${scriptPath}" "${audioPath}" --model ${model} --language ${language} --format ${format}`;
-    
-    if (subtitles) {
-      command += ' --subtitles';
-    }
-    
-    console.log('Running Tiny Whisper command:', command);
-    
-    exec(command, (error, stdout, stderr) => {
-      if (error) {
-        console.error('Tiny Whisper error:', error);
-        console.error('stderr:', stderr);
-        reject(error);
-        return;
-      }
-      
-      if (stderr) {
-        console.error('Tiny Whisper stderr:', stderr);
-      }
-      
-      try {
-        // Extract JSON from output (remove any non-JSON content)
-        let jsonOutput = stdout.trim();
-        
-        // Find JSON content by looking for the first '{' and last '}'
-        const firstBrace = jsonOutput.indexOf('{');
-        const lastBrace = jsonOutput.lastIndexOf('}');
-        
-        if (firstBrace !== -1 && lastBrace !== -1 && lastBrace > firstBrace) {
-          jsonOutput = jsonOutput.substring(firstBrace, lastBrace + 1);
-        }
-        
-        const result = JSON.parse(jsonOutput);
-        resolve(result);
-      } catch (parseError) {
-        console.error('Error parsing Tiny Whisper result:', parseError);
-        console.error('Raw output:', stdout);
-        reject(parseError);
-      }
-    });
-  });
+  const { timestamps = 'segment' } = options;
+  if (!TIMESTAMP_MODES.includes(timestamps)) {
+    throw new Error(`Invalid timestamps value: ${timestamps}`);
+  }
+
+  const result = await whisperWorker.transcribe(audioPath, options);
+  console.log(`Tiny Whisper job finished in ${result.elapsed}s`);
+  return result;
 }
 
 // Generate subtitles endpoint
@@ -449,7 +429,7 @@ router.post('/generate-subtitles', upload.single('audio'), async (req, res) => {
 // Transcribe audio from URL with timestamps
 router.post('/transcribe-with-timestamps', async (req, res) => {
   try {
-    const { audioUrl, language = 'auto', model = 'tiny' } = req.body;
+    const { audioUrl, language = 'auto', model = 'tiny', timestamps = 'word' } = req.body;
     
     if (!audioUrl) {
       return res.status(400).json({
@@ -458,6 +438,13 @@ router.post('/transcribe-with-timestamps', async (req, res) => {
       });
     }
 
+    if (!TIMESTAMP_MODES.includes(timestamps)) {
+      return res.status(400).json({
+        success: false,
+        error: `timestamps must be one of: ${TIMESTAMP_MODES.join(', ')}`
+      });
+    }
+
     // Download audio file from URL
     const tempDir = path.join(__dirname, '../temp');
     await fs.ensureDir(tempDir);
@@ -471,7 +458,8 @@ router.post('/transcribe-with-timestamps', async (req, res) => {
         language,
         model,
         subtitles: false,
-        format: 'json'
+        format: 'json',
+        timestamps
       });
       
       console.log('Whisper transcription result:', JSON.stringify(result, null, 2));
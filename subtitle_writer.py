@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Streaming subtitle writers for SRT, WebVTT, ASS and JSON lines
+Each format is a generator over caption dicts ({'start', 'end', 'text'}) so documents
+can be written to disk cue by cue instead of being built in memory
+"""
+
+import os
+import json
+
+SUBTITLE_FORMATS = ['srt', 'vtt', 'ass', 'jsonl']
+
+# Portrait 1080x1920 to match the videos composed in routes/remotion.js
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1080
+PlayResY: 1920
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H64000000,0,0,0,0,100,100,0,0,1,3,1,2,40,40,120,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def _split_time(seconds):
+    """Split seconds into (hours, minutes, seconds, milliseconds)"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millisecs = int((seconds % 1) * 1000)
+    return hours, minutes, secs, millisecs
+
+def format_srt_time(seconds):
+    """Format time for SRT format"""
+    hours, minutes, secs, millisecs = _split_time(seconds)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
+
+def format_vtt_time(seconds):
+    """Format time for VTT format"""
+    hours, minutes, secs, millisecs = _split_time(seconds)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millisecs:03d}"
+
+def format_ass_time(seconds):
+    """Format time for ASS format (centisecond precision)"""
+    hours, minutes, secs, millisecs = _split_time(seconds)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}.{millisecs // 10:02d}"
+
+def iter_srt(captions):
+    """Yield an SRT document one cue at a time"""
+    for i, caption in enumerate(captions, 1):
+        separator = "\n" if i > 1 else ""
+        yield (
+            f"{separator}{i}\n"
+            f"{format_srt_time(caption['start'])} --> {format_srt_time(caption['end'])}\n"
+            f"{caption['text'].strip()}\n"
+        )
+
+def iter_vtt(captions):
+    """Yield a WebVTT document one cue at a time"""
+    yield "WEBVTT\n"
+    for caption in captions:
+        yield (
+            f"\n{format_vtt_time(caption['start'])} --> {format_vtt_time(caption['end'])}\n"
+            f"{caption['text'].strip()}\n"
+        )
+
+def iter_ass(captions):
+    """Yield an Advanced SubStation Alpha document one event at a time"""
+    yield ASS_HEADER
+    for caption in captions:
+        # Braces start override blocks in ASS and newlines must be written as \N
+        text = caption['text'].strip().replace('{', '(').replace('}', ')').replace('\n', '\\N')
+        yield (
+            f"Dialogue: 0,{format_ass_time(caption['start'])},{format_ass_time(caption['end'])},"
+            f"Default,,0,0,0,,{text}\n"
+        )
+
+def iter_jsonl(captions):
+    """Yield one JSON object per caption"""
+    for i, caption in enumerate(captions, 1):
+        entry = {'index': i, 'start': caption['start'], 'end': caption['end'], 'text': caption['text'].strip()}
+        if caption.get('words'):
+            entry['words'] = caption['words']
+        yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+def chunk_words(segments, words_per_caption):
+    """
+    Group word-timed segments into captions of at most words_per_caption words
+
+    Captions never span two segments, and each caption runs from its first word's
+    start to its last word's end. Segments without word timings are kept whole.
+
+    Args:
+        segments (list): Segments with 'words' timings (transcribe(timestamps='word') or TTS timings)
+        words_per_caption (int): Maximum words per caption
+
+    Returns:
+        list: Caption segments with start, end and text
+    """
+    captions = []
+    for segment in segments:
+        words = segment.get('words')
+        if not words:
+            captions.append({'start': segment['start'], 'end': segment['end'], 'text': segment['text']})
+            continue
+        for index in range(0, len(words), words_per_caption):
+            group = words[index:index + words_per_caption]
+            captions.append({
+                'start': group[0]['start'],
+                'end': group[-1]['end'],
+                'text': ' '.join(word['word'] for word in group)
+            })
+    return captions
+
+WRITERS = {
+    'srt': iter_srt,
+    'vtt': iter_vtt,
+    'ass': iter_ass,
+    'jsonl': iter_jsonl,
+}
+
+def render(captions, subtitle_format):
+    """Return a whole subtitle document as a string"""
+    return "".join(WRITERS[subtitle_format](captions))
+
+def write_subtitles(captions, outputs):
+    """
+    Write the same captions to several subtitle files
+
+    Args:
+        captions (iterable): Caption dicts with start, end and text
+        outputs (dict): Mapping of format ('srt', 'vtt', 'ass', 'jsonl') to output path
+
+    Returns:
+        dict: Mapping of format to the path written
+    """
+    unknown = [fmt for fmt in outputs if fmt not in WRITERS]
+    if unknown:
+        raise ValueError(f"Unsupported subtitle format: {', '.join(unknown)}")
+
+    captions = captions if isinstance(captions, (list, tuple)) else list(captions)
+    written = {}
+    for subtitle_format, path in outputs.items():
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(WRITERS[subtitle_format](captions))
+        written[subtitle_format] = path
+    return written
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for forced alignment of known transcripts, run against a stand-in whisper module
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import tiny_whisper
+from tiny_whisper import TinyWhisper, interpolate_words, group_aligned_words, _window_cut, SAMPLE_RATE
+
+class Mel:
+    def to(self, device):
+        return self
+
+def fake_whisper(word_seconds):
+    """whisper stand-in whose alignment gives every word word_seconds, back to back"""
+    def find_alignment(model, tokenizer, tokens, mel, num_frames):
+        return [
+            types.SimpleNamespace(word=f' {token}', start=index * word_seconds, end=(index + 1) * word_seconds,
+                                  probability=0.9)
+            for index, token in enumerate(tokens)
+        ]
+
+    return types.SimpleNamespace(
+        audio=types.SimpleNamespace(N_SAMPLES=30 * SAMPLE_RATE, HOP_LENGTH=160),
+        pad_or_trim=lambda audio: audio,
+        log_mel_spectrogram=lambda audio, n_mels: Mel(),
+        timing=types.SimpleNamespace(find_alignment=find_alignment, merge_punctuations=lambda *args: None),
+        tokenizer=types.SimpleNamespace(get_tokenizer=lambda *args, **kwargs: Tokenizer())
+    )
+
+class Tokenizer:
+    def encode(self, text):
+        return text.split()
+
+@pytest.fixture
+def engine():
+    engine = object.__new__(TinyWhisper)
+    engine.model = types.SimpleNamespace(dims=types.SimpleNamespace(n_mels=80), device='cpu',
+                                         is_multilingual=True, num_languages=99)
+    engine.language = 'en'
+    engine.cache = None
+    return engine
+
+def align(engine, monkeypatch, words, audio_seconds, word_seconds):
+    monkeypatch.setitem(sys.modules, 'whisper', fake_whisper(word_seconds))
+    audio = np.zeros(int(audio_seconds * SAMPLE_RATE), dtype=np.float32)
+    return engine._align_windows(audio, words, Tokenizer())
+
+def test_short_audio_aligns_every_word(engine, monkeypatch):
+    words = align(engine, monkeypatch, ['one', 'two', 'three'], 5, 1.0)
+    assert [(word['word'], word['start'], word['end']) for word in words] == [
+        ('one', 0.0, 1.0), ('two', 1.0, 2.0), ('three', 2.0, 3.0)]
+
+def test_long_audio_continues_after_the_last_kept_word(engine, monkeypatch):
+    transcript = [f'w{i}' for i in range(40)]
+    words = align(engine, monkeypatch, transcript, 40, 1.0)
+    assert [word['word'] for word in words] == transcript
+    assert all(a['end'] <= b['start'] for a, b in zip(words, words[1:]))
+    assert not any(word.get('interpolated') for word in words)
+
+def test_words_past_the_end_of_the_audio_are_interpolated(engine, monkeypatch):
+    # Two tokens per window and words longer than the audio: the first window runs past the end
+    monkeypatch.setattr(tiny_whisper, 'ALIGN_MAX_TOKENS', 2)
+    words = align(engine, monkeypatch, ['a', 'b', 'c', 'd'], 5, 6.0)
+
+    assert [word['word'] for word in words] == ['a', 'b', 'c', 'd']
+    assert not words[0].get('interpolated')
+    assert all(word['interpolated'] and word['probability'] == 0.0 for word in words[1:])
+    # No audio is left after the first word, so the rest collapse onto its end
+    assert all(word['start'] == word['end'] == 6.0 for word in words[1:])
+
+def test_unaligned_windows_keep_their_words(engine, monkeypatch):
+    whisper = fake_whisper(1.0)
+    whisper.timing.find_alignment = lambda *args: []
+    monkeypatch.setitem(sys.modules, 'whisper', whisper)
+    words = engine._align_windows(np.zeros(4 * SAMPLE_RATE, dtype=np.float32), ['a', 'b'], Tokenizer())
+    assert [(word['word'], word['start'], word['end']) for word in words] == [('a', 0.0, 2.0), ('b', 2.0, 4.0)]
+
+def test_align_reports_seconds_and_unaligned_words(engine, monkeypatch):
+    monkeypatch.setattr(tiny_whisper, 'ALIGN_MAX_TOKENS', 2)
+    monkeypatch.setitem(sys.modules, 'whisper', fake_whisper(6.0))
+    audio = np.zeros(5 * SAMPLE_RATE + 800, dtype=np.float32)
+    result = engine.align('speech.wav', 'First one. Then two more', audio=audio)
+
+    assert result['success'] and result['duration'] == 5.05
+    assert result['unaligned_words'] == 4
+    assert [segment['text'] for segment in result['segments']] == ['First one.', 'Then two more']
+    assert 'audio_duration' not in result
+
+def test_interpolate_words():
+    assert interpolate_words([], 1.0, 2.0) == []
+    assert [(word['start'], word['end']) for word in interpolate_words(['a', 'b', 'c'], 1.0, 2.5)] == [
+        (1.0, 1.5), (1.5, 2.0), (2.0, 2.5)]
+
+def timings(*words_and_ends):
+    return [types.SimpleNamespace(word=word, end=end) for word, end in words_and_ends]
+
+def test_last_window_keeps_everything():
+    assert _window_cut(timings((' a', 1.0), (' b', 29.5)), ['a', 'b'], 30, last_window=True) == (2, 2)
+
+def test_window_is_cut_before_the_edge():
+    window = timings((' one', 10.0), (' two', 27.0), (' three', 28.5), (' four', 29.9))
+    assert _window_cut(window, ['one', 'two', 'three', 'four'], 30, last_window=False) == (2, 2)
+
+def test_final_whisper_word_is_never_kept_in_a_middle_window():
+    # It may be cut off by the window end, so it is aligned again in the next window
+    window = timings((' one', 1.0), (' two', 2.0))
+    assert _window_cut(window, ['one', 'two', 'three'], 30, last_window=False) == (1, 1)
+
+def test_cut_lands_on_a_transcript_word_boundary():
+    # whisper split "hello" in two; cutting after "hel" would drop half a word
+    window = timings((' hel', 1.0), ('lo', 2.0), (' world', 3.0), (' again', 4.0))
+    assert _window_cut(window, ['hello', 'world', 'again'], 30, last_window=False) == (3, 2)
+    window = timings((' hel', 1.0), ('lo', 29.0), (' world', 29.5))
+    assert _window_cut(window, ['hello', 'world'], 30, last_window=False) == (2, 1)
+
+def test_first_word_past_the_edge_still_makes_progress():
+    window = timings((' long', 29.0), (' word', 29.5))
+    assert _window_cut(window, ['long', 'word'], 30, last_window=False) == (1, 1)
+
+def test_window_without_a_matching_boundary_is_kept_whole():
+    # whisper merged the transcript words differently, so no character count lines up
+    window = timings((' ab', 29.0), ('cd', 29.5))
+    assert _window_cut(window, ['abc', 'd'], 30, last_window=False) == (2, 2)
+
+def test_group_aligned_words_splits_at_sentence_ends():
+    words = [{'word': word, 'start': float(index), 'end': index + 0.5}
+             for index, word in enumerate(['Hi', 'there.', 'Ready', '—', 'go?', '…', 'and', 'then'])]
+    segments = group_aligned_words(words)
+    assert [(segment['text'], segment['start'], segment['end']) for segment in segments] == [
+        ('Hi there.', 0.0, 1.5), ('Ready — go?', 2.0, 4.5), ('…', 5.0, 5.5), ('and then', 6.0, 7.5)]
+    assert segments[0]['words'] == words[:2]
+    assert group_aligned_words([]) == []
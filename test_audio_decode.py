@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for in-memory audio decoding through the ffmpeg pipe, using a stand-in ffmpeg module
+"""
+
+import io
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import tiny_whisper
+from tiny_whisper import TinyWhisper, SAMPLE_RATE
+
+class Process:
+    def __init__(self, stdout, returncode=0, stderr=b''):
+        self.stdout = io.BytesIO(stdout)
+        self.returncode = returncode
+        self._stderr = stderr
+
+    def communicate(self):
+        return b'', self._stderr
+
+class Stream:
+    """ffmpeg-python's fluent builder, recording the arguments it was given"""
+    def __init__(self, calls, process):
+        self.calls = calls
+        self.process = process
+
+    def output(self, target, **options):
+        self.calls['output'] = (target, options)
+        return self
+
+    def global_args(self, *args):
+        self.calls['global_args'] = args
+        return self
+
+    def run_async(self, **options):
+        self.calls['run_async'] = options
+        return self.process
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    module = types.SimpleNamespace(calls={}, process=Process(b''))
+
+    def input(path, **options):
+        module.calls['input'] = (path, options)
+        return Stream(module.calls, module.process)
+
+    module.input = input
+    monkeypatch.setitem(sys.modules, 'ffmpeg', module)
+    return module
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / 'speech.mp3'
+    path.write_bytes(b'not decoded here')
+    return str(path)
+
+def test_pipe_is_read_into_float32_samples(ffmpeg, audio_file, monkeypatch):
+    samples = np.linspace(-1, 1, 5000, dtype=np.float32)
+    ffmpeg.process = Process(samples.tobytes())
+    # Several reads, so the samples span chunk boundaries
+    monkeypatch.setattr(tiny_whisper, 'PIPE_CHUNK_SIZE', 4096)
+
+    audio = TinyWhisper.preprocess_audio(audio_file)
+    assert audio.dtype == np.float32
+    assert np.array_equal(audio, samples)
+    # Callers may normalize in place without copying
+    assert audio.flags.writeable
+
+    assert ffmpeg.calls['input'] == (audio_file, {})
+    assert ffmpeg.calls['output'] == ('pipe:', {'format': 'f32le', 'acodec': 'pcm_f32le', 'ac': 1,
+                                                'ar': SAMPLE_RATE})
+    assert ffmpeg.calls['run_async'] == {'pipe_stdout': True, 'pipe_stderr': True}
+
+def test_max_seconds_limits_the_decode(ffmpeg, audio_file):
+    TinyWhisper.preprocess_audio(audio_file, max_seconds=30)
+    assert ffmpeg.calls['input'] == (audio_file, {'t': 30})
+
+def test_partial_trailing_sample_is_dropped(ffmpeg, audio_file):
+    ffmpeg.process = Process(np.ones(3, dtype=np.float32).tobytes() + b'\x00\x00')
+    assert len(TinyWhisper.preprocess_audio(audio_file)) == 3
+
+def test_empty_output_gives_no_samples(ffmpeg, audio_file):
+    assert len(TinyWhisper.preprocess_audio(audio_file)) == 0
+
+def test_ffmpeg_errors_are_raised(ffmpeg, audio_file):
+    ffmpeg.process = Process(b'', returncode=1, stderr=b'Invalid data found when processing input\n')
+    with pytest.raises(RuntimeError, match='Invalid data found'):
+        TinyWhisper.preprocess_audio(audio_file)
+
+def test_missing_file_is_not_passed_to_ffmpeg(ffmpeg, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TinyWhisper.preprocess_audio(str(tmp_path / 'missing.wav'))
+    assert ffmpeg.calls == {}
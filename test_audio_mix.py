@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for scene audio assembly: clip placement, crossfades, music ducking and the final mix
+"""
+
+import numpy as np
+import pytest
+
+from audio_mix import (concatenate, ducking_gain, music_bed, resample, match_channels,
+                       read_wav, write_audio, assemble)
+
+RATE = 1000
+
+def tone(seconds, level=0.5, channels=1):
+    return np.full((int(seconds * RATE), channels), level, dtype=np.float32)
+
+def write_clip(path, seconds, level=0.5, channels=1, rate=RATE):
+    write_audio(str(path), np.full((int(seconds * rate), channels), level, dtype=np.float32), rate)
+    return str(path)
+
+def test_clips_are_separated_by_gaps():
+    track, placements = concatenate([tone(1), tone(2), tone(0.5)], RATE, gap_seconds=0.25)
+    assert placements == [(0, 1000), (1250, 2000), (3500, 500)]
+    assert len(track) == 4000
+    assert np.all(track[1000:1250] == 0)
+    assert np.all(track[1250:3250] == 0.5)
+
+def test_crossfade_overlaps_clips_and_keeps_level():
+    track, placements = concatenate([tone(1), tone(1)], RATE, gap_seconds=0.25, crossfade_seconds=0.2)
+    assert placements == [(0, 1000), (800, 1000)]
+    assert len(track) == 1800
+    # Linear ramps of a constant signal sum back to the same level
+    assert np.allclose(track[800:1000], 0.5)
+    assert track[0, 0] == 0.5 and track[-1, 0] == 0.5
+
+def test_crossfade_is_limited_to_half_the_shorter_clip():
+    _, placements = concatenate([tone(1), tone(0.2), tone(1)], RATE, crossfade_seconds=0.5)
+    assert placements == [(0, 1000), (900, 200), (1000, 1000)]
+
+def test_concatenate_without_clips():
+    track, placements = concatenate([], RATE)
+    assert track.shape == (0, 1) and placements == []
+
+def test_music_ducks_under_sustained_speech():
+    voice = np.concatenate([tone(1, 0.0), tone(2, 0.5), tone(2, 0.0)])
+    gain = ducking_gain(voice, RATE, duck_gain=0.35)
+    assert gain.shape == (len(voice), 1)
+    assert gain[500, 0] == 1.0
+    assert gain[2900, 0] == pytest.approx(0.35, abs=0.01)
+    # Released well after speech ends
+    assert gain[-1, 0] > 0.95
+    assert np.all(np.diff(gain[1000:3000, 0]) <= 1e-6)
+
+def test_quiet_voice_and_disabled_ducking_leave_music_alone():
+    assert np.all(ducking_gain(tone(1, 0.001), RATE) == 1.0)
+    assert np.all(ducking_gain(tone(1, 0.5), RATE, duck_gain=1.0) == 1.0)
+
+def test_music_bed_loops_and_fades_out():
+    music = np.arange(1, 101, dtype=np.float32)[:, None]
+    bed = music_bed(music, 250, RATE, fade_out_seconds=0.05)
+    assert len(bed) == 250
+    assert bed[100, 0] == 1.0 and bed[150, 0] == 51.0
+    assert bed[-1, 0] == 0.0
+    assert np.all(music_bed(np.zeros((0, 2), dtype=np.float32), 10, RATE) == 0)
+
+def test_resample_and_match_channels():
+    stereo = np.stack([np.linspace(0, 1, 100), np.linspace(1, 0, 100)], axis=1).astype(np.float32)
+    assert resample(stereo, 100, 200).shape == (200, 2)
+    assert resample(stereo, 100, 100) is stereo
+    assert np.allclose(match_channels(stereo, 1), 0.5)
+    assert match_channels(tone(1), 2).shape == (RATE, 2)
+
+def test_read_wav_round_trip(tmp_path):
+    path = write_clip(tmp_path / 'clip.wav', 0.5, level=-0.25, channels=2)
+    samples, rate = read_wav(path)
+    assert rate == RATE and samples.shape == (500, 2)
+    assert np.allclose(samples, -0.25, atol=1e-4)
+
+def test_assemble_reports_offsets_and_shifts_segments(tmp_path):
+    first = write_clip(tmp_path / 'a.wav', 1)
+    second = write_clip(tmp_path / 'b.wav', 2, rate=2000)
+    music = write_clip(tmp_path / 'music.wav', 0.7, level=0.2, channels=2)
+    segments = [{'start': 0.1, 'end': 0.9, 'text': 'hi', 'words': [{'word': 'hi', 'start': 0.1, 'end': 0.5}]}]
+    output = tmp_path / 'out' / 'mix.wav'
+
+    result = assemble([first, {'audio_file': second, 'segments': segments}], str(output),
+                      music=music, gap_seconds=0.5)
+    assert result['success']
+    assert result['channels'] == 2 and result['sample_rate'] == RATE
+    assert result['duration'] == 3.5
+    assert [(clip['offset'], clip['duration']) for clip in result['clips']] == [(0.0, 1.0), (1.5, 2.0)]
+    assert result['segments'][0]['start'] == 1.6
+    assert result['segments'][0]['words'][0]['end'] == 2.0
+
+    samples, rate = read_wav(str(output))
+    assert samples.shape == (3500, 2)
+    # Music is ducked under speech and recovers in the gap; the mix never clips
+    assert samples[1900, 0] == pytest.approx(0.5 + 0.2 * 0.3 * 0.35, abs=0.002)
+    assert 0.2 * 0.3 * 0.35 < samples[1250, 0] < 0.2 * 0.3
+    assert np.max(np.abs(samples)) <= 0.99 + 1e-4
+
+def test_assemble_errors(tmp_path):
+    assert assemble([], str(tmp_path / 'mix.wav')) == {
+        'success': False, 'error': 'هیچ فایل صوتی برای ترکیب وجود ندارد'}
+    result = assemble([str(tmp_path / 'missing.wav')], str(tmp_path / 'mix.wav'))
+    assert not result['success'] and 'not found' in result['error']
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for header-based audio probing on synthetic WAV and MP3 files
+"""
+
+import glob
+import os
+import struct
+import wave
+
+import pytest
+
+from audio_probe import probe_audio, get_duration
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding, joint stereo
+MP3_HEADER = b'\xff\xfb\x90\x44'
+MP3_FRAME_LENGTH = 417
+MP3_FRAME_SECONDS = 1152 / 44100.0
+
+def write_wav(path, seconds=1.5, rate=22050, channels=1, width=2):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(width)
+        f.setframerate(rate)
+        f.writeframes(b'\x00' * int(seconds * rate) * channels * width)
+    return str(path)
+
+def riff(chunks):
+    body = b'WAVE' + b''.join(
+        struct.pack('<4sI', chunk_id, len(data)) + data + (b'\x00' if len(data) % 2 else b'')
+        for chunk_id, data in chunks
+    )
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+def fmt_chunk(rate=16000, channels=1, bits=16, extensible=False):
+    block_align = channels * bits // 8
+    body = struct.pack('<HHIIHH', 0xFFFE if extensible else 1, channels, rate, rate * block_align, block_align, bits)
+    if extensible:
+        body += struct.pack('<HHI', 22, bits, 0) + struct.pack('<H', 1) + b'\x00' * 14
+    return body
+
+def mp3_frames(count):
+    return (MP3_HEADER + b'\x00' * (MP3_FRAME_LENGTH - 4)) * count
+
+def test_wav_written_by_wave_module(tmp_path):
+    info = probe_audio(write_wav(tmp_path / 'a.wav', seconds=1.5, rate=22050, channels=2))
+    assert info == {'format': 'wav', 'duration': 1.5, 'sample_rate': 22050, 'channels': 2, 'bits_per_sample': 16}
+
+def test_wav_with_odd_sized_chunks_before_data(tmp_path):
+    path = tmp_path / 'list.wav'
+    path.write_bytes(riff([(b'LIST', b'abc'), (b'fmt ', fmt_chunk(extensible=True)), (b'data', b'\x00' * 32000)]))
+    info = probe_audio(str(path))
+    assert info['duration'] == 1.0 and info['sample_rate'] == 16000
+
+def test_streamed_wav_uses_file_size(tmp_path):
+    data = riff([(b'fmt ', fmt_chunk()), (b'data', b'\x00' * 16000)])
+    # Streaming writers leave the data size at its maximum
+    data = data.replace(struct.pack('<4sI', b'data', 16000), struct.pack('<4sI', b'data', 0xFFFFFFFF))
+    path = tmp_path / 'stream.wav'
+    path.write_bytes(data)
+    assert probe_audio(str(path))['duration'] == 0.5
+
+def test_wav_without_fmt_is_rejected(tmp_path):
+    path = tmp_path / 'bad.wav'
+    path.write_bytes(riff([(b'data', b'\x00' * 100)]))
+    assert probe_audio(str(path)) is None
+
+def test_mp3_frame_scan(tmp_path):
+    path = tmp_path / 'cbr.mp3'
+    path.write_bytes(mp3_frames(100))
+    info = probe_audio(str(path))
+    assert info['format'] == 'mp3'
+    assert info['sample_rate'] == 44100 and info['channels'] == 2
+    assert info['duration'] == pytest.approx(100 * MP3_FRAME_SECONDS)
+
+def test_mp3_skips_id3_tag_and_junk(tmp_path):
+    tag = b'ID3\x04\x00\x00' + bytes([0, 0, 1, 0]) + b'\x00' * 128
+    path = tmp_path / 'tagged.mp3'
+    path.write_bytes(tag + b'\xff\x00junk' + mp3_frames(10))
+    assert probe_audio(str(path))['duration'] == pytest.approx(10 * MP3_FRAME_SECONDS)
+
+def test_mp3_xing_frame_count(tmp_path):
+    first = bytearray(mp3_frames(1))
+    # Stereo MPEG-1: the Xing tag follows 32 bytes of side information
+    first[36:48] = b'Xing' + struct.pack('>II', 0x01, 5000)
+    path = tmp_path / 'vbr.mp3'
+    path.write_bytes(bytes(first) + mp3_frames(3))
+    assert probe_audio(str(path))['duration'] == pytest.approx(5000 * MP3_FRAME_SECONDS)
+
+def test_unreadable_files(tmp_path):
+    path = tmp_path / 'text.txt'
+    path.write_bytes(b'not audio at all')
+    assert probe_audio(str(path)) is None
+    assert probe_audio(str(tmp_path / 'missing.wav')) is None
+    assert get_duration(str(path), default=5) == 5
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'background_music', '*.mp3')))[:3])
+def test_bundled_music_probes(path):
+    info = probe_audio(path)
+    assert info['format'] == 'mp3' and info['duration'] > 10
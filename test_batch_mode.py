@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for batch job collection and the pipelined batch runner, using a stand-in engine
+"""
+
+import io
+import json
+import threading
+
+from tiny_whisper import collect_batch_jobs, run_batch
+
+class FakeEngine:
+    """Decodes a file to its name and transcribes it back, recording what ran where"""
+    def __init__(self):
+        self.decoded_on = set()
+        self.calls = []
+        self.clip_batches = []
+
+    def preprocess_audio(self, audio_path):
+        self.decoded_on.add(threading.current_thread().name)
+        if 'corrupt' in audio_path:
+            raise RuntimeError(f"ffmpeg failed to decode {audio_path}")
+        return audio_path.upper()
+
+    def transcribe(self, audio_path, language=None, audio=None, long_audio=False, use_cache=True,
+                   timestamps='segment'):
+        self.calls.append(('transcribe', audio_path, language, audio))
+        return {'success': True, 'text': audio, 'language': language or 'en'}
+
+    def generate_subtitles(self, audio_path, subtitle_format='srt', language=None, audio=None, **options):
+        self.calls.append(('subtitles', audio_path, subtitle_format, audio))
+        return {'success': True, 'format': subtitle_format, 'content': f'1\n{audio}\n'}
+
+    def transcribe_clips(self, clips, language=None, include_timestamps=True, batch_size=16):
+        self.clip_batches.append(([path for path, _ in clips], language))
+        return [{'success': True, 'text': audio, 'language': language or 'en'} for _, audio in clips]
+
+def run(engine, jobs, **options):
+    stream = io.StringIO()
+    summary = run_batch(engine, jobs, stream=stream, **options)
+    return summary, [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_directory_jobs_are_sorted_audio_files(tmp_path):
+    for name in ('b.mp3', 'a.WAV', 'notes.txt', 'c.flac'):
+        (tmp_path / name).write_bytes(b'')
+    (tmp_path / 'nested.wav').mkdir()
+    assert collect_batch_jobs(str(tmp_path)) == [
+        {'audio_file': str(tmp_path / name)} for name in ('a.WAV', 'b.mp3', 'c.flac')]
+
+def test_glob_jobs(tmp_path):
+    for name in ('one.wav', 'two.wav', 'three.mp3'):
+        (tmp_path / name).write_bytes(b'')
+    assert collect_batch_jobs(str(tmp_path / '*.wav')) == [
+        {'audio_file': str(tmp_path / 'one.wav')}, {'audio_file': str(tmp_path / 'two.wav')}]
+    assert collect_batch_jobs(str(tmp_path / '*.ogg')) == []
+
+def test_manifest_jobs_keep_bad_lines_as_errors(tmp_path):
+    manifest = tmp_path / 'jobs.jsonl'
+    manifest.write_text('"a.wav"\n'
+                        '\n'
+                        '{"audio_file": "b.wav", "id": 7, "language": "fa", "output": "b.json"}\n'
+                        '{not json\n'
+                        '{"id": 9}\n'
+                        '[1, 2]\n', encoding='utf-8')
+    jobs = collect_batch_jobs(str(manifest))
+    assert jobs[:2] == [{'audio_file': 'a.wav'},
+                        {'audio_file': 'b.wav', 'id': 7, 'language': 'fa', 'output': 'b.json'}]
+    assert [job['audio_file'] for job in jobs[2:]] == [None, None, None]
+    assert jobs[2]['error'].startswith('Invalid manifest line 4')
+    assert jobs[3]['error'] == 'Manifest line 5 has no audio_file'
+    assert jobs[4]['error'] == 'Manifest line 6 has no audio_file'
+
+def test_results_stream_in_order_and_failures_do_not_stop_the_batch():
+    engine = FakeEngine()
+    jobs = [{'audio_file': 'a.wav', 'id': 1}, {'audio_file': 'corrupt.wav'},
+            {'audio_file': None, 'error': 'Manifest line 3 has no audio_file'},
+            {'audio_file': 'c.wav', 'language': 'fa'}]
+    summary, lines = run(engine, jobs, language='en')
+
+    assert summary == {'total': 4, 'succeeded': 2, 'failed': 2}
+    assert [line['input'] for line in lines] == ['a.wav', 'corrupt.wav', None, 'c.wav']
+    assert lines[0]['text'] == 'A.WAV' and lines[0]['id'] == 1
+    assert 'ffmpeg failed' in lines[1]['error']
+    assert lines[2] == {'success': False, 'error': 'Manifest line 3 has no audio_file', 'input': None,
+                        'elapsed': lines[2]['elapsed']}
+    # Per-job language overrides the batch language
+    assert lines[3]['language'] == 'fa'
+    assert all('elapsed' in line for line in lines)
+
+def test_audio_is_decoded_on_a_background_thread():
+    engine = FakeEngine()
+    run(engine, [{'audio_file': f'{i}.wav'} for i in range(5)])
+    assert threading.current_thread().name not in engine.decoded_on
+    # The engine gets the decoded samples instead of decoding again
+    assert [call[3] for call in engine.calls] == [f'{i}.WAV' for i in range(5)]
+
+def test_results_are_written_to_the_output_directory(tmp_path):
+    engine = FakeEngine()
+    jobs = [{'audio_file': 'dir/a.wav'}, {'audio_file': 'b.wav', 'output': str(tmp_path / 'custom.srt')}]
+    summary, lines = run(engine, jobs, subtitles=True, subtitle_format='srt', output_dir=str(tmp_path))
+
+    assert summary['succeeded'] == 2
+    assert lines[0]['output'] == str(tmp_path / 'a.srt')
+    assert (tmp_path / 'a.srt').read_text(encoding='utf-8') == '1\nDIR/A.WAV\n'
+    assert (tmp_path / 'custom.srt').read_text(encoding='utf-8') == '1\nB.WAV\n'
+
+def test_unwritable_output_fails_the_job(tmp_path):
+    engine = FakeEngine()
+    summary, lines = run(engine, [{'audio_file': 'a.wav'}], output_dir=str(tmp_path / 'missing'))
+    assert summary['failed'] == 1
+    assert lines[0]['error'].startswith('Error writing output')
+
+def test_clip_batches_are_grouped_by_language():
+    engine = FakeEngine()
+    jobs = [{'audio_file': 'a.wav'}, {'audio_file': 'b.wav', 'language': 'fa'}, {'audio_file': 'corrupt.wav'},
+            {'audio_file': 'c.wav'}, {'audio_file': 'd.wav'}]
+    summary, lines = run(engine, jobs, language='en', clip_batch_size=4)
+
+    assert engine.clip_batches == [(['a.wav', 'c.wav'], 'en'), (['b.wav'], 'fa'), (['d.wav'], 'en')]
+    assert engine.calls == []
+    assert summary == {'total': 5, 'succeeded': 4, 'failed': 1}
+    assert [line['input'] for line in lines] == ['a.wav', 'b.wav', 'corrupt.wav', 'c.wav', 'd.wav']
+    assert [line.get('text') for line in lines] == ['A.WAV', 'B.WAV', None, 'C.WAV', 'D.WAV']
+
+def test_subtitle_batches_are_not_clip_batched():
+    engine = FakeEngine()
+    run(engine, [{'audio_file': 'a.wav'}], subtitles=True, subtitle_format='srt', clip_batch_size=4)
+    assert engine.clip_batches == []
+    assert engine.calls[0][0] == 'subtitles'
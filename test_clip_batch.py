@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for batched short-clip transcription and segment rebuilding from decoded tokens,
+using stand-in torch and whisper modules so no weights are needed
+"""
+
+import contextlib
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from tiny_whisper import TinyWhisper, segments_from_tokens, SAMPLE_RATE
+from transcription_cache import TranscriptionCache
+
+TIMESTAMP_BEGIN = 1000
+
+class Tokenizer:
+    """Text tokens decode to their words; tokens from TIMESTAMP_BEGIN on are 0.02s timestamps"""
+    timestamp_begin = TIMESTAMP_BEGIN
+    words = {1: ' Hello', 2: ' there.', 3: ' Bye', 4: ' ...', 5: ' '}
+
+    def decode(self, tokens):
+        return ''.join(self.words[token] for token in tokens)
+
+def ts(seconds):
+    return TIMESTAMP_BEGIN + int(round(seconds / 0.02))
+
+def test_segments_are_bracketed_by_timestamps():
+    tokens = [ts(0.0), 1, 2, ts(1.5), ts(1.5), 3, ts(2.0)]
+    assert segments_from_tokens(tokens, Tokenizer(), 3.0) == [
+        {'start': 0.0, 'end': 1.5, 'text': 'Hello there.'},
+        {'start': 1.5, 'end': 2.0, 'text': 'Bye'},
+    ]
+
+def test_segment_opened_by_the_previous_closing_timestamp():
+    tokens = [ts(0.0), 1, ts(1.0), 3, ts(2.0)]
+    assert segments_from_tokens(tokens, Tokenizer(), 3.0)[1] == {'start': 1.0, 'end': 2.0, 'text': 'Bye'}
+
+def test_trailing_text_runs_to_the_end_of_the_clip():
+    tokens = [ts(0.0), 1, ts(1.0), ts(1.2), 3]
+    assert segments_from_tokens(tokens, Tokenizer(), 2.345)[-1] == {'start': 1.2, 'end': 2.35, 'text': 'Bye'}
+
+def test_timestamps_past_the_clip_are_clamped():
+    assert segments_from_tokens([ts(0.0), 1, ts(29.98)], Tokenizer(), 2.5) == [
+        {'start': 0.0, 'end': 2.5, 'text': 'Hello'}]
+
+def test_sequence_without_timestamps_spans_the_clip():
+    assert segments_from_tokens([1, 2], Tokenizer(), 1.25) == [{'start': 0.0, 'end': 1.25, 'text': 'Hello there.'}]
+    assert segments_from_tokens([], Tokenizer(), 1.25, text=' Hi ') == [{'start': 0.0, 'end': 1.25, 'text': 'Hi'}]
+
+def test_empty_and_blank_sequences_have_no_segments():
+    assert segments_from_tokens([], Tokenizer(), 1.0) == []
+    assert segments_from_tokens([], Tokenizer(), 1.0, text='  ') == []
+    assert segments_from_tokens([ts(0.0), 5, ts(0.5), ts(0.5), 4, ts(1.0)], Tokenizer(), 1.0) == [
+        {'start': 0.5, 'end': 1.0, 'text': '...'}]
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, 'torch', types.SimpleNamespace(no_grad=contextlib.nullcontext))
+    monkeypatch.setitem(sys.modules, 'whisper',
+                        types.SimpleNamespace(audio=types.SimpleNamespace(N_SAMPLES=30 * SAMPLE_RATE)))
+    engine = object.__new__(TinyWhisper)
+    engine.model_size = 'tiny'
+    engine.precision = 'fp32'
+    engine.language = 'en'
+    engine.cache = TranscriptionCache(str(tmp_path / 'cache'))
+    engine.batches = []
+    engine.transcribed = []
+
+    def decode_clip_batch(clips, language, include_timestamps):
+        engine.batches.append(len(clips))
+        # Clips of exactly one second fail the quality checks
+        return [None if len(audio) == SAMPLE_RATE else
+                {'text': f'{len(audio)} samples', 'language': language, 'duration': len(audio) / SAMPLE_RATE,
+                 'success': True}
+                for audio in clips]
+
+    def transcribe(audio_path, include_timestamps=True, language=None, audio=None, use_cache=True):
+        engine.transcribed.append(audio_path)
+        return {'text': 'one by one', 'language': language, 'duration': len(audio) / SAMPLE_RATE,
+                'success': True}
+
+    engine._decode_clip_batch = decode_clip_batch
+    engine.transcribe = transcribe
+    return engine
+
+def clip(name, seconds):
+    return name, np.full(int(seconds * SAMPLE_RATE), seconds / 100, dtype=np.float32)
+
+def test_short_clips_are_decoded_in_batches(engine):
+    clips = [clip(f'{i}.wav', 2 + i) for i in range(5)]
+    results = engine.transcribe_clips(clips, batch_size=2)
+    assert engine.batches == [2, 2, 1]
+    assert [result['text'] for result in results] == [f'{(2 + i) * SAMPLE_RATE} samples' for i in range(5)]
+    assert engine.transcribed == []
+
+def test_long_and_rejected_clips_fall_back_to_transcribe(engine):
+    clips = [clip('short.wav', 2), clip('long.wav', 31), clip('rejected.wav', 1)]
+    results = engine.transcribe_clips(clips)
+    assert engine.batches == [2]
+    assert engine.transcribed == ['long.wav', 'rejected.wav']
+    assert [result['text'] for result in results] == [f'{2 * SAMPLE_RATE} samples', 'one by one', 'one by one']
+
+def test_batched_results_are_cached(engine):
+    clips = [clip('a.wav', 2), clip('b.wav', 3)]
+    first = engine.transcribe_clips(clips)
+    assert engine.transcribe_clips(clips) == first
+    assert engine.batches == [2]
+    # The batch is keyed by content, not by path
+    assert engine.transcribe_clips([clip('renamed.wav', 3)]) == first[1:]
+    assert engine.batches == [2]
+
+def test_failed_batch_transcribes_clips_one_by_one(engine):
+    def broken(*args):
+        raise RuntimeError('out of memory')
+    engine._decode_clip_batch = broken
+    results = engine.transcribe_clips([clip('a.wav', 2), clip('b.wav', 3)], use_cache=False)
+    assert engine.transcribed == ['a.wav', 'b.wav']
+    assert all(result['success'] for result in results)
+
+def test_undecodable_clip_reports_an_error(engine):
+    def preprocess_audio(audio_path):
+        raise RuntimeError('ffmpeg failed')
+    engine.preprocess_audio = preprocess_audio
+    results = engine.transcribe_clips([('missing.wav', None), clip('a.wav', 2)], use_cache=False)
+    assert results[0] == {'text': '', 'language': 'unknown', 'duration': 0, 'success': False, 'error': 'ffmpeg failed'}
+    assert results[1]['success']
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for first-window language detection and reuse of detection results,
+run against stand-in whisper and model objects
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from tiny_whisper import TinyWhisper, SAMPLE_RATE, DETECT_WINDOW_SECONDS
+from transcription_cache import TranscriptionCache
+
+N_SAMPLES = 30 * SAMPLE_RATE
+
+class Mel:
+    def __init__(self, samples):
+        self.samples = samples
+
+    def to(self, device):
+        return self
+
+class Model:
+    dims = types.SimpleNamespace(n_mels=80)
+    device = 'cpu'
+
+    def __init__(self):
+        self.windows = []
+
+    def detect_language(self, mel):
+        self.windows.append(mel.samples)
+        return None, {'en': 0.1, 'fa': 0.85, 'ar': 0.04, 'de': 0.01}
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, 'whisper', types.SimpleNamespace(
+        audio=types.SimpleNamespace(N_SAMPLES=N_SAMPLES),
+        pad_or_trim=lambda audio: np.pad(audio, (0, N_SAMPLES - len(audio))),
+        log_mel_spectrogram=lambda audio, n_mels: Mel(len(audio))
+    ))
+    engine = object.__new__(TinyWhisper)
+    engine.model = Model()
+    engine.model_size = 'tiny'
+    engine.precision = 'fp32'
+    engine.language = None
+    engine.cache = TranscriptionCache(str(tmp_path / 'cache'))
+    engine.decoded = []
+    engine.runs = []
+
+    def preprocess_audio(audio_path, max_seconds=None):
+        engine.decoded.append(max_seconds)
+        return np.zeros(int((max_seconds or 75) * SAMPLE_RATE), dtype=np.float32)
+
+    def run_model(audio, options):
+        engine.runs.append(options)
+        return {'text': ' salam ', 'language': options.get('language'), 'segments': []}
+
+    engine.preprocess_audio = preprocess_audio
+    engine._run_model = run_model
+    return engine
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / 'speech.wav'
+    path.write_bytes(b'speech')
+    return str(path)
+
+def test_languages_are_ranked_from_the_first_window(engine, audio_file):
+    result = engine.detect_language(audio_file, top_k=2)
+    assert result == {'success': True, 'language': 'fa', 'probabilities': [
+        {'language': 'fa', 'probability': 0.85}, {'language': 'en', 'probability': 0.1}]}
+    # Only the first window is decoded and shown to the model
+    assert engine.decoded == [DETECT_WINDOW_SECONDS]
+    assert engine.model.windows == [N_SAMPLES]
+
+def test_long_decoded_audio_is_trimmed_to_one_window(engine):
+    audio = np.zeros(75 * SAMPLE_RATE, dtype=np.float32)
+    assert engine.detect_language('memory.wav', audio=audio)['language'] == 'fa'
+    assert engine.decoded == []
+    assert engine.model.windows == [N_SAMPLES]
+
+def test_detection_is_reused_by_later_calls(engine, audio_file):
+    engine.detect_language(audio_file)
+    assert engine.detect_language(audio_file, top_k=1)['probabilities'] == [{'language': 'fa', 'probability': 0.85}]
+    result = engine.transcribe(audio_file)
+
+    assert len(engine.model.windows) == 1
+    assert result['language'] == 'fa' and result['language_probability'] == 0.85
+    assert engine.runs[0]['language'] == 'fa'
+    stats = engine.cache.stats()
+    assert (stats['language_hits'], stats['language_misses']) == (2, 1)
+
+def test_explicit_language_skips_detection(engine, audio_file):
+    engine.transcribe(audio_file, language='en')
+    assert engine.model.windows == []
+    assert engine.runs[0]['language'] == 'en'
+
+def test_detection_without_cache_runs_every_time(engine, audio_file):
+    engine.detect_language(audio_file, use_cache=False)
+    engine.detect_language(audio_file, use_cache=False)
+    assert len(engine.model.windows) == 2
+
+def test_detection_errors_are_reported(engine, tmp_path):
+    def preprocess_audio(audio_path, max_seconds=None):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    engine.preprocess_audio = preprocess_audio
+    result = engine.detect_language(str(tmp_path / 'missing.wav'), use_cache=False)
+    assert result['success'] is False and result['language'] == 'unknown'
+    assert 'not found' in result['error']
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Tests for ModelRegistry eviction and idle unloading, and for silence-based chunking and
+stitching of long-audio chunks, using a stand-in engine so no Whisper weights are needed
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+import tiny_whisper
+from tiny_whisper import ModelRegistry, ModelLoadError, WhisperWorker, split_on_silence, SAMPLE_RATE
+
+MB = 1024 * 1024
+TinyWhisper = tiny_whisper.TinyWhisper
+
+class FakeEngine:
+    sizes = {'tiny': 100 * MB, 'base': 200 * MB, 'small': 500 * MB}
+    # Model sizes whose load blocks until the event is set
+    gates = {}
+    loads = []
+    # Model sizes whose next load fails
+    broken = set()
+
+    def __init__(self, model_size, language=None, cache=None, precision='fp32'):
+        if model_size not in self.sizes:
+            raise ModelLoadError(f"Error loading model {model_size} ({precision}): no weights")
+        self.loads.append(model_size)
+        if model_size in self.gates:
+            assert self.gates[model_size].wait(5)
+        if model_size in self.broken:
+            self.broken.discard(model_size)
+            raise ModelLoadError(f"Error loading model {model_size} ({precision}): interrupted")
+        self.model_size = model_size
+        self.model_source = 'mmap'
+        self.closed = False
+
+    def memory_bytes(self):
+        return self.sizes[self.model_size]
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture(autouse=True)
+def fake_engine(monkeypatch):
+    monkeypatch.setattr(tiny_whisper, 'TinyWhisper', FakeEngine)
+    monkeypatch.setattr(FakeEngine, 'gates', {})
+    monkeypatch.setattr(FakeEngine, 'loads', [])
+    monkeypatch.setattr(FakeEngine, 'broken', set())
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+def test_least_recently_used_models_are_evicted_over_budget():
+    registry = ModelRegistry(max_memory_mb=350, cache=False)
+    tiny = registry.get('tiny')
+    registry.get('base')
+    registry.get('tiny')
+    small = registry.get('small')
+
+    # A model larger than the budget stays resident on its own
+    assert list(registry.engines) == ['small']
+    assert tiny.closed
+    registry.get('tiny')
+    assert list(registry.engines) == ['tiny']
+    assert small.closed
+
+def test_precisions_are_separate_models():
+    registry = ModelRegistry(cache=False)
+    assert registry.get('tiny') is not registry.get('tiny', 'int8')
+    assert sorted(registry.engines) == ['tiny', 'tiny-int8']
+
+def test_idle_models_are_unloaded():
+    registry = ModelRegistry(idle_timeout=60, cache=False)
+    engine = registry.get('tiny')
+    registry.get('base')
+    registry.stats['tiny']['last_used'] -= 120
+
+    assert registry.unload_idle() == ['tiny']
+    assert engine.closed
+    assert list(registry.engines) == ['base']
+    registry.close()
+
+def test_busy_models_survive_idle_reaping_and_eviction():
+    registry = ModelRegistry(max_memory_mb=350, idle_timeout=60, cache=False)
+    engine = registry.acquire('tiny')
+    registry.stats['tiny']['last_used'] -= 120
+
+    assert registry.unload_idle() == []
+    assert not registry.unload('tiny')
+    registry.get('small')
+    assert not engine.closed and 'tiny' in registry.engines
+    assert registry.report()['models'][0]['in_use'] == 1
+
+    # Idle time counts from the end of the job
+    registry.release('tiny')
+    assert registry.unload_idle() == []
+    registry.stats['tiny']['last_used'] -= 120
+    assert registry.unload_idle() == ['tiny']
+    assert engine.closed
+    registry.close()
+
+def test_release_after_unload_is_harmless():
+    registry = ModelRegistry(cache=False)
+    registry.get('tiny')
+    registry.unload('tiny')
+    registry.release('tiny')
+    assert registry.engines == {}
+
+def test_failed_load_raises_instead_of_exiting(monkeypatch):
+    def broken(model_size, device=None):
+        raise OSError('checkpoint not found')
+
+    monkeypatch.setattr(tiny_whisper, 'load_whisper_model', broken)
+    with pytest.raises(ModelLoadError, match='checkpoint not found'):
+        TinyWhisper('tiny', cache=False)
+
+def test_worker_survives_a_failed_load():
+    worker = WhisperWorker('tiny', cache=False)
+    result = worker.handle({'id': 'a', 'audio_file': 'speech.wav', 'model': 'large'})
+    assert result == {'id': 'a', 'success': False, 'error': 'Error loading model large (fp32): no weights'}
+    assert list(worker.registry.engines) == ['tiny']
+
+def test_cold_load_does_not_block_other_models():
+    registry = ModelRegistry(cache=False)
+    tiny = registry.get('tiny')
+    FakeEngine.gates['base'] = gate = threading.Event()
+    loaded = []
+    loaders = [start(lambda: loaded.append(registry.get('base'))) for _ in range(2)]
+
+    # Resident and unrelated models stay usable while 'base' is loading
+    assert registry.get('tiny') is tiny
+    assert registry.report()['models'][0]['model'] == 'tiny'
+    gate.set()
+    for thread in loaders:
+        thread.join(5)
+
+    assert FakeEngine.loads == ['tiny', 'base']
+    assert len(loaded) == 2 and loaded[0] is loaded[1]
+    assert registry.stats['base']['uses'] == 2 and registry.loading == {}
+
+def test_waiters_retry_after_a_failed_load():
+    registry = ModelRegistry(cache=False)
+    FakeEngine.gates['base'] = gate = threading.Event()
+    FakeEngine.broken.add('base')
+    outcomes = []
+
+    def load():
+        try:
+            outcomes.append(registry.get('base').model_size)
+        except ModelLoadError:
+            outcomes.append('failed')
+
+    threads = [start(load) for _ in range(2)]
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert sorted(outcomes) == ['base', 'failed']
+    assert FakeEngine.loads == ['base', 'base']
+    assert registry.loading == {} and list(registry.engines) == ['base']
+
+def test_jobs_on_different_models_run_concurrently(monkeypatch):
+    worker = WhisperWorker('tiny', cache=False)
+    worker.registry.get('base')
+    running = {'tiny': threading.Event(), 'base': threading.Event()}
+    finish_tiny = threading.Event()
+
+    def fake_run_job(engine, audio_file, **options):
+        running[engine.model_size].set()
+        if engine.model_size == 'tiny':
+            assert finish_tiny.wait(5)
+        return {'success': True, 'text': audio_file}
+
+    monkeypatch.setattr(tiny_whisper, 'run_job', fake_run_job)
+    results = {}
+    slow = start(lambda: results.setdefault('a', worker.handle({'id': 'a', 'audio_file': 'long.wav'})))
+    assert running['tiny'].wait(5)
+
+    # A second job on the busy model waits; a job on another model does not
+    queued = start(lambda: results.setdefault('b', worker.handle({'id': 'b', 'audio_file': 'next.wav'})))
+    assert worker.handle({'id': 'c', 'audio_file': 'short.wav', 'model': 'base'})['success']
+    assert 'b' not in results
+    finish_tiny.set()
+    slow.join(5)
+    queued.join(5)
+    assert results['a']['text'] == 'long.wav' and results['b']['text'] == 'next.wav'
+    assert worker.registry.stats['tiny']['in_use'] == 0
+
+def test_split_on_silence_cuts_inside_pauses():
+    rng = np.random.RandomState(0)
+    audio = rng.uniform(-0.3, 0.3, SAMPLE_RATE * 100).astype(np.float32)
+    pauses = [(38, 39), (71, 72)]
+    for start, end in pauses:
+        audio[start * SAMPLE_RATE:end * SAMPLE_RATE] = 0
+
+    bounds = split_on_silence(audio, 30)
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(audio)
+    assert all(a[1] == b[0] for a, b in zip(bounds, bounds[1:]))
+    cuts = [end / SAMPLE_RATE for _, end in bounds[:-1]]
+    assert len(cuts) == len(pauses)
+    for cut, (start, end) in zip(cuts, pauses):
+        assert start <= cut <= end
+
+def test_short_audio_is_not_split():
+    audio = np.zeros(SAMPLE_RATE * 40, dtype=np.float32)
+    assert split_on_silence(audio, 30) == [(0, len(audio))]
+
+class ChunkModel:
+    """Stands in for a worker's model: one segment per chunk, spoken in a language picked by chunk length"""
+    def _run_model(self, audio, options):
+        seconds = len(audio) / SAMPLE_RATE
+        return {
+            'text': f' {int(seconds)} seconds ',
+            'language': 'fa' if seconds < 50 else 'en',
+            'segments': [{'start': 0.0, 'end': seconds, 'text': 'chunk',
+                          'words': [{'word': 'chunk', 'start': 1.0, 'end': 2.0}]}]
+        }
+
+@pytest.fixture
+def chunked_engine(monkeypatch):
+    monkeypatch.setattr(tiny_whisper, '_chunk_engine', ChunkModel())
+    monkeypatch.setattr(tiny_whisper, 'split_on_silence',
+                        lambda audio, target_seconds: [(0, 40 * SAMPLE_RATE), (40 * SAMPLE_RATE, 100 * SAMPLE_RATE),
+                                                       (100 * SAMPLE_RATE, len(audio))])
+    engine = object.__new__(TinyWhisper)
+    engine.chunk_workers = 2
+    engine._chunk_pool = ThreadPoolExecutor(max_workers=2)
+    engine.whole = []
+    engine._run_model = lambda audio, options: engine.whole.append(len(audio)) or {'text': 'whole'}
+    yield engine
+    engine.close()
+
+def test_chunks_are_stitched_onto_the_global_timeline(chunked_engine):
+    result = chunked_engine._transcribe_chunked(np.zeros(130 * SAMPLE_RATE, dtype=np.float32), {})
+    assert result['text'] == '40 seconds 60 seconds 30 seconds'
+    # Two of the three chunks are under 50 seconds
+    assert result['language'] == 'fa'
+    assert [(segment['start'], segment['end']) for segment in result['segments']] == [
+        (0.0, 40.0), (40.0, 100.0), (100.0, 130.0)]
+    assert result['segments'][1]['words'] == [{'word': 'chunk', 'start': 41.0, 'end': 42.0}]
+    assert chunked_engine.whole == []
+
+def test_unsplit_audio_runs_in_process(chunked_engine, monkeypatch):
+    monkeypatch.setattr(tiny_whisper, 'split_on_silence', lambda audio, target_seconds: [(0, len(audio))])
+    assert chunked_engine._transcribe_chunked(np.zeros(SAMPLE_RATE, dtype=np.float32), {}) == {'text': 'whole'}
+    chunked_engine.chunk_workers = 1
+    assert chunked_engine._transcribe_chunked(np.zeros(130 * SAMPLE_RATE, dtype=np.float32), {}) == {'text': 'whole'}
+    assert chunked_engine.whole == [SAMPLE_RATE, 130 * SAMPLE_RATE]
+
+def test_broken_chunk_pool_is_replaced(chunked_engine, monkeypatch):
+    def crash(audio, offset, options):
+        raise BrokenProcessPool('A child process terminated abruptly')
+    monkeypatch.setattr(tiny_whisper, '_transcribe_chunk', crash)
+    with pytest.raises(RuntimeError, match='Long-audio worker failed'):
+        chunked_engine._transcribe_chunked(np.zeros(130 * SAMPLE_RATE, dtype=np.float32), {})
+    assert chunked_engine._chunk_pool is None
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process Piper engine, its voice cache, batch synthesis and streaming, using a
+stand-in PiperVoice so no ONNX models are needed
+"""
+
+import io
+import json
+import os
+import struct
+import types
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import piper_tts
+import piper_voices
+from piper_tts import PiperEngine, generate_speech_batch, concatenate_wavs, stream_speech, wav_stream_header
+from piper_voices import VoiceIndex
+
+RATE = 1000
+# Each character of a sentence is spoken as this many samples
+SAMPLES_PER_CHAR = 10
+
+class FakeVoice:
+    """Speaks every character as SAMPLES_PER_CHAR samples of its code point"""
+    loads = []
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.config = types.SimpleNamespace(sample_rate=RATE)
+
+    @classmethod
+    def load(cls, model_path, config_path=None, use_cuda=False):
+        with open(model_path, 'rb') as f:
+            if f.read() == b'broken':
+                raise RuntimeError('invalid ONNX model')
+        cls.loads.append(os.path.basename(model_path))
+        return cls(model_path)
+
+    @staticmethod
+    def pcm(text):
+        return b''.join((ord(char) % 100).to_bytes(2, 'little') * SAMPLES_PER_CHAR for char in text)
+
+    def synthesize_wav(self, text, wav_file):
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(RATE)
+        wav_file.writeframes(self.pcm(text))
+
+    def synthesize(self, text, include_alignments=False):
+        alignments = [types.SimpleNamespace(phoneme=char, num_samples=SAMPLES_PER_CHAR) for char in text]
+        yield types.SimpleNamespace(audio_int16_bytes=self.pcm(text),
+                                    phoneme_alignments=alignments if include_alignments else None)
+
+def write_voice(directory, name, size=1024):
+    model_path = os.path.join(str(directory), f'{name}.onnx')
+    with open(model_path, 'wb') as f:
+        f.write(b'broken' if name.endswith('broken') else b'm' * size)
+    with open(f'{model_path}.json', 'w', encoding='utf-8') as f:
+        json.dump({'audio': {'sample_rate': RATE}}, f)
+    return model_path
+
+@pytest.fixture(autouse=True)
+def fake_piper(monkeypatch, tmp_path):
+    monkeypatch.setattr(piper_tts, 'PiperVoice', FakeVoice)
+    monkeypatch.setattr(FakeVoice, 'loads', [])
+    monkeypatch.setattr(piper_voices, '_index', VoiceIndex(str(tmp_path / 'index.json')))
+    # Voice memory is estimated from the model size alone
+    monkeypatch.setattr(piper_tts, '_process_rss_bytes', lambda: None)
+    monkeypatch.setattr(piper_tts, 'download_voice_if_needed', lambda voice_name, data_dir=None: False)
+
+@pytest.fixture
+def voices(tmp_path):
+    directory = tmp_path / 'voices'
+    directory.mkdir()
+    for name in ('en_US-kristin-medium', 'fa_IR-amir-medium', 'de_DE-thorsten-low'):
+        write_voice(directory, name)
+    return str(directory)
+
+def read_frames(path):
+    with wave.open(path, 'rb') as f:
+        return f.getframerate(), f.readframes(f.getnframes())
+
+def test_synthesize_writes_a_wav_with_a_resident_voice(voices, tmp_path):
+    engine = PiperEngine(data_dir=voices)
+    output = str(tmp_path / 'out' / 'hello.wav')
+    result = engine.synthesize('Hello there', 'en_US-kristin-medium', output_file=output)
+
+    assert result['success'] and result['audio_file'] == output
+    assert result['duration'] == 0.11 and result['sample_rate'] == RATE
+    assert result['words'] == 2 and result['file_size'] == os.path.getsize(output)
+    assert read_frames(output) == (RATE, FakeVoice.pcm('Hello there'))
+
+    engine.synthesize('Again', 'en_US-kristin-medium', output_file=output)
+    # The voice is loaded once and the second result replaced the first file
+    assert FakeVoice.loads == ['en_US-kristin-medium.onnx']
+    assert read_frames(output)[1] == FakeVoice.pcm('Again')
+    assert engine.stats()['synthesized'] == 2
+
+def test_output_file_defaults_to_the_data_dir(voices):
+    result = PiperEngine(data_dir=voices).synthesize('Hi', 'en_US-kristin-medium')
+    assert os.path.dirname(result['audio_file']) == os.path.abspath(voices)
+    assert os.path.basename(result['audio_file']).startswith('piper_tts_')
+
+def test_synthesize_errors(voices):
+    engine = PiperEngine(data_dir=voices)
+    assert engine.synthesize('  ', 'en_US-kristin-medium') == {
+        'success': False, 'error': 'متن مورد نیاز است'}
+    assert engine.synthesize('Hi', 'xx_XX-missing-low') == {
+        'success': False, 'error': 'خطا در دانلود صدا: xx_XX-missing-low'}
+    write_voice(voices, 'en_US-broken')
+    assert not engine.synthesize('Hi', 'en_US-broken')['success']
+    assert engine.stats()['synthesized'] == 0
+
+def test_timed_synthesis_reports_aligned_sentences(voices, tmp_path):
+    engine = PiperEngine(data_dir=voices)
+    output = str(tmp_path / 'timed.wav')
+    result = engine.synthesize('Hi you. Bye', 'en_US-kristin-medium', output_file=output, timings=True)
+
+    assert result['success'] and result['timing_source'] == 'alignment'
+    assert [(s['text'], s['offset'], s['duration']) for s in result['sentences']] == [
+        ('Hi you.', 0.0, 0.07), ('Bye', 0.07, 0.03)]
+    assert result['sentences'][0]['words'] == [{'word': 'Hi', 'start': 0.0, 'end': 0.02},
+                                               {'word': 'you.', 'start': 0.03, 'end': 0.06}]
+    assert result['duration'] == 0.1
+    assert read_frames(output)[1] == FakeVoice.pcm('Hi you.') + FakeVoice.pcm('Bye')
+
+def test_engine_needs_the_piper_library(monkeypatch):
+    monkeypatch.setattr(piper_tts, 'PiperVoice', None)
+    with pytest.raises(ImportError):
+        PiperEngine()
+
+MB = 1024 * 1024
+
+@pytest.fixture
+def large_voices(tmp_path):
+    directory = tmp_path / 'large'
+    directory.mkdir()
+    for name, size in (('en_US-kristin-medium', MB), ('fa_IR-amir-medium', MB), ('de_DE-thorsten-low', MB),
+                       ('en_US-huge-high', 3 * MB)):
+        write_voice(directory, name, size)
+    return str(directory)
+
+def loaded(engine):
+    return [stat['voice'] for stat in engine.stats()['voices']]
+
+def test_least_recently_used_voice_is_unloaded_over_budget(large_voices):
+    engine = PiperEngine(data_dir=large_voices, max_memory_mb=2.5)
+    engine.load_voice('en_US-kristin-medium')
+    engine.load_voice('fa_IR-amir-medium')
+    engine.load_voice('en_US-kristin-medium')
+    engine.load_voice('de_DE-thorsten-low')
+
+    assert loaded(engine) == ['en_US-kristin-medium', 'de_DE-thorsten-low']
+    stats = engine.stats()
+    assert stats['evictions'] == 1 and stats['total_memory_mb'] == 2.0 and stats['max_memory_mb'] == 2.5
+    assert stats['voices'][0]['hits'] == 1
+    # An unloaded voice is loaded again on its next use
+    engine.load_voice('fa_IR-amir-medium')
+    assert FakeVoice.loads.count('fa_IR-amir-medium.onnx') == 2
+    assert loaded(engine) == ['de_DE-thorsten-low', 'fa_IR-amir-medium']
+
+def test_voice_over_the_budget_stays_loaded_alone(large_voices):
+    engine = PiperEngine(data_dir=large_voices, max_memory_mb=2.5)
+    engine.load_voice('en_US-kristin-medium')
+    voice = engine.load_voice('en_US-huge-high')
+    assert loaded(engine) == ['en_US-huge-high']
+    assert engine.load_voice('en_US-huge-high') is voice
+
+def test_unbounded_engine_keeps_every_voice(large_voices):
+    engine = PiperEngine(data_dir=large_voices)
+    for name in ('en_US-kristin-medium', 'fa_IR-amir-medium', 'en_US-huge-high'):
+        engine.load_voice(name)
+    assert len(loaded(engine)) == 3 and engine.stats()['max_memory_mb'] is None
+    assert engine.unload_voice(engine.load_voice('fa_IR-amir-medium').model_path)
+    assert not engine.unload_voice('not-loaded.onnx')
+    assert loaded(engine) == ['en_US-kristin-medium', 'en_US-huge-high']
+
+def test_preloaded_voices_are_ready_before_the_first_request(voices):
+    engine = PiperEngine(data_dir=voices, preload=['fa_IR-amir-medium', 'xx_XX-missing-low'])
+    assert loaded(engine) == ['fa_IR-amir-medium']
+    engine.synthesize('Salam', 'fa_IR-amir-medium')
+    assert FakeVoice.loads == ['fa_IR-amir-medium.onnx']
+    assert engine.stats()['voices'][0]['hits'] == 1
+
+@pytest.fixture
+def shared_engine(voices, monkeypatch):
+    """The process-wide engine generate_speech uses, with the TTS output cache disabled"""
+    engine = PiperEngine(data_dir=voices)
+    monkeypatch.setattr(piper_tts, '_engine', engine)
+    monkeypatch.setattr(piper_tts, '_tts_cache', None)
+    monkeypatch.setattr(piper_tts, '_tts_cache_opened', True)
+    return engine
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    """Run batch workers as threads sharing the test's engine instead of spawned processes"""
+    pools = []
+
+    def get_batch_pool(workers, data_dir=None, max_memory_mb=None):
+        pools.append(ThreadPoolExecutor(max_workers=workers))
+        return pools[-1]
+
+    monkeypatch.setattr(piper_tts, '_get_batch_pool', get_batch_pool)
+    yield pools
+    for pool in pools:
+        pool.shutdown()
+
+def test_batch_items_accept_strings_pairs_and_objects(shared_engine, voices, tmp_path):
+    items = ['One.', ('Two.', 'fa_IR-amir-medium'), {'text': 'Three.', 'voice': 'de_DE-thorsten-low'}, ['Four.']]
+    batch = generate_speech_batch(items, output_dir=str(tmp_path / 'out'), data_dir=voices, workers=1)
+
+    assert batch['success'] and batch['count'] == 4 and batch['workers'] == 1
+    assert [item['voice'] for item in batch['items']] == [
+        'en_US-kristin-medium', 'fa_IR-amir-medium', 'de_DE-thorsten-low', 'en_US-kristin-medium']
+    assert [item['index'] for item in batch['items']] == [0, 1, 2, 3]
+    for item, text in zip(batch['items'], ('One.', 'Two.', 'Three.', 'Four.')):
+        assert os.path.dirname(item['audio_file']) == str(tmp_path / 'out')
+        assert read_frames(item['audio_file'])[1] == FakeVoice.pcm(text)
+
+def test_pooled_batch_keeps_item_order(shared_engine, voices, tmp_path, thread_pool):
+    texts = [f'Item {i}.' * (i + 1) for i in range(6)]
+    batch = generate_speech_batch(texts, output_dir=str(tmp_path), data_dir=voices, workers=3)
+    assert batch['success'] and batch['workers'] == 3 and len(thread_pool) == 1
+    assert [read_frames(item['audio_file'])[1] for item in batch['items']] == [FakeVoice.pcm(t) for t in texts]
+
+def test_batch_concatenates_items_with_gaps(shared_engine, voices, tmp_path):
+    output = str(tmp_path / 'all.wav')
+    batch = generate_speech_batch(['Hello.', 'Hi.'], output_dir=str(tmp_path), data_dir=voices, workers=1,
+                                  concatenate=True, output_file=output, gap_seconds=0.5)
+
+    assert batch['audio_file'] == output and batch['duration'] == 0.59 and batch['sample_rate'] == RATE
+    assert [(item['offset'], item['duration']) for item in batch['items']] == [(0.0, 0.06), (0.56, 0.03)]
+    assert read_frames(output)[1] == FakeVoice.pcm('Hello.') + b'\x00' * 1000 + FakeVoice.pcm('Hi.')
+    # Parts are removed once joined
+    assert all('audio_file' not in item for item in batch['items'])
+    assert sorted(os.listdir(str(tmp_path))) == ['all.wav', 'index.json', 'voices']
+
+def test_batch_keeps_parts_on_request(shared_engine, voices, tmp_path):
+    batch = generate_speech_batch(['A.', 'B.'], output_dir=str(tmp_path / 'out'), data_dir=voices, workers=1,
+                                  concatenate=True, keep_parts=True)
+    assert all(os.path.exists(item['audio_file']) for item in batch['items'])
+    assert os.path.exists(batch['audio_file'])
+
+def test_failed_items_are_reported_without_concatenating(shared_engine, voices, tmp_path, thread_pool, monkeypatch):
+    downloads = []
+    monkeypatch.setattr(piper_tts, 'download_voice_if_needed',
+                        lambda voice_name, data_dir=None: downloads.append(voice_name) or False)
+    items = ['Fine.', ('Lost.', 'xx_XX-missing-low'), ('Also lost.', 'xx_XX-missing-low')]
+    batch = generate_speech_batch(items, output_dir=str(tmp_path / 'out'), data_dir=voices, workers=2,
+                                  concatenate=True)
+
+    assert not batch['success'] and batch['failed'] == 2 and batch['count'] == 3
+    assert batch['error'] == 'خطا در دانلود صدا: xx_XX-missing-low'
+    assert 'audio_file' not in batch
+    # Missing voices are fetched once before the workers start
+    assert downloads[0] == 'xx_XX-missing-low'
+
+def test_empty_batch_is_rejected(shared_engine):
+    assert generate_speech_batch([]) == {'success': False, 'error': 'متن مورد نیاز است'}
+
+def test_concatenate_rejects_mismatched_formats(tmp_path):
+    paths = []
+    for rate in (RATE, 2 * RATE):
+        paths.append(str(tmp_path / f'{rate}.wav'))
+        with wave.open(paths[-1], 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(rate)
+            f.writeframes(b'\x00\x00' * 10)
+    with pytest.raises(ValueError):
+        concatenate_wavs(paths, str(tmp_path / 'joined.wav'))
+
+class ClosedPipe(io.BytesIO):
+    """Reader that goes away after the first sentence"""
+    def write(self, data):
+        if self.tell() > 44:
+            raise BrokenPipeError()
+        return super().write(data)
+
+def test_stream_yields_each_sentence_as_it_is_synthesized(voices):
+    engine = PiperEngine(data_dir=voices)
+    chunks = engine.stream('First one. Second?\nسلام؟ آخر', 'en_US-kristin-medium', alignments=True)
+    first = next(chunks)
+    # Only the first sentence has been synthesized so far
+    assert engine.stats()['synthesized'] == 1
+    assert first == {'index': 0, 'text': 'First one.', 'sample_rate': RATE, 'pcm': FakeVoice.pcm('First one.'),
+                     'alignments': [(char, SAMPLES_PER_CHAR) for char in 'First one.']}
+    assert [chunk['text'] for chunk in chunks] == ['Second?', 'سلام؟', 'آخر']
+
+def test_stream_speech_writes_pcm_and_a_sentence_map(shared_engine):
+    output = io.BytesIO()
+    result = stream_speech('Hello there. Bye', output, 'en_US-kristin-medium')
+    assert output.getvalue() == FakeVoice.pcm('Hello there.') + FakeVoice.pcm('Bye')
+    assert result['success'] and result['format'] == 'pcm' and result['duration'] == 0.15
+    assert result['sentences'] == [{'index': 0, 'text': 'Hello there.', 'offset': 0.0, 'duration': 0.12},
+                                   {'index': 1, 'text': 'Bye', 'offset': 0.12, 'duration': 0.03}]
+
+def test_stream_speech_wav_header_has_an_open_length(shared_engine):
+    output = io.BytesIO()
+    stream_speech('Hi.', output, 'en_US-kristin-medium', stream_format='wav')
+    data = output.getvalue()
+    assert data[:44] == wav_stream_header(RATE)
+    assert struct.unpack('<I', data[4:8])[0] == 0xFFFFFFFF and struct.unpack('<I', data[24:28])[0] == RATE
+    assert data[44:] == FakeVoice.pcm('Hi.')
+
+def test_stream_speech_stops_when_the_reader_leaves(shared_engine):
+    result = stream_speech('One. Two. Three.', ClosedPipe(), 'en_US-kristin-medium', stream_format='wav')
+    assert result == {'success': False, 'error': 'Stream closed by reader',
+                      'sentences': [{'index': 0, 'text': 'One.', 'offset': 0.0, 'duration': 0.04}]}
+    assert shared_engine.stats()['synthesized'] == 2
+
+def test_stream_speech_errors(shared_engine, monkeypatch):
+    assert stream_speech('Hi', io.BytesIO(), stream_format='mp3')['error'] == 'Unsupported stream format: mp3'
+    assert stream_speech(' ', io.BytesIO()) == {'success': False, 'error': 'متن مورد نیاز است'}
+    result = stream_speech('Hi', io.BytesIO(), 'xx_XX-missing-low')
+    assert not result['success'] and result['sentences'] == []
+    monkeypatch.setattr(piper_tts, 'PiperVoice', None)
+    assert 'not installed' in stream_speech('Hi', io.BytesIO())['error']
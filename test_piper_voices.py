@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the local Piper voice index: indexing, checksums and replaced or deleted voices
+"""
+
+import json
+import os
+
+from piper_voices import VoiceIndex, file_checksum
+
+def write_voice(directory, name, model=b'model', mtime=1000):
+    model_path = os.path.join(str(directory), f'{name}.onnx')
+    with open(model_path, 'wb') as f:
+        f.write(model)
+    with open(f'{model_path}.json', 'w', encoding='utf-8') as f:
+        json.dump({'language': {'code': name.split('-')[0]}, 'audio': {'sample_rate': 22050}}, f)
+    os.utime(model_path, (mtime, mtime))
+    return model_path
+
+def test_refresh_indexes_voices(tmp_path):
+    write_voice(tmp_path, 'fa_IR-amir-medium')
+    write_voice(tmp_path, 'en_US-kristin-medium')
+    index = VoiceIndex(str(tmp_path / 'index.json'))
+    assert index.refresh([str(tmp_path)]) == 2
+
+    entry = index.resolve('fa_IR-amir-medium')
+    assert entry['language'] == 'fa_IR' and entry['gender'] == 'male'
+    assert entry['sample_rate'] == 22050 and entry['quality'] == 'medium'
+    # The index survives a restart
+    assert VoiceIndex(str(tmp_path / 'index.json')).resolve('en_US-kristin-medium')['gender'] == 'female'
+
+def test_replaced_voice_gets_a_new_checksum(tmp_path):
+    model_path = write_voice(tmp_path, 'fa_IR-amir-medium', b'old model')
+    index = VoiceIndex(str(tmp_path / 'index.json'))
+    index.add(model_path)
+    assert index.resolve('fa_IR-amir-medium')['checksum'] == file_checksum(model_path)
+
+    # Same size, newer mtime
+    write_voice(tmp_path, 'fa_IR-amir-medium', b'new model', mtime=2000)
+    entry = index.resolve('fa_IR-amir-medium')
+    assert entry['checksum'] == file_checksum(model_path)
+    assert entry['mtime'] == 2000
+    assert VoiceIndex(str(tmp_path / 'index.json')).voices[model_path]['checksum'] == entry['checksum']
+
+def test_unchanged_voice_is_not_hashed_again(tmp_path, monkeypatch):
+    model_path = write_voice(tmp_path, 'fa_IR-amir-medium')
+    index = VoiceIndex(str(tmp_path / 'index.json'))
+    index.add(model_path)
+    monkeypatch.setattr('piper_voices.file_checksum', lambda path: 'rehashed')
+    assert index.resolve('fa_IR-amir-medium')['checksum'] != 'rehashed'
+
+def test_deleted_voice_is_forgotten(tmp_path):
+    model_path = write_voice(tmp_path, 'fa_IR-amir-medium')
+    index = VoiceIndex(str(tmp_path / 'index.json'))
+    index.add(model_path)
+    os.remove(model_path)
+    assert index.resolve('fa_IR-amir-medium') is None
+    assert index.voices == {}
+
+def test_data_dir_is_preferred(tmp_path):
+    first = write_voice(tmp_path / '.', 'fa_IR-amir-medium')
+    (tmp_path / 'other').mkdir()
+    second = write_voice(tmp_path / 'other', 'fa_IR-amir-medium')
+    index = VoiceIndex(str(tmp_path / 'index.json'))
+    index.add(first)
+    index.add(second)
+    assert index.resolve('fa_IR-amir-medium', str(tmp_path / 'other'))['model_path'] == second
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for pyttsx3_tts voice resolution and per-cycle batching, run against a fake driver
+"""
+
+import io
+import json
+import sys
+import types
+import wave
+
+import pytest
+
+class FakeVoice:
+    def __init__(self, voice_id, name, languages):
+        self.id = voice_id
+        self.name = name
+        self.languages = languages
+
+class FakeEngine:
+    """Records queued commands; runAndWait writes a short WAV for every save_to_file"""
+
+    # eSpeak lists Afrikaans before English and reports languages as priority-prefixed bytes
+    voices = [
+        FakeVoice('afrikaans', 'afrikaans', [b'\x05af']),
+        FakeVoice('english', 'english', [b'\x05en']),
+        FakeVoice('persian', 'persian', [b'\x05fa']),
+    ]
+
+    def __init__(self):
+        self.queue = []
+        self.cycles = 0
+
+    def getProperty(self, name):
+        return self.voices if name == 'voices' else None
+
+    def setProperty(self, name, value):
+        self.queue.append(('set', name, value))
+
+    def save_to_file(self, text, output_file):
+        self.queue.append(('save', text, output_file))
+
+    def runAndWait(self):
+        self.cycles += 1
+        for command in self.queue:
+            if command[0] == 'save':
+                with wave.open(command[2], 'wb') as f:
+                    f.setnchannels(1)
+                    f.setsampwidth(2)
+                    f.setframerate(22050)
+                    f.writeframes(b'\x00\x00' * 22050)
+        self.queue = []
+
+sys.modules.setdefault('pyttsx3', types.SimpleNamespace(init=FakeEngine))
+
+import pyttsx3_tts
+
+@pytest.fixture(autouse=True)
+def fresh_engine(monkeypatch):
+    monkeypatch.setattr(pyttsx3_tts.pyttsx3, 'init', FakeEngine)
+    monkeypatch.setattr(pyttsx3_tts, '_engine', None)
+    monkeypatch.setattr(pyttsx3_tts, '_default_voice_id', None)
+    monkeypatch.setattr(pyttsx3_tts, '_voices', {})
+    monkeypatch.setattr(pyttsx3_tts, '_resolved_voices', {})
+    monkeypatch.setenv('TTS_NO_CACHE', '1')
+
+@pytest.mark.parametrize('voice', ['af_heart_0', 'am_adam', 'bf_emma', 'bm_george', None, 'unknown'])
+def test_kokoro_and_unknown_voices_get_english(voice):
+    assert pyttsx3_tts.resolve_voice(voice) == 'english'
+
+@pytest.mark.parametrize('voice, expected', [
+    ('fa', 'persian'),
+    ('fa_IR-amir-medium', 'persian'),
+    ('af', 'afrikaans'),
+    ('en_US-kristin-medium', 'english'),
+    ('Persian', 'persian'),
+    ('afrikaans', 'afrikaans'),
+])
+def test_locale_and_name_voices(voice, expected):
+    assert pyttsx3_tts.resolve_voice(voice) == expected
+
+def test_batch_renders_in_one_cycle(tmp_path):
+    jobs = [{'text': f'sentence {i}', 'voice': voice} for i, voice in enumerate(['af_heart_0', 'fa', 'am_adam'])]
+    jobs.append({'text': '   '})
+    results = pyttsx3_tts.generate_speech_batch(jobs, str(tmp_path))
+
+    assert pyttsx3_tts.get_engine().cycles == 1
+    assert [result['success'] for result in results] == [True, True, True, False]
+    assert results[0]['duration'] == 1.0
+    assert results[0]['sample_rate'] == 22050
+
+def test_worker_batches_lines_and_stops_at_shutdown(tmp_path):
+    worker = pyttsx3_tts.Pyttsx3Worker(str(tmp_path))
+    responses = worker.handle_lines([
+        '{"id": "a", "text": "one"}',
+        '{"id": "b", "items": ["two", {"text": "three", "voice": "fa"}]}',
+        'not json',
+        '{"command": "shutdown"}',
+        '{"id": "c", "text": "never"}',
+    ])
+
+    assert responses[0]['id'] == 'a' and responses[0]['batched_with'] == 3
+    assert responses[1]['success'] and len(responses[1]['results']) == 2
+    assert not responses[2]['success']
+    assert responses[3]['shutdown']
+    assert responses[4] is None
+    assert worker.cycles == 1 and pyttsx3_tts.get_engine().cycles == 1
+
+def test_max_batch_caps_utterances_per_cycle(tmp_path):
+    worker = pyttsx3_tts.Pyttsx3Worker(str(tmp_path), max_batch=2)
+    responses = worker.handle_lines(['{"id": "a", "items": ["one", "two", "three", "four", "five"]}'])
+
+    assert responses[0]['success'] and len(responses[0]['results']) == 5
+    assert worker.cycles == 3 and pyttsx3_tts.get_engine().cycles == 3
+
+def test_serve_stdio_counts_items_towards_the_batch(tmp_path):
+    worker = pyttsx3_tts.Pyttsx3Worker(str(tmp_path), max_batch=2)
+    stdin = io.StringIO('{"id": "a", "items": ["one", "two", "three"]}\n{"id": "b", "text": "four"}\n')
+    stdout = io.StringIO()
+    worker.serve_stdio(stdin, stdout)
+
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [response['batched_with'] for response in responses] == [3, 1]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming subtitle writers and word-based caption chunking
+"""
+
+import json
+
+import pytest
+
+import subtitle_writer
+from subtitle_writer import (format_srt_time, format_vtt_time, format_ass_time, chunk_words,
+                             render, write_subtitles)
+
+CAPTIONS = [
+    {'start': 0.5, 'end': 2.25, 'text': ' Hello there '},
+    {'start': 3661.125, 'end': 3662.0, 'text': 'Use {braces}\nand lines'},
+]
+
+def test_time_formats():
+    assert format_srt_time(3661.125) == '01:01:01,125'
+    assert format_vtt_time(3661.125) == '01:01:01.125'
+    assert format_ass_time(3661.125) == '1:01:01.12'
+    assert format_srt_time(0) == '00:00:00,000'
+
+def test_srt_numbers_cues_and_separates_them_with_blank_lines():
+    assert render(CAPTIONS, 'srt') == (
+        '1\n00:00:00,500 --> 00:00:02,250\nHello there\n'
+        '\n2\n01:01:01,125 --> 01:01:02,000\nUse {braces}\nand lines\n'
+    )
+
+def test_vtt_has_header_and_dotted_times():
+    assert render(CAPTIONS, 'vtt').startswith('WEBVTT\n\n00:00:00.500 --> 00:00:02.250\nHello there\n')
+
+def test_ass_escapes_override_blocks_and_newlines():
+    document = render(CAPTIONS, 'ass')
+    assert document.startswith(subtitle_writer.ASS_HEADER)
+    events = document[len(subtitle_writer.ASS_HEADER):].splitlines()
+    assert events == [
+        'Dialogue: 0,0:00:00.50,0:00:02.25,Default,,0,0,0,,Hello there',
+        'Dialogue: 0,1:01:01.12,1:01:02.00,Default,,0,0,0,,Use (braces)\\Nand lines',
+    ]
+
+def test_jsonl_keeps_words_and_unicode():
+    captions = [{'start': 0.0, 'end': 1.0, 'text': 'سلام', 'words': [{'word': 'سلام', 'start': 0.0, 'end': 1.0}]}]
+    line = render(captions, 'jsonl')
+    assert 'سلام' in line
+    assert json.loads(line) == {'index': 1, 'start': 0.0, 'end': 1.0, 'text': 'سلام',
+                                'words': [{'word': 'سلام', 'start': 0.0, 'end': 1.0}]}
+
+def test_chunk_words_groups_within_segments():
+    segments = [
+        {'start': 0.0, 'end': 2.0, 'text': 'one two three', 'words': [
+            {'word': 'one', 'start': 0.1, 'end': 0.5},
+            {'word': 'two', 'start': 0.6, 'end': 1.0},
+            {'word': 'three', 'start': 1.1, 'end': 1.8},
+        ]},
+        {'start': 2.0, 'end': 3.0, 'text': 'no word timings'},
+    ]
+    assert chunk_words(segments, 2) == [
+        {'start': 0.1, 'end': 1.0, 'text': 'one two'},
+        {'start': 1.1, 'end': 1.8, 'text': 'three'},
+        {'start': 2.0, 'end': 3.0, 'text': 'no word timings'},
+    ]
+
+def test_write_subtitles_writes_every_format_from_a_generator(tmp_path):
+    outputs = {fmt: str(tmp_path / 'subs' / f'out.{fmt}') for fmt in subtitle_writer.SUBTITLE_FORMATS}
+    written = write_subtitles(iter(CAPTIONS), outputs)
+    assert written == outputs
+    for fmt, path in outputs.items():
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == render(CAPTIONS, fmt)
+
+def test_unknown_format_is_rejected_before_writing(tmp_path):
+    with pytest.raises(ValueError):
+        write_subtitles(CAPTIONS, {'srt': str(tmp_path / 'a.srt'), 'sub': str(tmp_path / 'a.sub')})
+    assert not (tmp_path / 'a.srt').exists()
@@ -8,10 +8,8 @@ import sys
 import json
 from tiny_whisper import TinyWhisper
 
-def test_tiny_whisper():
-    """Test Tiny Whisper with available audio files"""
-    
-    # Check for available audio files
+def find_audio_files():
+    """Audio files available for the smoke test"""
     audio_files = []
     
     # Check public/audio directory
@@ -27,7 +25,10 @@ def test_tiny_whisper():
         for file in os.listdir(uploads_audio_dir):
             if file.endswith(('.wav', '.mp3', '.m4a', '.flac')):
                 audio_files.append(os.path.join(uploads_audio_dir, file))
-    
+    return audio_files
+
+def run_smoke_test(audio_files):
+    """Transcribe and subtitle the first audio file, returning whether both succeeded"""
     if not audio_files:
         print("❌ No audio files found for testing")
         print("Please add some audio files to public/audio or uploads/audio directories")
@@ -54,7 +55,7 @@ def test_tiny_whisper():
             print("✅ Transcription successful!")
             print(f"📝 Text: {result['text'][:100]}...")
             print(f"🌍 Language: {result['language']}")
-            print(f"⏱️  Segments: {result['duration']}")
+            print(f"⏱️  Duration: {result['duration']}s")
             
             # Test subtitle generation
             print("\n📋 Testing subtitle generation...")
@@ -84,11 +85,21 @@ def test_tiny_whisper():
         print(f"❌ Test failed with exception: {e}")
         return False
 
+def test_tiny_whisper():
+    """Test Tiny Whisper with available audio files"""
+    import pytest
+    
+    pytest.importorskip("whisper")
+    audio_files = find_audio_files()
+    if not audio_files:
+        pytest.skip("No audio files in public/audio or uploads/audio")
+    assert run_smoke_test(audio_files)
+
 def main():
     print("🚀 Tiny Whisper Test Script")
     print("=" * 50)
     
-    success = test_tiny_whisper()
+    success = run_smoke_test(find_audio_files())
     
     print("\n" + "=" * 50)
     if success:
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed transcription cache: keys, hits, misses and LRU eviction
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from transcription_cache import TranscriptionCache
+
+def write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+def test_keys_follow_audio_content_and_options(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / 'cache'))
+    first = write_file(tmp_path / 'a.wav', b'audio')
+    copy = write_file(tmp_path / 'b.wav', b'audio')
+    other = write_file(tmp_path / 'c.wav', b'other')
+
+    key = cache.make_key(first, model='tiny', language='auto')
+    assert key == cache.make_key(copy, model='tiny', language='auto')
+    assert key != cache.make_key(other, model='tiny', language='auto')
+    assert key != cache.make_key(first, model='base', language='auto')
+    assert key != cache.make_key(first, model='tiny', language='fa')
+    assert key == cache.key_from_digest(cache.content_digest(first), language='auto', model='tiny')
+
+def test_decoded_audio_is_hashed_without_a_file(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / 'cache'))
+    audio = np.arange(10, dtype=np.float32)
+    assert cache.content_digest(None, audio) == cache.content_digest(None, audio.copy())
+    assert cache.content_digest(None, audio) != cache.content_digest(None, audio[::-1].copy())
+    with pytest.raises(ValueError):
+        cache.content_digest(str(tmp_path / 'missing.wav'))
+
+def test_put_then_get(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / 'cache'))
+    key = cache.make_key(write_file(tmp_path / 'a.wav', b'audio'), model='tiny')
+    assert cache.get(key) is None
+    cache.put(key, {'text': 'سلام', 'success': True})
+    assert cache.get(key) == {'text': 'سلام', 'success': True}
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+def test_language_lookups_are_counted_separately(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / 'cache'))
+    cache.put('detected', {'language': 'fa'})
+    for _ in range(3):
+        assert cache.get('detected', kind='language') == {'language': 'fa'}
+    assert cache.get('transcript') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (0, 1, 0.0)
+    assert (stats['language_hits'], stats['language_misses'], stats['language_hit_rate']) == (3, 0, 1.0)
+
+def test_eviction_drops_least_recently_used_entries(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / 'cache'), max_size_mb=250 / (1024 * 1024))
+    for i, key in enumerate(['old', 'used', 'new']):
+        cache.put(key, {'text': 'x' * 100})
+        os.utime(os.path.join(cache.cache_dir, f'{key}.json'), (1000 + i, 1000 + i))
+        if key == 'used':
+            # A hit makes the entry recent again
+            cache.get('old')
+
+    assert cache.get('old') is not None
+    assert cache.get('used') is None
+    assert cache.evictions == 1
+    assert cache.size_bytes <= cache.max_size_bytes
+
+def test_clear(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / 'cache'))
+    cache.put('key', {'text': 'x'})
+    cache.clear()
+    assert cache.get('key') is None and cache.size_bytes == 0
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed TTS cache: key normalization, hits and LRU eviction
+"""
+
+import os
+import types
+
+import pytest
+
+import tts_cache
+from tts_cache import TTSCache, normalize_text, open_tts_cache
+
+def write_audio(path, size, mtime=1000, fill=b'\x01'):
+    with open(path, 'wb') as f:
+        f.write(fill * size)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """Strictly increasing time, so entry recency never ties"""
+    ticks = iter(range(1, 10 ** 6))
+    monkeypatch.setattr(tts_cache, 'time', types.SimpleNamespace(time=lambda: float(next(ticks))))
+
+def test_normalize_text_folds_spacing_and_arabic_letters():
+    assert normalize_text('  سلام   دنيا\n') == 'سلام دنیا'
+    assert normalize_text('كتاب') == 'کتاب'
+    # NFKC folds full-width characters
+    assert normalize_text('ＡＢＣ') == 'ABC'
+
+def test_key_covers_text_voice_engine_and_params(tmp_path):
+    cache = TTSCache(str(tmp_path / 'cache'))
+    key = cache.make_key('Hello  world', 'voice', 'piper', length_scale=1.0)
+    assert key == cache.make_key('Hello world', 'voice', 'piper', length_scale=1.0)
+    assert key != cache.make_key('Hello world', 'other', 'piper', length_scale=1.0)
+    assert key != cache.make_key('Hello world', 'voice', 'pyttsx3', length_scale=1.0)
+    assert key != cache.make_key('Hello world', 'voice', 'piper', length_scale=1.2)
+
+def test_put_then_get_links_audio_and_returns_metadata(tmp_path):
+    cache = TTSCache(str(tmp_path / 'cache'))
+    key = cache.make_key('text', 'voice', 'piper')
+    assert cache.get(key, str(tmp_path / 'miss.wav')) is None
+
+    cache.put(key, write_audio(tmp_path / 'source.wav', 100, 1000), {'duration': 1.5})
+    output = tmp_path / 'out' / 'hit.wav'
+    assert cache.get(key, str(output)) == {'duration': 1.5}
+    assert output.read_bytes() == b'\x01' * 100
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['total_hits'] == 1
+
+def test_get_replaces_an_existing_output_file(tmp_path):
+    cache = TTSCache(str(tmp_path / 'cache'))
+    key = cache.make_key('text', 'voice', 'piper')
+    cache.put(key, write_audio(tmp_path / 'source.wav', 10, 1000))
+    output = tmp_path / 'hit.wav'
+    output.write_bytes(b'old')
+    assert cache.get(key, str(output)) == {}
+    assert output.read_bytes() == b'\x01' * 10
+
+def test_cached_audio_is_independent_of_caller_files(tmp_path):
+    cache = TTSCache(str(tmp_path / 'cache'))
+    key = cache.make_key('text', 'voice', 'espeak')
+    source = write_audio(tmp_path / 'source.wav', 10)
+    cache.put(key, source)
+    output = tmp_path / 'hit.wav'
+    cache.get(key, str(output))
+    assert not os.path.samefile(output, source)
+
+    # Engines that write in place must not reach the cached audio
+    for path in (source, output):
+        with open(path, 'r+b') as f:
+            f.write(b'\x02' * 10)
+    assert cache.get(key, str(tmp_path / 'again.wav')) == {}
+    assert (tmp_path / 'again.wav').read_bytes() == b'\x01' * 10
+
+def test_eviction_drops_least_recently_used_entries(tmp_path):
+    cache = TTSCache(str(tmp_path / 'cache'), max_size_mb=1500 / (1024 * 1024))
+    keys = [cache.make_key(f'text {i}', 'voice', 'piper') for i in range(3)]
+    cache.put(keys[0], write_audio(tmp_path / 'source0.wav', 600))
+    cache.put(keys[1], write_audio(tmp_path / 'source1.wav', 600))
+    # A hit makes the oldest entry the most recently used
+    assert cache.get(keys[0], str(tmp_path / 'first.wav')) is not None
+    cache.put(keys[2], write_audio(tmp_path / 'source2.wav', 600))
+
+    assert cache.get(keys[1], str(tmp_path / 'second.wav')) is None
+    assert cache.get(keys[0], str(tmp_path / 'first.wav')) is not None
+    assert cache.get(keys[2], str(tmp_path / 'last.wav')) is not None
+    assert cache.evictions == 1
+    assert cache.size_bytes <= cache.max_size_bytes
+
+def test_open_tts_cache_respects_no_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv('TTS_NO_CACHE', '1')
+    assert open_tts_cache(str(tmp_path)) is None
+    monkeypatch.delenv('TTS_NO_CACHE')
+    assert open_tts_cache(str(tmp_path)).cache_dir == str(tmp_path)
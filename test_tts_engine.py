@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests for TTSRouter fallback and health-based routing, using scripted backends and a fake clock
+"""
+
+import types
+
+import pytest
+
+import tts_engine
+from tts_engine import TTSRouter, Backend
+
+LONG_TEXT = 'x' * 100
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class ScriptedBackend(Backend):
+    """Backend whose calls take `seconds` of fake time and succeed unless `fail` is set"""
+
+    clock = None
+
+    def __init__(self):
+        self.fail = False
+        self.seconds = 0.1
+        self.load_time = 0.0
+        self.cached = False
+        self.calls = 0
+        self.is_available = True
+
+    def available(self):
+        return self.is_available
+
+    def synthesize(self, text, voice, output_dir, output_file=None):
+        self.calls += 1
+        self.clock.now += self.seconds + self.load_time
+        if self.fail:
+            return {'success': False, 'error': f"{self.name} failed"}
+        result = {'success': True, 'audio_file': f"{self.name}.wav", 'load_time': self.load_time}
+        self.load_time = 0.0
+        if self.cached:
+            result['cached'] = True
+        return result
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tts_engine, 'time', types.SimpleNamespace(perf_counter=clock, time=clock))
+    monkeypatch.setattr(ScriptedBackend, 'clock', clock)
+    for name in ('piper', 'pyttsx3'):
+        monkeypatch.setitem(tts_engine.BACKENDS, name, type(name, (ScriptedBackend,), {'name': name}))
+    return clock
+
+def make_router(**kwargs):
+    router = TTSRouter(['piper', 'pyttsx3'], cooldown=60, **kwargs)
+    return router, router.backends['piper'], router.backends['pyttsx3']
+
+def test_falls_back_along_the_chain(clock):
+    router, piper, _ = make_router()
+    piper.fail = True
+    result = router.synthesize(LONG_TEXT, 'voice', '/tmp')
+
+    assert result['engine_key'] == 'pyttsx3'
+    assert [attempt['engine'] for attempt in result['attempts']] == ['piper', 'pyttsx3']
+    assert result['attempts'][0]['error'] == 'piper failed'
+
+def test_all_engines_failing_returns_an_error(clock):
+    router, piper, pyttsx3 = make_router()
+    piper.fail = pyttsx3.fail = True
+    result = router.synthesize(LONG_TEXT, 'voice', '/tmp')
+    assert not result['success'] and len(result['attempts']) == 2
+    assert not router.synthesize('  ', 'voice', '/tmp')['success']
+
+def test_unavailable_engines_are_skipped(clock):
+    router, piper, _ = make_router()
+    piper.is_available = False
+    assert router.order() == ['pyttsx3']
+
+def test_backends_must_implement_synthesize():
+    with pytest.raises(TypeError):
+        Backend()
+    assert all(callable(backend().synthesize) for backend in tts_engine.BACKENDS.values())
+
+def test_unknown_engines_are_rejected():
+    with pytest.raises(ValueError):
+        TTSRouter(['piper', 'festival'])
+
+def test_failing_engine_is_demoted(clock):
+    router, piper, _ = make_router()
+    piper.fail = True
+    for _ in range(tts_engine.MIN_SAMPLES):
+        router.synthesize(LONG_TEXT, 'voice', '/tmp')
+    assert router.order() == ['pyttsx3', 'piper']
+
+def test_voice_load_time_does_not_count_as_latency(clock):
+    router, piper, _ = make_router()
+    piper.load_time = 30.0
+    router.synthesize(LONG_TEXT, 'voice', '/tmp')
+    for _ in range(tts_engine.MIN_LATENCY_SAMPLES):
+        router.synthesize(LONG_TEXT, 'voice', '/tmp')
+
+    assert router.health['piper'].seconds_per_char == pytest.approx(0.1 / len(LONG_TEXT))
+    assert router.order() == ['piper', 'pyttsx3']
+
+def test_short_texts_do_not_demote(clock):
+    router, piper, _ = make_router()
+    piper.seconds = 1.0
+    for _ in range(10):
+        router.synthesize('Hi.', 'voice', '/tmp')
+
+    assert router.health['piper'].latency_samples == 0
+    assert router.order() == ['piper', 'pyttsx3']
+
+def test_slow_engine_is_demoted_after_enough_samples(clock):
+    router, piper, _ = make_router()
+    piper.seconds = 10.0
+    for _ in range(tts_engine.MIN_LATENCY_SAMPLES - 1):
+        router.synthesize(LONG_TEXT, 'voice', '/tmp')
+        assert router.order() == ['piper', 'pyttsx3']
+    router.synthesize(LONG_TEXT, 'voice', '/tmp')
+    assert router.order() == ['pyttsx3', 'piper']
+
+def test_cache_hits_are_not_timed(clock):
+    router, piper, _ = make_router()
+    piper.cached = True
+    piper.seconds = 10.0
+    for _ in range(5):
+        router.synthesize(LONG_TEXT, 'voice', '/tmp')
+    assert router.health['piper'].requests == 0
+
+def test_demoted_engine_is_probed_after_cooldown_and_recovers(clock):
+    router, piper, pyttsx3 = make_router()
+    piper.fail = True
+    for _ in range(tts_engine.MIN_SAMPLES):
+        router.synthesize(LONG_TEXT, 'voice', '/tmp')
+    assert router.order() == ['pyttsx3', 'piper']
+
+    piper.fail = False
+    clock.now += 30
+    assert router.synthesize(LONG_TEXT, 'voice', '/tmp')['engine_key'] == 'pyttsx3'
+    clock.now += 31
+    # A slow cold probe succeeds and must not demote the engine again
+    piper.load_time = 20.0
+    piper.seconds = 2.0
+    assert router.synthesize(LONG_TEXT, 'voice', '/tmp')['engine_key'] == 'piper'
+    assert router.order() == ['piper', 'pyttsx3']
+    assert not router.stats()['engines'][0]['demoted']
+
+def test_failed_probe_keeps_the_engine_demoted(clock):
+    router, piper, _ = make_router()
+    piper.fail = True
+    for _ in range(tts_engine.MIN_SAMPLES):
+        router.synthesize(LONG_TEXT, 'voice', '/tmp')
+    router.order()
+    clock.now += 61
+    calls = piper.calls
+    router.synthesize(LONG_TEXT, 'voice', '/tmp')
+
+    assert piper.calls == calls + 1
+    assert router.order() == ['pyttsx3', 'piper']
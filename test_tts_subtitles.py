@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for word timings and subtitles built from synthesized speech
+"""
+
+from tts_subtitles import (proportional_word_timings, aligned_word_timings, estimate_timings,
+                           speech_segments, generate_subtitles)
+
+RATE = 1000
+
+def phonemes(*words, pause=50):
+    """Per-phoneme alignments for words spoken as one 100-sample phoneme per character"""
+    alignments = []
+    for index, word in enumerate(words):
+        if index:
+            alignments.append((' ', pause))
+        alignments.extend((char, 100) for char in word)
+    return alignments
+
+def test_proportional_timings_split_by_characters():
+    assert proportional_word_timings('ab cdef', 1.0, 3.0) == [
+        {'word': 'ab', 'start': 1.0, 'end': 2.0},
+        {'word': 'cdef', 'start': 2.0, 'end': 4.0},
+    ]
+    assert proportional_word_timings('', 0.0, 1.0) == []
+    assert proportional_word_timings('   ', 0.0, 1.0) == []
+
+def test_aligned_timings_follow_word_separators():
+    timings = aligned_word_timings('hi there', phonemes('hi', 'ðɛə'), RATE, 2.0)
+    assert timings == [
+        {'word': 'hi', 'start': 2.0, 'end': 2.2},
+        {'word': 'there', 'start': 2.25, 'end': 2.55},
+    ]
+
+def test_aligned_timings_leave_punctuation_pauses_out_of_words():
+    alignments = phonemes('hi', 'jo') + [('.', 300)]
+    timings = aligned_word_timings('hi you.', alignments, RATE, 0.0)
+    assert timings[-1] == {'word': 'you.', 'start': 0.25, 'end': 0.45}
+
+def test_punctuation_only_words_get_zero_length_timings():
+    alignments = phonemes('hɛ', '—', 'wɜ')
+    timings = aligned_word_timings('Hello — world.', alignments, RATE, 1.0)
+    assert [timing['word'] for timing in timings] == ['Hello', '—', 'world.']
+    assert timings[1] == {'word': '—', 'start': 1.2, 'end': 1.2}
+    assert timings[2]['start'] == 1.4
+
+def test_leading_punctuation_word_starts_with_the_first_spoken_word():
+    timings = aligned_word_timings('« hi »', phonemes('«', 'hi', '»'), RATE, 0.0)
+    assert timings == [
+        {'word': '«', 'start': 0.15, 'end': 0.15},
+        {'word': 'hi', 'start': 0.15, 'end': 0.35},
+        {'word': '»', 'start': 0.35, 'end': 0.35},
+    ]
+
+def test_mismatched_or_unspoken_text_falls_back():
+    # eSpeak read "42" as two words
+    assert aligned_word_timings('it is 42', phonemes('it', 'iz', 'foti', 'tu'), RATE, 0.0) is None
+    assert aligned_word_timings('...', [('.', 100)], RATE, 0.0) is None
+    assert aligned_word_timings('', [], RATE, 0.0) is None
+
+def test_estimate_timings_split_by_characters():
+    sentences = estimate_timings(['One two.', 'Four'], 3.0)
+    assert [(s['offset'], s['duration']) for s in sentences] == [(0.0, 2.0), (2.0, 1.0)]
+    assert sentences[1]['words'] == [{'word': 'Four', 'start': 2.0, 'end': 3.0}]
+    assert all(s['timing'] == 'estimated' for s in sentences)
+
+def test_estimate_timings_with_empty_sentences():
+    assert estimate_timings([], 1.0) == []
+    sentences = estimate_timings(['', ''], 1.0)
+    assert [(s['offset'], s['duration'], s['words']) for s in sentences] == [(0.0, 0.5, []), (0.5, 0.5, [])]
+
+def test_speech_segments_and_subtitles():
+    result = {'success': True, 'language': 'en', 'timing_source': 'estimated',
+              'sentences': estimate_timings(['One two.', 'Four'], 3.0)}
+    segments = speech_segments(result['sentences'])
+    assert segments[0] == {'start': 0.0, 'end': 2.0, 'text': 'One two.', 'words': [
+        {'word': 'One', 'start': 0.0, 'end': 0.857},
+        {'word': 'two.', 'start': 0.857, 'end': 2.0},
+    ]}
+
+    subtitles = generate_subtitles(result, 'srt')
+    assert subtitles['success'] and subtitles['segments_count'] == 2
+    assert subtitles['content'].startswith('1\n00:00:00,000 --> 00:00:02,000\nOne two.\n')
+    assert generate_subtitles(result, 'srt', words_per_caption=1)['segments_count'] == 3
+
+def test_generate_subtitles_errors():
+    failed = {'success': False, 'error': 'boom'}
+    assert generate_subtitles(failed) is failed
+    assert not generate_subtitles({'success': True})['success']
+    result = {'success': True, 'sentences': estimate_timings(['Hi'], 1.0)}
+    assert 'Unsupported' in generate_subtitles(result, 'sub')['error']
@@ -2,148 +2,295 @@
 """
 Tiny Whisper Implementation for Speech-to-Text and Subtitle Generation
 Optimized for speed and efficiency using the tiny model
+
+whisper, torch, NumPy and ffmpeg-python are imported where they are first used, so
+--help, argument errors and cache hits never pay for loading them.
 """
 
-import whisper
+import time
+# Cold-start clock for --startup-time. It must stay directly after `import time`, before the
+# heavier imports below, or the module_import phase silently stops measuring them
+_STARTED = time.perf_counter()
+# isort: split
+
 import json
 import sys
 import os
 import argparse
 from pathlib import Path
-import ffmpeg
-import tempfile
 import warnings
 from contextlib import redirect_stderr, redirect_stdout
 import io
+import socketserver
+import threading
+import gc
+import glob
+import queue
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from transcription_cache import TranscriptionCache
+import subtitle_writer
+
+_IMPORTED = time.perf_counter()
+
+SAMPLE_RATE = 16000
+PIPE_CHUNK_SIZE = 1 << 16
+
+MODEL_CHOICES = ['tiny', 'base', 'small', 'medium', 'large']
+FORMAT_CHOICES = ['json', 'srt', 'vtt', 'ass', 'jsonl']
+TIMESTAMP_CHOICES = ['none', 'segment', 'word']
+PRECISION_CHOICES = ['fp32', 'int8']
+
+# The published checkpoints are fp16; an fp32 copy saved next to them is memory-mapped on later starts
+MMAP_CHECKPOINT_SUFFIX = '.fp32.pt'
+
+# Language identification looks at Whisper's first 30 s window only
+DETECT_WINDOW_SECONDS = 30
+DETECT_KEEP_CANDIDATES = 10
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg')
+# Decoded clips kept ahead of inference in --batch mode
+BATCH_PREFETCH = 2
+
+# Long-audio chunking: energy-based pause detection
+VAD_FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = 0.3
+SILENCE_MARGIN_DB = 10.0
+SILENCE_FLOOR_DB = -60.0
+# Chunks shorter than Whisper's 30 s window only add padding work
+CHUNK_MIN_SECONDS = 30.0
+
+# Forced alignment: DTW stretches the last words of a window over whatever audio is left,
+# so words ending this close to a window's end are re-aligned in the next window
+ALIGN_EDGE_SECONDS = 2.0
+# Transcript tokens per window, leaving room in the 448-token text context for the prompt
+ALIGN_MAX_TOKENS = 400
+# Short-clip mode: clips per batched encoder/decoder pass
+CLIP_BATCH_SIZE = 16
+# Seconds per timestamp token (two mel frames of 10 ms)
+TIMESTAMP_PRECISION = 0.02
+# model.transcribe's defaults for when greedy decoding needs its temperature fallback
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# Whisper's own punctuation merging rules (whisper.transcribe defaults)
+PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+SENTENCE_END_PUNCTUATIONS = ('.', '!', '?', '。', '！', '？', '؟', '…')
+
+class ModelLoadError(RuntimeError):
+    """Raised when a Whisper model cannot be loaded"""
 
 class TinyWhisper:
-    def __init__(self, model_size="tiny", language=None):
+    def __init__(self, model_size="tiny", language=None, chunk_workers=None, cache=True, precision="fp32"):
         """
         Initialize Tiny Whisper
         
         Args:
             model_size (str): Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
             language (str): Language code (e.g., 'en', 'fa', 'auto' for automatic detection)
+            chunk_workers (int): Worker processes for long-audio mode (defaults to the CPU count)
+            cache: True for the default TranscriptionCache, a TranscriptionCache to share,
+                or False/None to disable caching
+            precision (str): 'fp32', or 'int8' for dynamically quantized linear layers (CPU only)
         """
+        if precision not in PRECISION_CHOICES:
+            raise ValueError(f"Unsupported precision: {precision}")
         self.model_size = model_size
         self.language = language
+        self.precision = precision
+        self.chunk_workers = chunk_workers
         self.model = None
+        self.model_source = None
+        self.load_time = None
+        self._chunk_pool = None
+        self.cache = open_cache() if cache is True else (cache or None)
         self.load_model()
     
     def load_model(self):
-        """Load the Whisper model"""
+        """
+        Load the Whisper model
+        
+        Raises:
+            ModelLoadError: If the model cannot be loaded
+        """
         try:
             # Only print to stderr to avoid interfering with JSON output
-            print(f"Loading Whisper model: {self.model_size}", file=sys.stderr)
-            self.model = whisper.load_model(self.model_size)
-            print(f"Model loaded successfully!", file=sys.stderr)
+            print(f"Loading Whisper model: {self.model_size} ({self.precision})", file=sys.stderr)
+            started = time.perf_counter()
+            if self.precision == 'int8':
+                model, self.model_source = load_whisper_model(self.model_size, device='cpu')
+                self.model = quantize_model(model)
+            else:
+                self.model, self.model_source = load_whisper_model(self.model_size)
+            self.load_time = time.perf_counter() - started
+            print(f"Model loaded successfully! ({self.model_source}, {self.load_time:.2f}s)", file=sys.stderr)
         except Exception as e:
-            print(f"Error loading model: {e}", file=sys.stderr)
-            sys.exit(1)
+            raise ModelLoadError(f"Error loading model {self.model_size} ({self.precision}): {e}") from e
+    
+    def memory_bytes(self):
+        """Return the resident size of the model's weights and buffers in bytes"""
+        if self.model is None:
+            return 0
+        total = 0
+        # state_dict also covers quantized linear layers, whose packed weights are not parameters
+        for value in self.model.state_dict().values():
+            for tensor in (value if isinstance(value, tuple) else (value,)):
+                if hasattr(tensor, 'element_size'):
+                    total += tensor.numel() * tensor.element_size()
+        return total
     
-    def preprocess_audio(self, audio_path):
+    @staticmethod
+    def preprocess_audio(audio_path, max_seconds=None):
         """
-        Preprocess audio file for Whisper
+        Decode an audio file into the 16 kHz mono float32 samples Whisper expects
+        
+        ffmpeg writes raw f32le PCM to a pipe that is read straight into a NumPy
+        array, so no intermediate WAV is written and Whisper does not decode twice.
         
         Args:
             audio_path (str): Path to audio file
+            max_seconds (float): Decode only this much from the start of the file
             
         Returns:
-            str: Path to processed audio file
+            numpy.ndarray: Mono float32 samples at SAMPLE_RATE
         """
-        try:
-            # Check if file exists
-            if not os.path.exists(audio_path):
-                raise FileNotFoundError(f"Audio file not found: {audio_path}")
-            
-            # Create temporary file for processed audio
-            temp_dir = tempfile.mkdtemp()
-            processed_path = os.path.join(temp_dir, "processed_audio.wav")
-            
-            # Use ffmpeg to convert to the format Whisper expects
-            (
-                ffmpeg
-                .input(audio_path)
-                .output(
-                    processed_path,
-                    acodec='pcm_s16le',  # 16-bit PCM
-                    ac=1,                # Mono
-                    ar=16000             # 16kHz sample rate
-                )
-                .overwrite_output()
-                .run(quiet=True)
+        import ffmpeg
+        import numpy as np
+        
+        # Check if file exists
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        input_options = {'t': max_seconds} if max_seconds else {}
+        process = (
+            ffmpeg
+            .input(audio_path, **input_options)
+            .output(
+                'pipe:',
+                format='f32le',      # Raw 32-bit float PCM
+                acodec='pcm_f32le',
+                ac=1,                # Mono
+                ar=SAMPLE_RATE       # 16kHz sample rate
             )
-            
-            return processed_path
-            
-        except Exception as e:
-            print(f"Error preprocessing audio: {e}")
-            return audio_path  # Return original if preprocessing fails
+            .global_args('-nostdin', '-loglevel', 'error')
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+        
+        # Read into a growable bytearray so the resulting array is writable without a copy
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = process.stdout.read(PIPE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                buffer += chunk
+        finally:
+            _, stderr = process.communicate()
+        
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', errors='replace').strip()
+            raise RuntimeError(f"ffmpeg failed to decode {audio_path}: {message}")
+        
+        usable = len(buffer) - len(buffer) % 4
+        return np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
     
-    def transcribe(self, audio_path, include_timestamps=True):
+    def transcribe(self, audio_path, include_timestamps=True, language=None, audio=None, long_audio=False,
+                   use_cache=True, timestamps=None):
         """
         Transcribe audio file to text
         
         Args:
             audio_path (str): Path to audio file
-            include_timestamps (bool): Whether to include timestamps
+            include_timestamps (bool): Whether to include segment timestamps
+            language (str): Per-call language override (defaults to the instance language)
+            audio (numpy.ndarray): Samples already decoded by preprocess_audio (skips decoding)
+            long_audio (bool): Split at silences and transcribe the chunks in parallel processes
+            use_cache (bool): Consult and fill the transcription cache
+            timestamps (str): Timestamp granularity ('none', 'segment' or 'word'); overrides
+                include_timestamps. Only 'word' pays for Whisper's word-alignment pass.
             
         Returns:
             dict: Transcription result with text, language, and optional timestamps
         """
         try:
-            # Preprocess audio
-            processed_path = self.preprocess_audio(audio_path)
+            granularity = timestamps or ('segment' if include_timestamps else 'none')
+            if granularity not in TIMESTAMP_CHOICES:
+                raise ValueError(f"Unsupported timestamp granularity: {granularity}")
+            
+            language = language or self.language
+            digest = cache_key = None
+            if use_cache and self.cache is not None:
+                digest = self.cache.content_digest(audio_path, audio)
+                cache_key = self.cache.key_from_digest(
+                    digest,
+                    model=self.model_size,
+                    precision=self.precision,
+                    language=language or 'auto',
+                    timestamps=granularity,
+                    long_audio=long_audio
+                )
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    print(f"Transcription cache hit: {audio_path}", file=sys.stderr)
+                    return cached
+            
+            # Decode audio in memory
+            if audio is None:
+                audio = self.preprocess_audio(audio_path)
             
             # Transcribe with Whisper
             print(f"Transcribing audio: {audio_path}", file=sys.stderr)
             
-            # Set transcription options
-            options = {
-                'verbose': False,
-                'task': 'transcribe',
-                'fp16': False  # Disable FP16 warnings
-            }
-            
-            if self.language and self.language != 'auto':
-                options['language'] = self.language
+            # Detect once up front so long-audio chunks all share one decision
+            detection = None
+            if not language or language == 'auto':
+                detection = self._detect_language(audio, digest)
+                language = detection['language']
             
-            if include_timestamps:
-                options['word_timestamps'] = True
+            options = self._transcribe_options(granularity, language)
             
-            # Perform transcription with suppressed output
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                # Capture Whisper's progress output
-                old_stderr = sys.stderr
-                sys.stderr = open(os.devnull, 'w')
-                try:
-                    result = self.model.transcribe(processed_path, **options)
-                finally:
-                    sys.stderr.close()
-                    sys.stderr = old_stderr
-            
-            # Clean up temporary file
-            if processed_path != audio_path:
-                os.remove(processed_path)
-                os.rmdir(os.path.dirname(processed_path))
+            if long_audio:
+                result = self._transcribe_chunked(audio, options)
+            else:
+                result = self._run_model(audio, options)
             
             # Format result
             transcription_result = {
                 'text': result['text'].strip(),
                 'language': result.get('language', 'unknown'),
-                'duration': len(result.get('segments', [])),
+                'duration': round(len(audio) / SAMPLE_RATE, 2),
                 'success': True
             }
             
-            if include_timestamps and 'segments' in result:
+            if detection is not None:
+                transcription_result['language_probability'] = detection['probabilities'][0]['probability']
+            
+            if granularity != 'none' and 'segments' in result:
                 transcription_result['segments'] = []
                 for segment in result['segments']:
-                    transcription_result['segments'].append({
+                    formatted = {
                         'start': segment['start'],
                         'end': segment['end'],
                         'text': segment['text'].strip()
-                    })
+                    }
+                    if granularity == 'word':
+                        formatted['words'] = [
+                            {
+                                'word': word['word'].strip(),
+                                'start': word['start'],
+                                'end': word['end'],
+                                'probability': round(word.get('probability', 0.0), 3)
+                            }
+                            for word in segment.get('words', [])
+                            if word['word'].strip()
+                        ]
+                    transcription_result['segments'].append(formatted)
+            
+            if cache_key is not None:
+                self.cache.put(cache_key, transcription_result)
             
             return transcription_result
             
@@ -157,29 +304,497 @@ class TinyWhisper:
                 'error': str(e)
             }
     
-    def generate_subtitles(self, audio_path, subtitle_format='srt'):
+    def transcribe_clips(self, clips, language=None, include_timestamps=True, use_cache=True,
+                         batch_size=CLIP_BATCH_SIZE):
+        """
+        Transcribe many short clips with batched encoder and decoder passes
+        
+        model.transcribe pads every clip to a 30-second window and runs the encoder on it
+        alone. Here up to batch_size padded mel spectrograms are stacked into one batch,
+        encoded once (the features also serve language detection), and decoded together
+        with whisper.decode; segments are rebuilt from the timestamp tokens. Clips longer
+        than one window, and clips whose greedy decode fails model.transcribe's quality
+        checks, go through transcribe() instead. Word timestamps are not batched.
+        
+        Args:
+            clips (list): (audio_path, audio) pairs; audio may be None to decode the file here
+            language (str): Per-call language override (defaults to the instance language)
+            include_timestamps (bool): Whether to include segment timestamps
+            use_cache (bool): Consult and fill the transcription cache (same entries as transcribe)
+            batch_size (int): Clips per batched pass
+            
+        Returns:
+            list: One transcribe()-shaped result per clip, in order
+        """
+        import torch
+        import whisper
+        
+        language = language or self.language
+        granularity = 'segment' if include_timestamps else 'none'
+        results = [None] * len(clips)
+        pending = []
+        for index, (audio_path, audio) in enumerate(clips):
+            try:
+                cache_key = None
+                if use_cache and self.cache is not None:
+                    cache_key = self.cache.key_from_digest(
+                        self.cache.content_digest(audio_path, audio),
+                        model=self.model_size,
+                        precision=self.precision,
+                        language=language or 'auto',
+                        timestamps=granularity,
+                        long_audio=False
+                    )
+                    cached = self.cache.get(cache_key)
+                    if cached is not None:
+                        results[index] = cached
+                        continue
+                if audio is None:
+                    audio = self.preprocess_audio(audio_path)
+            except Exception as e:
+                print(f"Error during transcription: {e}", file=sys.stderr)
+                results[index] = {'text': '', 'language': 'unknown', 'duration': 0, 'success': False, 'error': str(e)}
+                continue
+            
+            if len(audio) > whisper.audio.N_SAMPLES:
+                results[index] = self.transcribe(audio_path, include_timestamps, language, audio=audio,
+                                                 use_cache=use_cache)
+            else:
+                pending.append((index, audio_path, audio, cache_key))
+        
+        for start in range(0, len(pending), max(1, batch_size)):
+            batch = pending[start:start + max(1, batch_size)]
+            print(f"Transcribing {len(batch)} clips in one batch", file=sys.stderr)
+            try:
+                with warnings.catch_warnings(), torch.no_grad():
+                    warnings.simplefilter("ignore")
+                    decoded = self._decode_clip_batch([audio for _, _, audio, _ in batch], language,
+                                                      include_timestamps)
+            except Exception as e:
+                print(f"Batched decoding failed, transcribing clips one by one: {e}", file=sys.stderr)
+                decoded = [None] * len(batch)
+            
+            for (index, audio_path, audio, cache_key), result in zip(batch, decoded):
+                if result is None:
+                    # Greedy decoding was not good enough; use transcribe()'s temperature fallback
+                    results[index] = self.transcribe(audio_path, include_timestamps, language, audio=audio,
+                                                     use_cache=use_cache)
+                    continue
+                if cache_key is not None:
+                    self.cache.put(cache_key, result)
+                results[index] = result
+        return results
+    
+    def _decode_clip_batch(self, clips, language, include_timestamps):
+        """
+        Encode a batch of clips once and decode it with whisper.decode
+        
+        Returns:
+            list: transcribe()-shaped result per clip, or None where the clip needs fallback
+        """
+        import torch
+        import whisper
+        
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self.model.dims.n_mels)
+            for audio in clips
+        ]).to(self.model.device)
+        # whisper.decode and detect_language accept encoder output, so the encoder runs once
+        features = self.model.embed_audio(mels)
+        
+        if not language or language == 'auto':
+            _, probabilities = self.model.detect_language(features)
+            detected = [max(probs, key=probs.get) for probs in probabilities]
+            confidence = [probs[code] for probs, code in zip(probabilities, detected)]
+        else:
+            detected = [language] * len(clips)
+            confidence = [None] * len(clips)
+        
+        results = [None] * len(clips)
+        # One decode per language, since DecodingOptions carries a single language
+        for code in dict.fromkeys(detected):
+            indices = [i for i, clip_language in enumerate(detected) if clip_language == code]
+            options = whisper.DecodingOptions(
+                task='transcribe',
+                language=code,
+                without_timestamps=not include_timestamps,
+                fp16=False
+            )
+            decoded = whisper.decode(self.model, features[indices], options)
+            tokenizer = whisper.tokenizer.get_tokenizer(
+                self.model.is_multilingual,
+                num_languages=self.model.num_languages,
+                language=code,
+                task='transcribe'
+            )
+            for i, decoding in zip(indices, decoded):
+                duration = len(clips[i]) / SAMPLE_RATE
+                if decoding.no_speech_prob > NO_SPEECH_THRESHOLD and decoding.avg_logprob < LOGPROB_THRESHOLD:
+                    segments = []
+                elif (decoding.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                      or decoding.avg_logprob < LOGPROB_THRESHOLD):
+                    continue
+                else:
+                    segments = segments_from_tokens(decoding.tokens, tokenizer, duration, decoding.text)
+                
+                result = {
+                    'text': decoding.text.strip() if segments else '',
+                    'language': code,
+                    'duration': round(duration, 2),
+                    'success': True
+                }
+                if confidence[i] is not None:
+                    result['language_probability'] = round(float(confidence[i]), 4)
+                if include_timestamps:
+                    result['segments'] = segments
+                results[i] = result
+        return results
+    
+    def detect_language(self, audio_path, audio=None, top_k=5, use_cache=True):
+        """
+        Identify the spoken language from the first 30-second window only
+        
+        Args:
+            audio_path (str): Path to audio file
+            audio (numpy.ndarray): Samples already decoded by preprocess_audio (skips decoding)
+            top_k (int): Number of ranked candidates to return
+            use_cache (bool): Consult and fill the transcription cache
+            
+        Returns:
+            dict: Detected language and ranked language probabilities
+        """
+        try:
+            digest = None
+            if use_cache and self.cache is not None:
+                digest = self.cache.content_digest(audio_path, audio)
+            
+            # Only the first window is needed, so only that much is decoded
+            if audio is None:
+                audio = self.preprocess_audio(audio_path, max_seconds=DETECT_WINDOW_SECONDS)
+            
+            detection = self._detect_language(audio, digest)
+            return {
+                'success': True,
+                'language': detection['language'],
+                'probabilities': detection['probabilities'][:top_k]
+            }
+            
+        except Exception as e:
+            print(f"Error detecting language: {e}", file=sys.stderr)
+            return {
+                'success': False,
+                'language': 'unknown',
+                'error': str(e)
+            }
+    
+    def align(self, audio_path, text, language=None, audio=None, use_cache=True):
+        """
+        Forced alignment: time the words of a known transcript against the audio
+        
+        Only Whisper's cross-attention/DTW alignment pass runs (whisper.timing.find_alignment),
+        with one encoder and one decoder pass per 30-second window and no autoregressive
+        search, so the returned words are exactly the supplied text. Audio longer than one
+        window is aligned greedily: each window keeps the words that end well inside it and
+        the next window starts after the last kept word.
+        
+        Args:
+            audio_path (str): Path to audio file
+            text (str): Transcript of the audio
+            language (str): Per-call language override (defaults to the instance language)
+            audio (numpy.ndarray): Samples already decoded by preprocess_audio (skips decoding)
+            use_cache (bool): Consult and fill the transcription cache
+            
+        Returns:
+            dict: Result shaped like transcribe(timestamps='word'): text, language, duration
+                in seconds and segments (split at sentence ends) with word timings. Words the
+                alignment could not reach get interpolated times, are marked interpolated and
+                counted in unaligned_words.
+        """
+        import whisper
+        
+        try:
+            if not text or not text.strip():
+                raise ValueError("A transcript is required for alignment")
+            
+            language = language or self.language
+            digest = cache_key = None
+            if use_cache and self.cache is not None:
+                digest = self.cache.content_digest(audio_path, audio)
+                cache_key = self.cache.key_from_digest(
+                    digest,
+                    model=self.model_size,
+                    precision=self.precision,
+                    language=language or 'auto',
+                    task='align',
+                    text=text.strip()
+                )
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    print(f"Transcription cache hit: {audio_path}", file=sys.stderr)
+                    return cached
+            
+            if audio is None:
+                audio = self.preprocess_audio(audio_path)
+            
+            print(f"Aligning transcript to audio: {audio_path}", file=sys.stderr)
+            if not language or language == 'auto':
+                language = self._detect_language(audio, digest)['language']
+            
+            tokenizer = whisper.tokenizer.get_tokenizer(
+                self.model.is_multilingual,
+                num_languages=self.model.num_languages,
+                language=language,
+                task='transcribe'
+            )
+            words = self._align_windows(audio, text.split(), tokenizer)
+            segments = group_aligned_words(words)
+            
+            alignment_result = {
+                'text': text.strip(),
+                'language': language,
+                'duration': round(len(audio) / SAMPLE_RATE, 2),
+                'success': True,
+                'aligned': True,
+                'segments': segments
+            }
+            unaligned = sum(1 for word in words if word.get('interpolated'))
+            if unaligned:
+                print(f"Warning: {unaligned} transcript words could not be aligned; their times are interpolated",
+                      file=sys.stderr)
+                alignment_result['unaligned_words'] = unaligned
+            
+            if cache_key is not None:
+                self.cache.put(cache_key, alignment_result)
+            
+            return alignment_result
+            
+        except Exception as e:
+            print(f"Error during alignment: {e}", file=sys.stderr)
+            return {
+                'text': '',
+                'language': 'unknown',
+                'duration': 0,
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _align_windows(self, audio, pending, tokenizer):
+        """
+        Greedily align transcript words window by window
+        
+        Each window is given about as many words as it should hold at the transcript's
+        average speaking rate. Whisper may split a transcript word (e.g. at a hyphen), so
+        windows are only cut where whisper's words and the transcript's words line up.
+        
+        Words left over when the audio runs out or a window aligns nothing are spread over
+        the remaining audio by interpolate_words.
+        
+        Returns:
+            list: Word timings on the global timeline ({'word', 'start', 'end', 'probability'})
+        """
+        import whisper
+        
+        aligned = []
+        offset = 0
+        while pending and offset < len(audio):
+            window = audio[offset:offset + whisper.audio.N_SAMPLES]
+            remaining_seconds = (len(audio) - offset) / SAMPLE_RATE
+            last_window = remaining_seconds <= DETECT_WINDOW_SECONDS
+            
+            count = len(pending)
+            if not last_window:
+                count = max(1, int(round(len(pending) * DETECT_WINDOW_SECONDS / remaining_seconds)))
+            # Stay inside the decoder's text context
+            tokens = tokenizer.encode(' ' + ' '.join(pending[:count]))
+            while len(tokens) > ALIGN_MAX_TOKENS and count > 1:
+                count = max(1, count * ALIGN_MAX_TOKENS // len(tokens))
+                tokens = tokenizer.encode(' ' + ' '.join(pending[:count]))
+            if count < len(pending):
+                last_window = False
+            
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(window), n_mels=self.model.dims.n_mels)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                timings = whisper.timing.find_alignment(
+                    self.model, tokenizer, tokens, mel.to(self.model.device), len(window) // whisper.audio.HOP_LENGTH
+                )
+            whisper.timing.merge_punctuations(timings, PREPEND_PUNCTUATIONS, APPEND_PUNCTUATIONS)
+            timings = [timing for timing in timings if timing.word.strip()]
+            
+            if not timings:
+                break
+            keep, consumed = _window_cut(timings, pending[:count], len(window) / SAMPLE_RATE, last_window)
+            start_seconds = offset / SAMPLE_RATE
+            for timing in timings[:keep]:
+                aligned.append({
+                    'word': timing.word.strip(),
+                    'start': round(start_seconds + float(timing.start), 3),
+                    'end': round(start_seconds + float(timing.end), 3),
+                    'probability': round(float(timing.probability), 3)
+                })
+            pending = pending[consumed:]
+            if last_window:
+                break
+            offset += max(1, int(float(timings[keep - 1].end) * SAMPLE_RATE))
+        
+        if pending:
+            start = aligned[-1]['end'] if aligned else 0.0
+            aligned.extend(interpolate_words(pending, start, len(audio) / SAMPLE_RATE))
+        return aligned
+    
+    def _detect_language(self, audio, digest=None):
+        """
+        Run Whisper language identification on the first window of decoded audio
+        
+        Results are stored in the transcription cache under the audio digest, so a
+        later auto-language transcription of the same file does not detect again.
+        """
+        import whisper
+        
+        cache_key = None
+        if digest is not None and self.cache is not None:
+            cache_key = self.cache.key_from_digest(
+                digest, model=self.model_size, precision=self.precision, task='detect_language'
+            )
+            cached = self.cache.get(cache_key, kind='language')
+            if cached is not None:
+                return cached
+        
+        window = whisper.pad_or_trim(audio[:whisper.audio.N_SAMPLES])
+        mel = whisper.log_mel_spectrogram(window, n_mels=self.model.dims.n_mels).to(self.model.device)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            _, probs = self.model.detect_language(mel)
+        
+        ranked = sorted(probs.items(), key=lambda item: item[1], reverse=True)
+        detection = {
+            'language': ranked[0][0],
+            'probabilities': [
+                {'language': code, 'probability': round(float(probability), 4)}
+                for code, probability in ranked[:DETECT_KEEP_CANDIDATES]
+            ]
+        }
+        
+        if cache_key is not None:
+            self.cache.put(cache_key, detection)
+        return detection
+    
+    def _transcribe_options(self, granularity, language):
+        """Build the keyword options passed to model.transcribe"""
+        options = {
+            'verbose': False,
+            'task': 'transcribe',
+            'fp16': False  # Disable FP16 warnings
+        }
+        
+        if language and language != 'auto':
+            options['language'] = language
+        
+        # Word alignment is an extra cross-attention/DTW pass; only run it when words are wanted
+        if granularity == 'word':
+            options['word_timestamps'] = True
+        
+        return options
+    
+    def _run_model(self, audio, options):
+        """Run model.transcribe with Whisper's warnings and progress output suppressed"""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            # Capture Whisper's progress output
+            old_stderr = sys.stderr
+            sys.stderr = open(os.devnull, 'w')
+            try:
+                return self.model.transcribe(audio, **options)
+            finally:
+                sys.stderr.close()
+                sys.stderr = old_stderr
+    
+    def _transcribe_chunked(self, audio, options):
+        """
+        Split audio at silences, transcribe the chunks in worker processes and
+        stitch the segments back together on the global timeline
+        """
+        workers = self.chunk_workers or os.cpu_count() or 1
+        target_seconds = max(CHUNK_MIN_SECONDS, len(audio) / SAMPLE_RATE / (2 * workers))
+        spans = split_on_silence(audio, target_seconds)
+        
+        if len(spans) < 2 or workers < 2:
+            return self._run_model(audio, options)
+        
+        print(f"Long-audio mode: {len(spans)} chunks across {workers} workers", file=sys.stderr)
+        pool = self._get_chunk_pool(workers)
+        futures = [
+            pool.submit(_transcribe_chunk, audio[start:end], start / SAMPLE_RATE, options)
+            for start, end in spans
+        ]
+        try:
+            chunks = [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            # A worker could not load its model or died; start a fresh pool on the next call
+            self.close()
+            raise RuntimeError(f"Long-audio worker failed: {e}") from e
+        
+        segments = [segment for chunk in chunks for segment in chunk['segments']]
+        languages = [chunk['language'] for chunk in chunks if chunk.get('language')]
+        return {
+            'text': ' '.join(chunk['text'].strip() for chunk in chunks if chunk['text'].strip()),
+            'language': max(set(languages), key=languages.count) if languages else 'unknown',
+            'segments': segments
+        }
+    
+    def _get_chunk_pool(self, workers):
+        """Return the process pool used for long-audio chunks, starting it on first use"""
+        if self._chunk_pool is None:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # spawn rather than fork: forking a process with torch's thread pools running can deadlock
+            self._chunk_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_chunk_worker,
+                initargs=(self.model_size, self.precision, threads)
+            )
+        return self._chunk_pool
+    
+    def close(self):
+        """Shut down the long-audio worker processes, if any were started"""
+        if self._chunk_pool is not None:
+            self._chunk_pool.shutdown(wait=False, cancel_futures=True)
+            self._chunk_pool = None
+    
+    def generate_subtitles(self, audio_path, subtitle_format='srt', language=None, audio=None, long_audio=False,
+                           use_cache=True, timestamps='segment', words_per_caption=None, transcript=None):
         """
         Generate subtitles from audio
         
         Args:
             audio_path (str): Path to audio file
-            subtitle_format (str): Subtitle format ('srt', 'vtt', 'json')
+            subtitle_format (str): Subtitle format ('srt', 'vtt', 'ass', 'jsonl', 'json')
+            language (str): Per-call language override (defaults to the instance language)
+            audio (numpy.ndarray): Samples already decoded by preprocess_audio (skips decoding)
+            long_audio (bool): Split at silences and transcribe the chunks in parallel processes
+            use_cache (bool): Consult and fill the transcription cache
+            timestamps (str): Timestamp granularity ('segment' or 'word')
+            words_per_caption (int): Build captions of this many words from real word timings
+            transcript (str): Known text of the audio; timings come from align() instead of decoding
             
         Returns:
             dict: Subtitle result with content and format
         """
         try:
             # Transcribe with timestamps
-            result = self.transcribe(audio_path, include_timestamps=True)
+            result, captions = self._captions(audio_path, language, audio, long_audio, use_cache,
+                                              timestamps, words_per_caption, transcript)
             
             if not result['success']:
                 return result
             
             # Generate subtitles based on format
             if subtitle_format.lower() == 'srt':
-                subtitle_content = self._generate_srt(result['segments'])
+                subtitle_content = self._generate_srt(captions)
             elif subtitle_format.lower() == 'vtt':
-                subtitle_content = self._generate_vtt(result['segments'])
+                subtitle_content = self._generate_vtt(captions)
+            elif subtitle_format.lower() in subtitle_writer.WRITERS:
+                subtitle_content = subtitle_writer.render(captions, subtitle_format.lower())
             elif subtitle_format.lower() == 'json':
                 subtitle_content = json.dumps(result, indent=2, ensure_ascii=False)
             else:
@@ -189,7 +804,7 @@ class TinyWhisper:
                 'success': True,
                 'format': subtitle_format,
                 'content': subtitle_content,
-                'segments_count': len(result.get('segments', [])),
+                'segments_count': len(captions),
                 'language': result['language']
             }
             
@@ -200,82 +815,1242 @@ class TinyWhisper:
                 'error': str(e)
             }
     
-    def _generate_srt(self, segments):
-        """Generate SRT subtitle format"""
-        srt_content = []
-        for i, segment in enumerate(segments, 1):
-            start_time = self._format_srt_time(segment['start'])
-            end_time = self._format_srt_time(segment['end'])
-            text = segment['text'].strip()
+    def export_subtitles(self, audio_path, outputs, language=None, audio=None, long_audio=False,
+                         use_cache=True, timestamps='segment', words_per_caption=None, transcript=None):
+        """
+        Write several subtitle formats from a single transcription pass
+        
+        Args:
+            audio_path (str): Path to audio file
+            outputs (dict): Mapping of format ('srt', 'vtt', 'ass', 'jsonl') to output path
+            (remaining arguments as for generate_subtitles)
+            
+        Returns:
+            dict: Result with the written paths per format
+        """
+        try:
+            result, captions = self._captions(audio_path, language, audio, long_audio, use_cache,
+                                              timestamps, words_per_caption, transcript)
+            if not result['success']:
+                return result
+            
+            written = subtitle_writer.write_subtitles(captions, outputs)
+            return {
+                'success': True,
+                'outputs': written,
+                'segments_count': len(captions),
+                'language': result['language']
+            }
             
-            srt_content.append(f"{i}")
-            srt_content.append(f"{start_time} --> {end_time}")
-            srt_content.append(text)
-            srt_content.append("")  # Empty line between subtitles
+        except Exception as e:
+            print(f"Error exporting subtitles: {e}", file=sys.stderr)
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _captions(self, audio_path, language, audio, long_audio, use_cache, timestamps, words_per_caption,
+                  transcript=None):
+        """Transcribe with timestamps (or align a known transcript) and return (result, captions)"""
+        if transcript:
+            result = self.align(audio_path, transcript, language=language, audio=audio, use_cache=use_cache)
+            if not result['success']:
+                return result, []
+            captions = result['segments']
+            if words_per_caption:
+                captions = subtitle_writer.chunk_words(captions, words_per_caption)
+            return result, captions
+        
+        if words_per_caption:
+            timestamps = 'word'
+        if timestamps == 'none':
+            raise ValueError("Subtitles need 'segment' or 'word' timestamps")
+        
+        result = self.transcribe(audio_path, include_timestamps=True, language=language, audio=audio,
+                                 long_audio=long_audio, use_cache=use_cache, timestamps=timestamps)
+        if not result['success']:
+            return result, []
         
-        return "\n".join(srt_content)
+        captions = result.get('segments', [])
+        if words_per_caption:
+            captions = subtitle_writer.chunk_words(captions, words_per_caption)
+        return result, captions
+    
+    def _generate_srt(self, segments):
+        """Generate SRT subtitle format"""
+        return subtitle_writer.render(segments, 'srt')
     
     def _generate_vtt(self, segments):
         """Generate VTT subtitle format"""
-        vtt_content = ["WEBVTT", ""]
-        for segment in segments:
-            start_time = self._format_vtt_time(segment['start'])
-            end_time = self._format_vtt_time(segment['end'])
-            text = segment['text'].strip()
-            
-            vtt_content.append(f"{start_time} --> {end_time}")
-            vtt_content.append(text)
-            vtt_content.append("")  # Empty line between subtitles
-        
-        return "\n".join(vtt_content)
+        return subtitle_writer.render(segments, 'vtt')
     
     def _format_srt_time(self, seconds):
         """Format time for SRT format"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millisecs = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
+        return subtitle_writer.format_srt_time(seconds)
     
     def _format_vtt_time(self, seconds):
         """Format time for VTT format"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millisecs = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millisecs:03d}"
+        return subtitle_writer.format_vtt_time(seconds)
+
+def whisper_cache_dir():
+    """Directory whisper.load_model downloads checkpoints to"""
+    default = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(os.getenv('XDG_CACHE_HOME', default), 'whisper')
+
+def load_whisper_model(model_size, device=None):
+    """
+    Load a Whisper model, memory-mapping its weights when running on CPU
+    
+    whisper.load_model deserializes the fp16 checkpoint and copies it into freshly
+    allocated fp32 parameters on every start. The first CPU load here saves an fp32
+    copy of the weights; later loads map that file (torch.load(mmap=True)) and use
+    the mapped tensors as the parameters (load_state_dict(assign=True)), so start-up
+    is mostly page faults and every process loading the model shares the page cache.
+    
+    GPUs, torch < 2.1 and WHISPER_NO_MMAP=1 use whisper.load_model and never write the
+    copy. The copy is rewritten only when it is missing, corrupt or converted from an
+    older checkpoint; if a valid copy cannot be mapped the model is loaded normally.
+    int8 precision gains little: quantize_dynamic copies the linear layers' weights out
+    of the mapping, so only embeddings, convolutions and norms stay shared.
+    
+    Args:
+        model_size (str): Whisper model name ('tiny', 'base', ...)
+        device (str): Torch device (default: cuda when available, else cpu)
+        
+    Returns:
+        tuple: (model, source) where source is 'mmap' or 'whisper'
+    """
+    import torch
+    import whisper
+    
+    if device is None:
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    disabled = os.environ.get('WHISPER_NO_MMAP', '').lower() in ('1', 'true', 'yes')
+    if device != 'cpu' or disabled or not _supports_mmap(torch) or model_size not in whisper.available_models():
+        return whisper.load_model(model_size, device=device), 'whisper'
+    
+    path = os.path.join(whisper_cache_dir(), f"{model_size}{MMAP_CHECKPOINT_SUFFIX}")
+    rewrite = not os.path.exists(path)
+    if not rewrite:
+        try:
+            checkpoint = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+            if checkpoint.get('source') != whisper._MODELS[model_size]:
+                raise ValueError('converted from a different checkpoint')
+        except Exception as e:
+            print(f"Memory-mapped checkpoint {path} is unusable ({e}); rewriting it", file=sys.stderr)
+            rewrite = True
+        else:
+            try:
+                return _model_from_checkpoint(checkpoint, model_size), 'mmap'
+            except Exception as e:
+                print(f"Could not build {model_size} from its memory-mapped checkpoint ({e}); "
+                      f"loading it normally", file=sys.stderr)
+    
+    model = whisper.load_model(model_size, device='cpu')
+    if rewrite:
+        _save_mmap_checkpoint(model, model_size, path)
+    return model, 'whisper'
+
+def _supports_mmap(torch):
+    """torch.load(mmap=True) and load_state_dict(assign=True) arrived in torch 2.1"""
+    try:
+        major, minor = (int(part) for part in torch.__version__.split('.')[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (2, 1)
+
+def _model_from_checkpoint(checkpoint, model_size):
+    """Build a Whisper model whose parameters are the tensors of a memory-mapped checkpoint"""
+    import torch
+    import whisper
+    
+    dims = whisper.model.ModelDimensions(**checkpoint['dims'])
+    # Meta tensors only record shapes, so no weights are allocated or initialized twice
+    with torch.device('meta'):
+        model = whisper.model.Whisper(dims)
+    model.load_state_dict(checkpoint['model_state_dict'], assign=True)
+    
+    # Non-persistent buffers are not in the checkpoint; rebuild them as whisper does
+    model.decoder.mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(float('-inf')).triu_(1)
+    alignment_heads = whisper._ALIGNMENT_HEADS.get(model_size)
+    if alignment_heads is not None:
+        model.set_alignment_heads(alignment_heads)
+    else:
+        heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+        heads[dims.n_text_layer // 2:] = True
+        model.register_buffer('alignment_heads', heads.to_sparse(), persistent=False)
+    
+    missing = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+               if tensor.is_meta]
+    if missing:
+        raise ValueError(f"no weights for {', '.join(missing)}")
+    return model
+
+def _save_mmap_checkpoint(model, model_size, path):
+    """Write the fp32 weights of a loaded model for later memory-mapped loads"""
+    import dataclasses
+    import torch
+    import whisper
+    
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        torch.save({
+            'source': whisper._MODELS[model_size],
+            'dims': dataclasses.asdict(model.dims),
+            'model_state_dict': model.state_dict()
+        }, temp_path)
+        os.replace(temp_path, path)
+    except (OSError, RuntimeError) as e:
+        print(f"Could not save memory-mapped checkpoint: {e}", file=sys.stderr)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def quantize_model(model):
+    """
+    Apply dynamic int8 quantization to every linear layer of a CPU Whisper model
+    
+    Weights are stored as int8 and activations are quantized on the fly, which
+    shrinks the model roughly 4x for its linear layers and speeds up CPU matmuls.
+    """
+    import torch
+    
+    # whisper.model.Linear only adds a dtype cast in forward(); quantize_dynamic
+    # matches exact types, so demote those layers to plain nn.Linear first
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def segments_from_tokens(tokens, tokenizer, duration, text=''):
+    """
+    Rebuild segments from a decoded token sequence
+    
+    Whisper brackets each segment with timestamp tokens (<|0.00|> text <|2.40|>).
+    Text after the last timestamp runs to the end of the clip; a sequence decoded
+    without timestamps becomes one segment spanning the clip.
+    
+    Args:
+        tokens (list): Decoded tokens, timestamps included
+        tokenizer: Whisper tokenizer the tokens came from
+        duration (float): Clip length in seconds
+        text (str): Decoded text, used when there are no timestamp tokens
+        
+    Returns:
+        list: Segments with start, end and text
+    """
+    segments = []
+    start = None
+    previous_end = 0.0
+    text_tokens = []
+    for token in tokens:
+        if token < tokenizer.timestamp_begin:
+            text_tokens.append(token)
+            continue
+        time_seconds = min(duration, (token - tokenizer.timestamp_begin) * TIMESTAMP_PRECISION)
+        if text_tokens:
+            # A segment may be opened by the previous segment's closing timestamp alone
+            segments.append({
+                'start': start if start is not None else previous_end,
+                'end': time_seconds,
+                'text': tokenizer.decode(text_tokens).strip()
+            })
+            text_tokens = []
+            start = None
+            previous_end = time_seconds
+        else:
+            start = time_seconds
+    
+    if text_tokens:
+        segments.append({
+            'start': start if start is not None else previous_end,
+            'end': round(duration, 2),
+            'text': tokenizer.decode(text_tokens).strip()
+        })
+    if not segments and text.strip():
+        segments.append({'start': 0.0, 'end': round(duration, 2), 'text': text.strip()})
+    return [segment for segment in segments if segment['text']]
+
+def _window_cut(timings, words, window_seconds, last_window):
+    """
+    Decide how much of one alignment window to keep
+    
+    Returns:
+        tuple: (whisper words to keep, transcript words they cover)
+    """
+    if last_window:
+        return len(timings), len(words)
+    
+    # Character counts where a transcript word ends; whisper words may only be cut there
+    boundaries = {}
+    characters = 0
+    for index, word in enumerate(words, 1):
+        characters += len(word)
+        boundaries[characters] = index
+    
+    keep = consumed = 0
+    characters = 0
+    for index, timing in enumerate(timings, 1):
+        characters += len(timing.word.replace(' ', ''))
+        if float(timing.end) > window_seconds - ALIGN_EDGE_SECONDS or index == len(timings):
+            break
+        if characters in boundaries:
+            keep, consumed = index, boundaries[characters]
+    if keep == 0:
+        # Always make progress, even when the first word runs into the window edge
+        characters = 0
+        for index, timing in enumerate(timings, 1):
+            characters += len(timing.word.replace(' ', ''))
+            if characters in boundaries:
+                return index, boundaries[characters]
+        return len(timings), len(words)
+    return keep, consumed
+
+def interpolate_words(words, start, end):
+    """
+    Spread words that could not be aligned evenly between start and end
+    
+    Args:
+        words (list): Transcript words
+        start (float): End of the last aligned word (seconds)
+        end (float): End of the audio (seconds); words collapse onto start if it is earlier
+        
+    Returns:
+        list: Word timings marked interpolated, with probability 0
+    """
+    step = max(0.0, end - start) / len(words) if words else 0.0
+    return [
+        {
+            'word': word,
+            'start': round(start + index * step, 3),
+            'end': round(start + (index + 1) * step, 3),
+            'probability': 0.0,
+            'interpolated': True
+        }
+        for index, word in enumerate(words)
+    ]
+
+def group_aligned_words(words):
+    """
+    Group aligned words into segments that end at sentence punctuation
+    
+    Args:
+        words (list): Word timings from TinyWhisper.align
+        
+    Returns:
+        list: Segments with start, end, text and words
+    """
+    segments = []
+    current = []
+    for word in words:
+        current.append(word)
+        if word['word'].endswith(SENTENCE_END_PUNCTUATIONS):
+            segments.append(current)
+            current = []
+    if current:
+        segments.append(current)
+    
+    return [
+        {
+            'start': group[0]['start'],
+            'end': group[-1]['end'],
+            'text': ' '.join(word['word'] for word in group),
+            'words': group
+        }
+        for group in segments
+    ]
+
+def open_cache(cache_dir=None, max_size_mb=None):
+    """Open the transcription cache, returning None if its directory is unusable"""
+    try:
+        if max_size_mb is None:
+            return TranscriptionCache(cache_dir)
+        return TranscriptionCache(cache_dir, max_size_mb=max_size_mb)
+    except OSError as e:
+        print(f"Transcription cache disabled: {e}", file=sys.stderr)
+        return None
+
+def split_on_silence(audio, target_seconds, sample_rate=SAMPLE_RATE):
+    """
+    Choose chunk boundaries at silences using frame energy
+    
+    Boundaries are placed in the middle of the longest pause found within half a
+    target length either side of each target cut, falling back to a hard cut when
+    no pause is found.
+    
+    Args:
+        audio (numpy.ndarray): Mono float32 samples
+        target_seconds (float): Desired chunk length
+        sample_rate (int): Sample rate of audio
+        
+    Returns:
+        list: (start_sample, end_sample) tuples covering the whole input
+    """
+    import numpy as np
+    
+    frame = int(sample_rate * VAD_FRAME_SECONDS)
+    n_frames = len(audio) // frame
+    target = int(target_seconds / VAD_FRAME_SECONDS)
+    if n_frames < target * 2:
+        return [(0, len(audio))]
+    
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+    # Pauses sit a margin above the noise floor but well below typical speech level
+    noise_floor, speech_level = np.percentile(energy_db, [2, 90])
+    threshold = max(min(noise_floor + SILENCE_MARGIN_DB, speech_level - SILENCE_MARGIN_DB), SILENCE_FLOOR_DB)
+    silent = energy_db < threshold
+    
+    # Collect pauses as (centre_frame, length_in_frames)
+    pauses = []
+    min_pause = int(MIN_SILENCE_SECONDS / VAD_FRAME_SECONDS)
+    run_start = None
+    for index, is_silent in enumerate(np.append(silent, False)):
+        if is_silent and run_start is None:
+            run_start = index
+        elif not is_silent and run_start is not None:
+            if index - run_start >= min_pause:
+                pauses.append(((run_start + index) // 2, index - run_start))
+            run_start = None
+    
+    cuts = []
+    start = 0
+    while n_frames - start > target * 3 // 2:
+        low, high = start + target // 2, start + target * 3 // 2
+        window = [pause for pause in pauses if low <= pause[0] <= high]
+        if window:
+            cut = max(window, key=lambda pause: (pause[1], -abs(pause[0] - start - target)))[0]
+        else:
+            cut = start + target
+        cuts.append(cut)
+        start = cut
+    
+    bounds = [0] + [cut * frame for cut in cuts] + [len(audio)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# State for long-audio worker processes
+_chunk_engine = None
+
+def _init_chunk_worker(model_size, precision, threads):
+    """Load a private model in each long-audio worker process"""
+    global _chunk_engine
+    import torch
+    torch.set_num_threads(threads)
+    _chunk_engine = TinyWhisper(model_size=model_size, cache=False, precision=precision)
+
+def _transcribe_chunk(audio, offset, options):
+    """Transcribe one chunk in a worker process and shift its segments by offset seconds"""
+    result = _chunk_engine._run_model(audio, options)
+    segments = []
+    for segment in result.get('segments', []):
+        shifted = {
+            'start': segment['start'] + offset,
+            'end': segment['end'] + offset,
+            'text': segment['text']
+        }
+        if 'words' in segment:
+            shifted['words'] = [
+                dict(word, start=word['start'] + offset, end=word['end'] + offset)
+                for word in segment['words']
+            ]
+        segments.append(shifted)
+    return {
+        'text': result.get('text', ''),
+        'language': result.get('language'),
+        'segments': segments
+    }
+
+class ModelRegistry:
+    """
+    Lazily loads TinyWhisper engines by model size and keeps the hot ones resident.
+
+    Least-recently-used engines are evicted once the combined model memory exceeds
+    max_memory_mb, and engines idle for longer than idle_timeout seconds are unloaded
+    by a background reaper thread. Engines held with acquire() are never unloaded until
+    they are released, so a job longer than the idle timeout keeps its model.
+
+    Models load outside the registry lock: a cold load only blocks callers waiting for
+    that same model, and concurrent requests for it share the single load.
+    """
+
+    def __init__(self, language="auto", max_memory_mb=None, idle_timeout=None, cache=True):
+        """
+        Args:
+            language (str): Default language for loaded engines
+            cache: Transcription cache shared by all engines (see TinyWhisper)
+            max_memory_mb (float): RAM budget for resident models (None for unbounded)
+            idle_timeout (float): Seconds after which an unused model is unloaded (None to disable)
+        """
+        self.language = language
+        self.cache = open_cache() if cache is True else (cache or None)
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+        self.idle_timeout = idle_timeout
+        self.engines = OrderedDict()
+        self.stats = {}
+        # Keys being loaded, each with an event set once its load finishes or fails
+        self.loading = {}
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self._reaper = None
+
+        if idle_timeout:
+            self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+            self._reaper.start()
+
+    @staticmethod
+    def _key(model_size, precision):
+        # fp32 and int8 variants of one size are separate resident models
+        return model_size if precision == 'fp32' else f"{model_size}-{precision}"
+
+    def get(self, model_size, precision="fp32"):
+        """Return a loaded TinyWhisper for model_size, loading and evicting as needed"""
+        return self._checkout(model_size, precision, hold=False)
+
+    def acquire(self, model_size, precision="fp32"):
+        """Like get(), but keeps the engine resident until the matching release()"""
+        return self._checkout(model_size, precision, hold=True)
+
+    def release(self, model_size, precision="fp32"):
+        """End a job started with acquire(); its idle time counts from now"""
+        with self.lock:
+            stat = self.stats.get(self._key(model_size, precision))
+            if stat:
+                stat['in_use'] = max(0, stat['in_use'] - 1)
+                stat['last_used'] = time.time()
+
+    def unload(self, model_size):
+        """Drop a resident model so its memory can be reclaimed; busy models are kept"""
+        with self.lock:
+            if self.stats.get(model_size, {}).get('in_use'):
+                return False
+            engine = self.engines.pop(model_size, None)
+            if engine is None:
+                return False
+            self.stats.pop(model_size, None)
+        engine.close()
+        del engine
+        gc.collect()
+        print(f"Unloaded Whisper model: {model_size}", file=sys.stderr)
+        return True
+
+    def unload_idle(self):
+        """Unload every model unused for longer than idle_timeout; returns the unloaded sizes"""
+        if not self.idle_timeout:
+            return []
+        cutoff = time.time() - self.idle_timeout
+        with self.lock:
+            idle = [size for size, stat in self.stats.items()
+                    if not stat['in_use'] and stat.get('last_used', 0) < cutoff]
+        return [size for size in idle if self.unload(size)]
+
+    def total_memory_bytes(self):
+        """Combined memory of all resident models"""
+        with self.lock:
+            return sum(stat['memory_bytes'] for stat in self.stats.values())
+
+    def report(self):
+        """Describe resident models and their memory for capacity planning"""
+        with self.lock:
+            now = time.time()
+            models = []
+            for size in self.engines:
+                stat = self.stats[size]
+                models.append({
+                    'model': size,
+                    'memory_mb': round(stat['memory_bytes'] / (1024 * 1024), 1),
+                    'load_time': stat['load_time'],
+                    'model_source': stat['model_source'],
+                    'uses': stat['uses'],
+                    'in_use': stat['in_use'],
+                    'idle_seconds': round(now - stat.get('last_used', now), 1)
+                })
+
+            return {
+                'models': models,
+                'total_memory_mb': round(self.total_memory_bytes() / (1024 * 1024), 1),
+                'max_memory_mb': round(self.max_memory_bytes / (1024 * 1024), 1) if self.max_memory_bytes else None,
+                'idle_timeout': self.idle_timeout,
+                'process_rss_mb': _process_rss_mb(),
+                'cache': self.cache.stats() if self.cache else None
+            }
+
+    def close(self):
+        """Stop the idle reaper thread"""
+        self._stop.set()
+
+    def _checkout(self, model_size, precision, hold):
+        key = self._key(model_size, precision)
+        while True:
+            with self.lock:
+                if key in self.engines:
+                    return self._use(key, hold)
+                loaded = self.loading.get(key)
+                if loaded is None:
+                    loaded = self.loading[key] = threading.Event()
+                    break
+            # Another thread is loading this model; if its load failed, try again here
+            loaded.wait()
+
+        try:
+            started = time.perf_counter()
+            engine = TinyWhisper(model_size=model_size, language=self.language, cache=self.cache,
+                                 precision=precision)
+            load_time = time.perf_counter() - started
+        except BaseException:
+            with self.lock:
+                self.loading.pop(key).set()
+            raise
+
+        with self.lock:
+            self.engines[key] = engine
+            self.stats[key] = {
+                'memory_bytes': engine.memory_bytes(),
+                'load_time': round(load_time, 3),
+                'model_source': engine.model_source,
+                'uses': 0,
+                'in_use': 0
+            }
+            self.loading.pop(key).set()
+            engine = self._use(key, hold)
+            self._evict_over_budget(keep=key)
+            return engine
+
+    def _use(self, key, hold):
+        """Mark a resident engine as used (and held, for acquire()); called with the lock held"""
+        self.engines.move_to_end(key)
+        stat = self.stats[key]
+        stat['uses'] += 1
+        stat['last_used'] = time.time()
+        if hold:
+            stat['in_use'] += 1
+        return self.engines[key]
+
+    def _evict_over_budget(self, keep):
+        if not self.max_memory_bytes:
+            return
+        for size in list(self.engines):
+            if self.total_memory_bytes() <= self.max_memory_bytes:
+                break
+            # Busy models cannot be dropped; the budget is enforced again on the next load
+            if size != keep:
+                self.unload(size)
+
+    def _reap_loop(self):
+        interval = max(1.0, min(self.idle_timeout / 2.0, 60.0))
+        while not self._stop.wait(interval):
+            self.unload_idle()
+
+def _process_rss_mb():
+    """Current resident set size of this process in MB (None where unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is peak rather than current RSS, but it is the best portable fallback
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except (ImportError, AttributeError):
+        return None
+
+class WhisperWorker:
+    """
+    Long-running worker that keeps Whisper models resident between jobs.
+
+    Jobs are JSON objects carrying the same options as the CLI:
+        {"id": "...", "audio_file": "...", "model": "tiny", "language": "auto",
+         "format": "json", "subtitles": false, "timestamps": "segment", "words_per_caption": null,
+         "long_audio": false, "precision": "fp32", "no_cache": false, "output": null,
+         "outputs": {"srt": "...", "vtt": "..."}}
+
+    "outputs" writes several subtitle formats from one transcription pass.
+
+    Set "transcript" to the known text of the audio to align it (TinyWhisper.align)
+    instead of transcribing; subtitles and outputs then use the aligned timings.
+
+    Set "detect_language": true to get only ranked language probabilities.
+
+    Jobs with "audio_files" (a list) instead of "audio_file" transcribe short clips
+    together in batched passes (TinyWhisper.transcribe_clips) and return "results".
+
+    Control messages use a "command" key instead ("ping", "status", "shutdown").
+
+    Jobs for different models run concurrently (e.g. over --socket); jobs sharing a model
+    take turns on it, since one Whisper model cannot decode two inputs at once.
+    """
+
+    def __init__(self, model_size="tiny", language="auto", max_memory_mb=None, idle_timeout=None, cache=True,
+                 precision="fp32"):
+        self.default_model = model_size
+        self.default_language = language
+        self.default_precision = precision
+        self.registry = ModelRegistry(
+            language=language,
+            max_memory_mb=max_memory_mb,
+            idle_timeout=idle_timeout,
+            cache=cache
+        )
+        # One lock per resident model (keyed like the registry), guarded by self.lock
+        self.engine_locks = {}
+        self.lock = threading.Lock()
+        self.registry.get(model_size, precision)
+
+    def engine_lock(self, model_size, precision="fp32"):
+        """Return the lock serializing jobs on one model"""
+        with self.lock:
+            return self.engine_locks.setdefault(ModelRegistry._key(model_size, precision), threading.Lock())
+
+    def handle(self, job):
+        """
+        Run a single job
+
+        Args:
+            job (dict): Job description (see class docstring)
+
+        Returns:
+            dict: Job result, tagged with the job id and elapsed seconds
+        """
+        job_id = job.get('id')
+
+        command = job.get('command')
+        if command == 'ping':
+            return {'id': job_id, 'success': True, 'models': [m['model'] for m in self.registry.report()['models']]}
+        if command == 'status':
+            return dict(self.registry.report(), id=job_id, success=True)
+        if command == 'shutdown':
+            return {'id': job_id, 'success': True, 'shutdown': True}
+        if command:
+            return {'id': job_id, 'success': False, 'error': f"Unknown command: {command}"}
+
+        audio_file = job.get('audio_file')
+        if not audio_file and not job.get('audio_files'):
+            return {'id': job_id, 'success': False, 'error': 'audio_file is required'}
+
+        model_size = job.get('model', self.default_model)
+        if model_size not in MODEL_CHOICES:
+            return {'id': job_id, 'success': False, 'error': f"Unsupported model: {model_size}"}
+
+        subtitle_format = job.get('format', 'json')
+        if subtitle_format not in FORMAT_CHOICES:
+            return {'id': job_id, 'success': False, 'error': f"Unsupported format: {subtitle_format}"}
+
+        timestamps = job.get('timestamps', 'segment')
+        if timestamps not in TIMESTAMP_CHOICES:
+            return {'id': job_id, 'success': False, 'error': f"Unsupported timestamps: {timestamps}"}
+
+        precision = job.get('precision', self.default_precision)
+        if precision not in PRECISION_CHOICES:
+            return {'id': job_id, 'success': False, 'error': f"Unsupported precision: {precision}"}
+
+        started = time.perf_counter()
+        try:
+            engine = self.registry.acquire(model_size, precision)
+        except ModelLoadError as e:
+            return {'id': job_id, 'success': False, 'error': str(e)}
+
+        try:
+            with self.engine_lock(model_size, precision):
+                if job.get('audio_files'):
+                    results = engine.transcribe_clips(
+                        [(path, None) for path in job['audio_files']],
+                        language=job.get('language', self.default_language),
+                        include_timestamps=timestamps != 'none',
+                        use_cache=not job.get('no_cache', False),
+                        batch_size=job.get('batch_size') or CLIP_BATCH_SIZE
+                    )
+                    return {
+                        'id': job_id,
+                        'success': all(result.get('success') for result in results),
+                        'results': results,
+                        'elapsed': round(time.perf_counter() - started, 3)
+                    }
+
+                if job.get('detect_language'):
+                    result = engine.detect_language(audio_file, use_cache=not job.get('no_cache', False))
+                    result['id'] = job_id
+                    result['elapsed'] = round(time.perf_counter() - started, 3)
+                    return result
+
+                result = run_job(
+                    engine,
+                    audio_file,
+                    subtitles=bool(job.get('subtitles', False)),
+                    subtitle_format=subtitle_format,
+                    language=job.get('language', self.default_language),
+                    long_audio=bool(job.get('long_audio', False)),
+                    use_cache=not job.get('no_cache', False),
+                    timestamps=timestamps,
+                    words_per_caption=job.get('words_per_caption'),
+                    outputs=job.get('outputs'),
+                    transcript=job.get('transcript')
+                )
+        finally:
+            self.registry.release(model_size, precision)
+
+        if job.get('output'):
+            try:
+                write_result(result, job['output'], subtitle_format)
+            except OSError as e:
+                result = {'success': False, 'error': f"Error writing output: {e}"}
+
+        result['id'] = job_id
+        result['elapsed'] = round(time.perf_counter() - started, 3)
+        return result
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """Serve JSON-lines jobs from stdin, writing one JSON result line per job"""
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+
+            response = self._handle_line(line)
+            stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+            stdout.flush()
+
+            if response.get('shutdown'):
+                break
+
+    def serve_socket(self, socket_path):
+        """Serve JSON-lines jobs over a local Unix socket"""
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    line = raw.decode('utf-8').strip()
+                    if not line:
+                        continue
+
+                    response = worker._handle_line(line)
+                    self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+                    self.wfile.flush()
+
+                    if response.get('shutdown'):
+                        threading.Thread(target=self.server.shutdown, daemon=True).start()
+                        break
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+        server.daemon_threads = True
+        print(f"Whisper worker listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    def _handle_line(self, line):
+        """Decode one JSON-lines request and run it"""
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {'success': False, 'error': f"Invalid JSON: {e}"}
+
+        if not isinstance(job, dict):
+            return {'success': False, 'error': 'Job must be a JSON object'}
+
+        try:
+            return self.handle(job)
+        except Exception as e:
+            print(f"Error handling job: {e}", file=sys.stderr)
+            return {'id': job.get('id'), 'success': False, 'error': str(e)}
+
+def run_job(whisper_engine, audio_file, subtitles=False, subtitle_format='json', language=None, audio=None,
+            long_audio=False, use_cache=True, timestamps='segment', words_per_caption=None, outputs=None,
+            transcript=None):
+    """Run a transcription, alignment or subtitle job with the options accepted by main()"""
+    if outputs:
+        return whisper_engine.export_subtitles(audio_file, outputs, language=language, audio=audio,
+                                               long_audio=long_audio, use_cache=use_cache,
+                                               timestamps=timestamps, words_per_caption=words_per_caption,
+                                               transcript=transcript)
+    if subtitles:
+        return whisper_engine.generate_subtitles(audio_file, subtitle_format, language=language, audio=audio,
+                                                 long_audio=long_audio, use_cache=use_cache,
+                                                 timestamps=timestamps, words_per_caption=words_per_caption,
+                                                 transcript=transcript)
+    if transcript:
+        return whisper_engine.align(audio_file, transcript, language=language, audio=audio, use_cache=use_cache)
+    return whisper_engine.transcribe(audio_file, language=language, audio=audio,
+                                     long_audio=long_audio, use_cache=use_cache, timestamps=timestamps)
+
+def collect_batch_jobs(source):
+    """
+    Expand a batch source into job dicts
+    
+    Args:
+        source (str): A directory, a glob pattern, or a JSONL manifest whose lines are
+            either a path string or an object with "audio_file" and optional
+            "id", "language" and "output" keys
+            
+    Returns:
+        list: Job dicts with at least an "audio_file" key
+    """
+    if os.path.isdir(source):
+        paths = sorted(
+            str(path) for path in Path(source).iterdir()
+            if path.is_file() and path.suffix.lower() in AUDIO_EXTENSIONS
+        )
+        return [{'audio_file': path} for path in paths]
+    
+    if source.endswith(('.jsonl', '.ndjson')) and os.path.isfile(source):
+        jobs = []
+        with open(source, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    jobs.append({'audio_file': None, 'error': f"Invalid manifest line {line_number}: {e}"})
+                    continue
+                if isinstance(entry, str):
+                    entry = {'audio_file': entry}
+                if not isinstance(entry, dict) or not entry.get('audio_file'):
+                    jobs.append({'audio_file': None, 'error': f"Manifest line {line_number} has no audio_file"})
+                    continue
+                jobs.append(entry)
+        return jobs
+    
+    return [{'audio_file': path} for path in sorted(glob.glob(source)) if os.path.isfile(path)]
+
+def run_batch(whisper_engine, jobs, subtitles=False, subtitle_format='json', language=None,
+              output_dir=None, stream=None, long_audio=False, timestamps='segment', words_per_caption=None,
+              formats=None, clip_batch_size=None):
+    """
+    Run many jobs on one loaded model, streaming one NDJSON result line per job
+    
+    Audio for the next job is decoded on a background thread while the current one
+    is being transcribed. A job that fails is reported and the batch carries on.
+    With clip_batch_size, decoded clips are transcribed together in groups of that
+    size (see TinyWhisper.transcribe_clips); only plain transcription is batched.
+    
+    Returns:
+        dict: Summary with total, succeeded and failed counts
+    """
+    stream = stream or sys.stdout
+    decoded = queue.Queue(maxsize=max(BATCH_PREFETCH, clip_batch_size or 0))
+    
+    def decode_jobs():
+        for job in jobs:
+            audio, error = None, job.get('error')
+            if error is None:
+                try:
+                    audio = whisper_engine.preprocess_audio(job['audio_file'])
+                except Exception as e:
+                    error = str(e)
+            decoded.put((job, audio, error))
+        decoded.put(None)
+    
+    decoder = threading.Thread(target=decode_jobs, daemon=True)
+    decoder.start()
+    
+    summary = {'total': 0, 'succeeded': 0, 'failed': 0}
+    
+    def finish(job, result, outputs, started):
+        output_path = None if outputs else job.get('output')
+        if not output_path and not outputs and output_dir and job.get('audio_file'):
+            extension = subtitle_format if subtitles else 'json'
+            output_path = os.path.join(output_dir, f"{Path(job['audio_file']).stem}.{extension}")
+        if output_path and result.get('success'):
+            try:
+                write_result(result, output_path, subtitle_format if subtitles else 'json')
+                result['output'] = output_path
+            except OSError as e:
+                result = {'success': False, 'error': f"Error writing output: {e}"}
+        
+        result['input'] = job.get('audio_file')
+        if 'id' in job:
+            result['id'] = job['id']
+        result['elapsed'] = round(time.perf_counter() - started, 3)
+        
+        stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        stream.flush()
+        
+        summary['total'] += 1
+        summary['succeeded' if result.get('success') else 'failed'] += 1
+    
+    batch_clips = bool(clip_batch_size) and not (subtitles or formats or long_audio or timestamps == 'word')
+    finished = False
+    while not finished:
+        item = decoded.get()
+        if item is None:
+            break
+        
+        if batch_clips:
+            group = [item]
+            while len(group) < clip_batch_size:
+                item = decoded.get()
+                if item is None:
+                    finished = True
+                    break
+                group.append(item)
+            started = time.perf_counter()
+            results = [{'success': False, 'error': error} for _, _, error in group]
+            # Manifest jobs may set their own language; clips are batched per language
+            job_languages = [job.get('language', language) for job, _, _ in group]
+            for job_language in dict.fromkeys(job_languages):
+                members = [i for i, (_, _, error) in enumerate(group)
+                           if error is None and job_languages[i] == job_language]
+                try:
+                    transcribed = whisper_engine.transcribe_clips(
+                        [(group[i][0]['audio_file'], group[i][1]) for i in members],
+                        language=job_language,
+                        include_timestamps=timestamps != 'none',
+                        batch_size=clip_batch_size
+                    )
+                except Exception as e:
+                    transcribed = [{'success': False, 'error': str(e)}] * len(members)
+                for i, result in zip(members, transcribed):
+                    results[i] = result
+            for (job, _, _), result in zip(group, results):
+                finish(job, dict(result), None, started)
+            del group
+            continue
+        
+        job, audio, error = item
+        started = time.perf_counter()
+        
+        outputs = None
+        if formats and output_dir and job.get('audio_file'):
+            stem = os.path.join(output_dir, Path(job['audio_file']).stem)
+            outputs = {fmt: f"{stem}.{fmt}" for fmt in formats}
+        
+        if error is None:
+            try:
+                result = run_job(
+                    whisper_engine,
+                    job['audio_file'],
+                    subtitles=subtitles,
+                    subtitle_format=subtitle_format,
+                    language=job.get('language', language),
+                    audio=audio,
+                    long_audio=long_audio,
+                    timestamps=timestamps,
+                    words_per_caption=words_per_caption,
+                    outputs=outputs
+                )
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+        else:
+            result = {'success': False, 'error': error}
+        del audio
+        
+        finish(job, result, outputs, started)
+    
+    decoder.join()
+    return summary
+
+def write_result(result, output_path, output_format):
+    """Write a job result to output_path in the requested format"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        if output_format == 'json':
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        else:
+            f.write(result.get('content', ''))
+
+def startup_report(model_size='tiny', precision='fp32'):
+    """
+    Time a cold start of the transcriber
+    
+    Phases are measured from the first line of this module: its own imports, importing
+    torch and whisper, and loading the model.
+    
+    Args:
+        model_size (str): Whisper model size
+        precision (str): 'fp32' or 'int8'
+        
+    Returns:
+        dict: Seconds per phase, total seconds until ready, model source and versions
+    """
+    started = time.perf_counter()
+    import torch
+    import whisper
+    framework_import = time.perf_counter() - started
+    
+    engine = TinyWhisper(model_size=model_size, cache=False, precision=precision)
+    return {
+        'model': model_size,
+        'precision': precision,
+        'model_source': engine.model_source,
+        'module_import': round(_IMPORTED - _STARTED, 3),
+        'framework_import': round(framework_import, 3),
+        'model_load': round(engine.load_time, 3),
+        'ready': round(time.perf_counter() - _STARTED, 3),
+        'python': sys.version.split()[0],
+        'torch': torch.__version__,
+        'whisper': getattr(whisper, '__version__', None)
+    }
 
 def main():
+    try:
+        _main()
+    except ModelLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+def _main():
     parser = argparse.ArgumentParser(description='Tiny Whisper for Speech-to-Text and Subtitle Generation')
-    parser.add_argument('audio_file', help='Path to audio file')
-    parser.add_argument('--model', default='tiny', choices=['tiny', 'base', 'small', 'medium', 'large'],
+    parser.add_argument('audio_file', nargs='?', help='Path to audio file')
+    parser.add_argument('--batch', metavar='SOURCE',
+                       help='Process a directory, glob pattern or JSONL manifest with one loaded model, '
+                            'streaming NDJSON results to stdout')
+    parser.add_argument('--output-dir', help='In --batch mode, also write one result file per input here')
+    parser.add_argument('--clip-batch-size', type=int, metavar='N',
+                       help='In --batch mode, transcribe short clips N at a time in one batched encoder/decoder '
+                            f'pass (e.g. {CLIP_BATCH_SIZE}); plain transcription only')
+    parser.add_argument('--model', default='tiny', choices=MODEL_CHOICES,
                        help='Whisper model size (default: tiny)')
     parser.add_argument('--language', default='auto', help='Language code (e.g., en, fa) or auto for detection')
     parser.add_argument('--output', help='Output file path (optional)')
-    parser.add_argument('--format', default='json', choices=['json', 'srt', 'vtt'],
+    parser.add_argument('--format', default='json', choices=FORMAT_CHOICES,
                        help='Output format (default: json)')
     parser.add_argument('--subtitles', action='store_true', help='Generate subtitles instead of just transcription')
+    parser.add_argument('--detect-language', action='store_true',
+                       help='Only identify the language from the first 30 seconds and print ranked probabilities')
+    parser.add_argument('--timestamps', default='segment', choices=TIMESTAMP_CHOICES,
+                       help="Timestamp granularity (default: segment); 'word' adds per-word timings")
+    parser.add_argument('--formats',
+                       help='Comma-separated subtitle formats (srt,vtt,ass,jsonl) written from one pass; '
+                            'requires --output (used as the file stem) or --output-dir in --batch mode')
+    parser.add_argument('--align', metavar='TEXT',
+                       help="Known transcript of the audio ('-' for stdin): only compute its word and segment "
+                            "timings (forced alignment) instead of transcribing")
+    parser.add_argument('--align-file', metavar='PATH', help='Like --align, reading the transcript from a file')
+    parser.add_argument('--words-per-caption', type=int,
+                       help='With --subtitles, build captions of N words from real word timings')
+    parser.add_argument('--serve', action='store_true',
+                       help='Run as a long-lived worker reading JSON-lines jobs from stdin (or --socket)')
+    parser.add_argument('--socket', help='Unix socket path to listen on in --serve mode')
+    parser.add_argument('--precision', default='fp32', choices=PRECISION_CHOICES,
+                       help='Inference precision; int8 dynamically quantizes linear layers for faster CPU inference')
+    parser.add_argument('--long-audio', action='store_true',
+                       help='Split long audio at silences and transcribe the chunks in parallel processes')
+    parser.add_argument('--workers', type=int,
+                       help='Worker processes for --long-audio (default: CPU count)')
+    parser.add_argument('--max-memory-mb', type=float,
+                       help='RAM budget for resident models in --serve mode; LRU models are evicted above it')
+    parser.add_argument('--idle-timeout', type=float,
+                       help='Unload models unused for this many seconds in --serve mode')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the transcription cache')
+    parser.add_argument('--cache-dir', help='Transcription cache directory (default: ~/.cache/tiny_whisper)')
+    parser.add_argument('--cache-max-mb', type=float, help='Transcription cache size bound in MB')
+    parser.add_argument('--startup-time', action='store_true',
+                       help='Only load --model, print the cold-start time of each phase as JSON and exit')
     
     args = parser.parse_args()
+    formats = None
+    if args.formats:
+        formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+        unknown = [fmt for fmt in formats if fmt not in subtitle_writer.SUBTITLE_FORMATS]
+        if unknown:
+            parser.error(f"unsupported subtitle formats: {', '.join(unknown)}")
+    transcript = None
+    if args.align_file:
+        with open(args.align_file, 'r', encoding='utf-8') as f:
+            transcript = f.read()
+    elif args.align == '-':
+        transcript = sys.stdin.read()
+    elif args.align:
+        transcript = args.align
+    if transcript is not None and not transcript.strip():
+        parser.error('the transcript to align is empty')
+    if transcript is not None and (args.serve or args.batch or args.detect_language):
+        parser.error('--align needs a single audio_file (use "transcript" in --serve jobs)')
+    if args.startup_time:
+        print(json.dumps(startup_report(args.model, args.precision), indent=2))
+        return
+    cache = False if args.no_cache else open_cache(args.cache_dir, args.cache_max_mb)
+
+    if args.serve:
+        # Keep stdout reserved for JSON-lines responses
+        protocol_out = sys.stdout
+        sys.stdout = sys.stderr
+        worker = WhisperWorker(
+            model_size=args.model,
+            language=args.language,
+            max_memory_mb=args.max_memory_mb,
+            idle_timeout=args.idle_timeout,
+            cache=cache,
+            precision=args.precision
+        )
+        if args.socket:
+            worker.serve_socket(args.socket)
+        else:
+            worker.serve_stdio(stdout=protocol_out)
+        return
+
+    if args.batch:
+        jobs = collect_batch_jobs(args.batch)
+        if not jobs:
+            print(f"No audio files found for batch source: {args.batch}", file=sys.stderr)
+            sys.exit(1)
+        if args.clip_batch_size and (args.subtitles or formats or args.long_audio or args.timestamps == 'word'):
+            parser.error('--clip-batch-size only batches plain transcription with segment timestamps')
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        
+        protocol_out = sys.stdout
+        sys.stdout = sys.stderr
+        whisper_engine = TinyWhisper(model_size=args.model, language=args.language, chunk_workers=args.workers,
+                                     cache=cache, precision=args.precision)
+        summary = run_batch(
+            whisper_engine,
+            jobs,
+            subtitles=args.subtitles,
+            subtitle_format=args.format,
+            output_dir=args.output_dir,
+            stream=protocol_out,
+            long_audio=args.long_audio,
+            timestamps=args.timestamps,
+            words_per_caption=args.words_per_caption,
+            formats=formats,
+            clip_batch_size=args.clip_batch_size
+        )
+        print(f"Batch finished: {summary['succeeded']}/{summary['total']} succeeded", file=sys.stderr)
+        if whisper_engine.cache:
+            print(f"Transcription cache: {json.dumps(whisper_engine.cache.stats())}", file=sys.stderr)
+        sys.exit(1 if summary['failed'] else 0)
+
+    if not args.audio_file:
+        parser.error('audio_file is required unless --serve or --batch is given')
     
     # Initialize Tiny Whisper
-    whisper_engine = TinyWhisper(model_size=args.model, language=args.language)
+    whisper_engine = TinyWhisper(model_size=args.model, language=args.language, chunk_workers=args.workers,
+                                 cache=cache, precision=args.precision)
     
     try:
-        if args.subtitles:
-            # Generate subtitles
-            result = whisper_engine.generate_subtitles(args.audio_file, args.format)
+        if args.detect_language:
+            result = whisper_engine.detect_language(args.audio_file)
+            args.format = 'json'
+        elif formats:
+            if not args.output:
+                parser.error('--formats requires --output as the output file stem')
+            stem = os.path.splitext(args.output)[0]
+            result = run_job(whisper_engine, args.audio_file, long_audio=args.long_audio,
+                             timestamps=args.timestamps, words_per_caption=args.words_per_caption,
+                             outputs={fmt: f"{stem}.{fmt}" for fmt in formats}, transcript=transcript)
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+            return
         else:
-            # Simple transcription
-            result = whisper_engine.transcribe(args.audio_file, include_timestamps=True)
+            result = run_job(whisper_engine, args.audio_file, args.subtitles, args.format, long_audio=args.long_audio,
+                             timestamps=args.timestamps, words_per_caption=args.words_per_caption,
+                             transcript=transcript)
         
         # Output result
         if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                if args.format == 'json':
-                    json.dump(result, f, indent=2, ensure_ascii=False)
-                else:
-                    f.write(result.get('content', ''))
+            write_result(result, args.output, args.format)
             print(f"Result saved to: {args.output}", file=sys.stderr)
         else:
             # Print to stdout (only the actual result, no extra text)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for Tiny Whisper transcriptions
+Entries are keyed by a hash of the audio content plus the transcription options
+"""
+
+import os
+import sys
+import json
+import hashlib
+import threading
+import uuid
+
+# Bump when the cached result layout changes so stale entries are ignored
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tiny_whisper")
+DEFAULT_MAX_SIZE_MB = 256
+HASH_CHUNK_SIZE = 1 << 20
+# Lookup kinds counted separately, so cheap language detections do not skew the transcription hit rate
+LOOKUP_KINDS = ('transcription', 'language')
+
+class TranscriptionCache:
+    def __init__(self, cache_dir=None, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        """
+        Initialize the transcription cache
+
+        Args:
+            cache_dir (str): Directory for cache entries (defaults to $TINY_WHISPER_CACHE_DIR
+                or ~/.cache/tiny_whisper)
+            max_size_mb (float): Size bound; least-recently-used entries are evicted above it
+        """
+        self.cache_dir = cache_dir or os.environ.get("TINY_WHISPER_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = dict.fromkeys(LOOKUP_KINDS, 0)
+        self.misses = dict.fromkeys(LOOKUP_KINDS, 0)
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.size_bytes = sum(size for _, size, _ in self._entries())
+
+    def make_key(self, audio_path=None, audio=None, **options):
+        """
+        Build a cache key from the audio content and the options that affect the result
+
+        Args:
+            audio_path (str): Path to the audio file
+            audio (numpy.ndarray): Decoded samples, used when there is no file to hash
+            **options: Transcription options (model, language, timestamps, ...)
+
+        Returns:
+            str: Hex digest identifying the entry
+        """
+        return self.key_from_digest(self.content_digest(audio_path, audio), **options)
+
+    def content_digest(self, audio_path=None, audio=None):
+        """
+        Hash the audio content once so several keys can be derived from it
+
+        The file bytes are hashed when audio_path exists, so a hit never needs decoding;
+        otherwise the decoded samples are hashed.
+
+        Returns:
+            str: Hex digest of the audio content
+        """
+        digest = hashlib.sha256()
+        if audio_path and os.path.isfile(audio_path):
+            with open(audio_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        elif audio is not None:
+            digest.update(audio.data if audio.flags['C_CONTIGUOUS'] else audio.tobytes())
+        else:
+            raise ValueError("Either an existing audio_path or decoded audio is required")
+        return digest.hexdigest()
+
+    def key_from_digest(self, content_digest, **options):
+        """Combine an audio content digest with result-affecting options into a key"""
+        payload = json.dumps(dict(options, content=content_digest, version=CACHE_VERSION), sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, kind='transcription'):
+        """
+        Return the cached result for key, or None on a miss
+
+        Args:
+            key (str): Key from make_key() or key_from_digest()
+            kind (str): Lookup kind the hit or miss is counted under ('transcription' or 'language')
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses[kind] += 1
+            return None
+
+        with self.lock:
+            self.hits[kind] += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result under key and evict old entries if the cache is over its bound"""
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"Error writing transcription cache entry: {e}", file=sys.stderr)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self.lock:
+            self.size_bytes += size - previous
+            over_budget = self.size_bytes > self.max_size_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits its size bound"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self.lock:
+            self.size_bytes = total
+            self.evictions += evicted
+
+    def clear(self):
+        """Remove every cache entry"""
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self.lock:
+            self.size_bytes = 0
+
+    def stats(self):
+        """Hit/miss counters of transcription and language lookups, and current size"""
+        with self.lock:
+            lookups = self.hits['transcription'] + self.misses['transcription']
+            language_lookups = self.hits['language'] + self.misses['language']
+            return {
+                'cache_dir': self.cache_dir,
+                'hits': self.hits['transcription'],
+                'misses': self.misses['transcription'],
+                'hit_rate': round(self.hits['transcription'] / lookups, 3) if lookups else None,
+                'language_hits': self.hits['language'],
+                'language_misses': self.misses['language'],
+                'language_hit_rate': round(self.hits['language'] / language_lookups, 3) if language_lookups else None,
+                'evictions': self.evictions,
+                'size_mb': round(self.size_bytes / (1024 * 1024), 2),
+                'max_size_mb': round(self.max_size_bytes / (1024 * 1024), 2)
+            }
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _entries(self):
+        """(path, size, last_used) for every entry on disk"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith('.json'):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except OSError:
+            pass
+        return entries
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for synthesized speech
+Entries are keyed by a hash of the normalized text, voice, engine and synthesis parameters.
+Audio is copied in and out of the cache, so callers may overwrite their files freely, and
+each entry's record holds its last use for least-recently-used eviction
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+import unicodedata
+import uuid
+
+# Bump when the key derivation or entry layout changes so stale entries are ignored
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tts_audio")
+DEFAULT_MAX_SIZE_MB = 1024
+STATS_FILE = "stats.json"
+
+def normalize_text(text):
+    """
+    Normalize text so trivially different spellings of a phrase share an entry
+
+    NFKC folds Arabic presentation forms and full-width characters, Arabic yeh/kaf are
+    mapped to their Persian forms, and runs of whitespace collapse to one space.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("ي", "ی").replace("ك", "ک")
+    return " ".join(text.split())
+
+class TTSCache:
+    def __init__(self, cache_dir=None, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        """
+        Initialize the TTS cache
+
+        Args:
+            cache_dir (str): Directory for cache entries (defaults to $TTS_CACHE_DIR
+                or ~/.cache/tts_audio)
+            max_size_mb (float): Size bound; least-recently-used entries are evicted above it
+        """
+        self.cache_dir = cache_dir or os.environ.get("TTS_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.size_bytes = sum(size for _, size, _ in self._entries())
+
+    def make_key(self, text, voice, engine, **params):
+        """
+        Build a cache key from everything that changes the synthesized audio
+
+        Args:
+            text (str): Text to speak (normalized before hashing)
+            voice (str): Voice name or id
+            engine (str): Synthesis engine ("piper", "pyttsx3", ...)
+            **params: Synthesis parameters (rate, volume, length scale, ...)
+
+        Returns:
+            str: Hex digest identifying the entry
+        """
+        payload = json.dumps({
+            "text": normalize_text(text),
+            "voice": voice,
+            "engine": engine,
+            "params": params,
+            "version": CACHE_VERSION
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key, output_file):
+        """
+        Copy a cached entry to output_file
+
+        Args:
+            key (str): Key from make_key()
+            output_file (str): Where the caller expects the audio
+
+        Returns:
+            dict: Stored metadata (duration, sample_rate, ...) or None on a miss
+        """
+        audio_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)["metadata"]
+            _copy(audio_path, output_file)
+        except (OSError, ValueError, KeyError, TypeError):
+            self._count("misses")
+            return None
+
+        self._write_record(meta_path, metadata)
+        self._count("hits")
+        return metadata
+
+    def put(self, key, audio_file, metadata=None):
+        """Store audio_file (and its metadata) under key, evicting old entries if over the bound"""
+        audio_path, meta_path = self._paths(key)
+        temp_audio = f"{audio_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            _copy(audio_file, temp_audio)
+            previous = os.path.getsize(audio_path) if os.path.exists(audio_path) else 0
+            os.replace(temp_audio, audio_path)
+            size = os.path.getsize(audio_path)
+        except OSError as e:
+            print(f"Error writing TTS cache entry: {e}", file=sys.stderr)
+            if os.path.exists(temp_audio):
+                os.remove(temp_audio)
+            return
+        self._write_record(meta_path, metadata or {})
+
+        with self.lock:
+            self.size_bytes += size - previous
+            over_budget = self.size_bytes > self.max_size_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits its size bound"""
+        entries = sorted(self._entries(with_last_used=True), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            try:
+                os.remove(os.path.splitext(path)[0] + ".json")
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+
+        with self.lock:
+            self.size_bytes = total
+            self.evictions += evicted
+        self._record(evictions=evicted)
+
+    def clear(self):
+        """Remove every cache entry"""
+        for path, _, _ in self._entries():
+            for entry_path in (path, os.path.splitext(path)[0] + ".json"):
+                try:
+                    os.remove(entry_path)
+                except OSError:
+                    pass
+        with self.lock:
+            self.size_bytes = 0
+
+    def stats(self):
+        """Hit/miss counters of this process, totals across processes and current size"""
+        totals = self._load_totals()
+        lookups = totals["hits"] + totals["misses"]
+        with self.lock:
+            process_lookups = self.hits + self.misses
+            return {
+                "cache_dir": self.cache_dir,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / process_lookups, 3) if process_lookups else None,
+                "evictions": self.evictions,
+                "total_hits": totals["hits"],
+                "total_misses": totals["misses"],
+                "total_hit_rate": round(totals["hits"] / lookups, 3) if lookups else None,
+                "size_mb": round(self.size_bytes / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2)
+            }
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        self._record(**{counter: 1})
+
+    def _record(self, **increments):
+        """
+        Add to the counters kept in the cache directory
+
+        The TTS scripts mostly run as one-shot processes, so hit rates are only meaningful
+        summed across runs. Concurrent updates may occasionally lose an increment.
+        """
+        if not any(increments.values()):
+            return
+        totals = self._load_totals()
+        for name, value in increments.items():
+            totals[name] = totals.get(name, 0) + value
+        path = os.path.join(self.cache_dir, STATS_FILE)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(totals, f)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _load_totals(self):
+        totals = {"hits": 0, "misses": 0, "evictions": 0}
+        try:
+            with open(os.path.join(self.cache_dir, STATS_FILE), "r", encoding="utf-8") as f:
+                totals.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return totals
+
+    def _write_record(self, meta_path, metadata):
+        """Write an entry's metadata with the current time as its last use"""
+        temp_path = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"metadata": metadata, "last_used": time.time()}, f, ensure_ascii=False)
+            os.replace(temp_path, meta_path)
+        except OSError as e:
+            print(f"Error writing TTS cache entry: {e}", file=sys.stderr)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.wav", f"{base}.json"
+
+    def _entries(self, with_last_used=False):
+        """
+        (audio path, size, last_used) for every entry on disk
+
+        last_used is read from the entry records only when with_last_used is set (0 for
+        entries without a readable record, so they are evicted first).
+        """
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".wav"):
+                        try:
+                            size = entry.stat().st_size
+                        except OSError:
+                            continue
+                        last_used = _last_used(os.path.splitext(entry.path)[0] + ".json") if with_last_used else 0
+                        entries.append((entry.path, size, last_used))
+        except OSError:
+            pass
+        return entries
+
+def _last_used(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return float(json.load(f).get("last_used", 0))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return 0
+
+def _copy(source, destination):
+    """Copy source to a fresh destination file, never writing through an existing link"""
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    if os.path.exists(destination):
+        os.remove(destination)
+    shutil.copyfile(source, destination)
+
+def open_tts_cache(cache_dir=None, max_size_mb=None):
+    """
+    Open the shared TTS cache
+
+    Returns None when TTS_NO_CACHE is set. The size bound defaults to $TTS_CACHE_MAX_MB.
+
+    Returns:
+        TTSCache: The cache, or None if caching is disabled
+    """
+    if os.environ.get("TTS_NO_CACHE", "").lower() in ("1", "true", "yes"):
+        return None
+    if max_size_mb is None:
+        max_size_mb = float(os.environ.get("TTS_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB))
+    try:
+        return TTSCache(cache_dir, max_size_mb)
+    except OSError as e:
+        print(f"TTS cache disabled: {e}", file=sys.stderr)
+        return None
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = TTSCache()
+    if command == "clear":
+        cache.clear()
+        print(json.dumps({"success": True, "cache_dir": cache.cache_dir}))
+    elif command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    else:
+        print("Usage: python tts_cache.py [stats|clear]")
+        sys.exit(1)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Unified TTS facade
+Holds Piper, pyttsx3, Windows SAPI and eSpeak behind one interface, tries them in a
+configurable fallback chain in-process and routes new requests away from engines that
+are failing or too slow
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import threading
+import importlib.util
+from abc import ABC, abstractmethod
+from collections import deque
+
+DEFAULT_CHAIN = ["piper", "pyttsx3", "sapi", "espeak"]
+# Health is judged over the most recent requests of each engine
+HEALTH_WINDOW = 20
+MIN_SAMPLES = 3
+MAX_ERROR_RATE = 0.5
+# Synthesis slower than this (seconds per character of text) counts as too slow
+MAX_SECONDS_PER_CHAR = 0.05
+# Fixed per-call overhead dominates short texts, so they say nothing about speed
+MIN_LATENCY_CHARS = 40
+# Latency alone demotes an engine only after this many timed requests
+MIN_LATENCY_SAMPLES = 3
+# A demoted engine is retried with one live request after this many seconds
+COOLDOWN_SECONDS = 60
+LATENCY_SMOOTHING = 0.3
+
+PIPER_VOICE_PATTERN = re.compile(r"^([a-z]{2,3})_[A-Z]{2}-")
+
+def voice_language(voice):
+    """Language code of a Piper-style voice name (fa_IR-amir-medium -> fa), defaulting to en"""
+    match = PIPER_VOICE_PATTERN.match(voice or "")
+    return match.group(1) if match else "en"
+
+class Backend(ABC):
+    """Common interface of a TTS engine: availability check plus synthesize()"""
+
+    name = None
+    label = None
+
+    def available(self):
+        return True
+
+    @abstractmethod
+    def synthesize(self, text, voice, output_dir, output_file=None):
+        """
+        Synthesize text to a WAV file
+
+        Returns:
+            dict: Result in the shape of piper_tts.generate_speech (success, audio_file,
+                duration, sample_rate, ...) or {"success": False, "error": ...}
+        """
+
+class PiperBackend(Backend):
+    name = "piper"
+    label = "Piper TTS"
+
+    def available(self):
+        return importlib.util.find_spec("piper") is not None
+
+    def synthesize(self, text, voice, output_dir, output_file=None):
+        import piper_tts
+        if not PIPER_VOICE_PATTERN.match(voice or ""):
+            voice = piper_tts.DEFAULT_VOICE
+        return piper_tts.generate_speech(text, voice, output_file=output_file, data_dir=output_dir)
+
+class Pyttsx3Backend(Backend):
+    name = "pyttsx3"
+    label = "pyttsx3 TTS"
+
+    def available(self):
+        return importlib.util.find_spec("pyttsx3") is not None
+
+    def synthesize(self, text, voice, output_dir, output_file=None):
+        import pyttsx3_tts
+        return pyttsx3_tts.generate_speech(text, voice, output_dir, output_file=output_file)
+
+class SapiBackend(Backend):
+    name = "sapi"
+    label = "Windows SAPI"
+
+    def available(self):
+        return sys.platform == "win32"
+
+    def synthesize(self, text, voice, output_dir, output_file=None):
+        import real_tts
+        return real_tts.generate_speech(text, voice, output_dir, output_file=output_file, engines=("sapi",))
+
+class EspeakBackend(Backend):
+    name = "espeak"
+    label = "eSpeak"
+
+    def available(self):
+        return shutil.which("espeak") is not None
+
+    def synthesize(self, text, voice, output_dir, output_file=None):
+        import real_tts
+        return real_tts.generate_speech(text, voice, output_dir, output_file=output_file, engines=("espeak",),
+                                        language=voice_language(voice))
+
+BACKENDS = {backend.name: backend for backend in (PiperBackend, Pyttsx3Backend, SapiBackend, EspeakBackend)}
+
+class BackendHealth:
+    """Recent outcomes and smoothed latency of one engine"""
+
+    def __init__(self, window=HEALTH_WINDOW):
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.seconds_per_char = None
+        self.latency_samples = 0
+        self.last_latency = None
+        self.demoted_at = None
+        self.probing = False
+
+    def record(self, ok, seconds, characters):
+        """
+        Args:
+            ok (bool): Whether the request succeeded
+            seconds (float): Synthesis time, excluding voice/driver loading
+            characters (int): Length of the synthesized text
+        """
+        self.requests += 1
+        self.last_latency = seconds
+        self.outcomes.append(ok)
+        if not ok:
+            self.errors += 1
+            return
+        if characters < MIN_LATENCY_CHARS:
+            return
+        self.latency_samples += 1
+        per_char = seconds / characters
+        if self.seconds_per_char is None:
+            self.seconds_per_char = per_char
+        else:
+            self.seconds_per_char += LATENCY_SMOOTHING * (per_char - self.seconds_per_char)
+
+    def error_rate(self):
+        if not self.outcomes:
+            return None
+        return 1.0 - sum(self.outcomes) / float(len(self.outcomes))
+
+class TTSRouter:
+    """
+    Fallback chain over TTS backends with latency- and error-aware ordering.
+
+    Engines are tried in chain order. An engine whose recent error rate exceeds
+    max_error_rate, or whose smoothed latency exceeds max_seconds_per_char, is demoted
+    behind the healthy ones; after cooldown seconds it gets one live request, and a
+    success restores it.
+    """
+
+    def __init__(self, chain=None, max_error_rate=MAX_ERROR_RATE, max_seconds_per_char=MAX_SECONDS_PER_CHAR,
+                 cooldown=COOLDOWN_SECONDS, window=HEALTH_WINDOW):
+        """
+        Args:
+            chain (list): Backend names in order of preference (default: piper, pyttsx3, sapi, espeak)
+            max_error_rate (float): Error rate over the window above which an engine is demoted
+            max_seconds_per_char (float): Smoothed latency above which an engine is demoted, once
+                MIN_LATENCY_SAMPLES requests of at least MIN_LATENCY_CHARS characters were timed
+            cooldown (float): Seconds before a demoted engine is probed again
+            window (int): Number of recent requests used to judge an engine
+        """
+        chain = chain or DEFAULT_CHAIN
+        unknown = [name for name in chain if name not in BACKENDS]
+        if unknown:
+            raise ValueError(f"Unknown TTS engines: {', '.join(unknown)}")
+
+        self.chain = list(chain)
+        self.backends = {name: BACKENDS[name]() for name in self.chain}
+        self.health = {name: BackendHealth(window) for name in self.chain}
+        self.max_error_rate = max_error_rate
+        self.max_seconds_per_char = max_seconds_per_char
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self._available = {}
+
+    def order(self):
+        """Available engines in the order the next request should try them"""
+        now = time.time()
+        preferred, demoted = [], []
+        with self.lock:
+            for name in self.chain:
+                if not self._is_available(name):
+                    continue
+                health = self.health[name]
+                if not self._degraded(health):
+                    health.demoted_at = None
+                    preferred.append(name)
+                elif health.demoted_at is None:
+                    health.demoted_at = now
+                    demoted.append(name)
+                elif now - health.demoted_at >= self.cooldown:
+                    # Half-open: let one request through to see whether the engine recovered
+                    health.probing = True
+                    health.demoted_at = now
+                    preferred.append(name)
+                else:
+                    demoted.append(name)
+        return preferred + demoted
+
+    def synthesize(self, text, voice, output_dir, output_file=None):
+        """
+        Synthesize with the best available engine, falling back along the chain
+
+        Args:
+            text: Text to convert to speech
+            voice: Voice name (Piper voice names also select the eSpeak language)
+            output_dir: Directory for the generated file
+            output_file: Output file path (if None, the engine picks a unique name)
+
+        Returns:
+            dict: The successful engine's result plus "engine_key" and "attempts",
+                or an error listing every attempt
+        """
+        if not text or not text.strip():
+            return {"success": False, "error": "متن مورد نیاز است"}
+
+        attempts = []
+        for name in self.order():
+            started = time.perf_counter()
+            try:
+                result = self.backends[name].synthesize(text, voice, output_dir, output_file)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            elapsed = time.perf_counter() - started
+            ok = bool(result.get("success"))
+            # Cache hits say nothing about the engine's speed, and loading a voice is a one-off cost
+            if not result.get("cached"):
+                self._record(name, ok, max(0.0, elapsed - (result.get("load_time") or 0.0)), len(text))
+
+            attempts.append({"engine": name, "success": ok, "seconds": round(elapsed, 3),
+                             "error": None if ok else result.get("error")})
+            if ok:
+                result["engine_key"] = name
+                result["attempts"] = attempts
+                return result
+            print(f"TTS engine {name} failed: {result.get('error')}", file=sys.stderr)
+
+        return {
+            "success": False,
+            "error": "Failed to generate speech with any TTS engine",
+            "attempts": attempts
+        }
+
+    def stats(self):
+        """Per-engine availability, error rate, latency and routing state"""
+        with self.lock:
+            engines = []
+            for name in self.chain:
+                health = self.health[name]
+                error_rate = health.error_rate()
+                engines.append({
+                    "engine": name,
+                    "available": self._is_available(name),
+                    "requests": health.requests,
+                    "errors": health.errors,
+                    "error_rate": round(error_rate, 3) if error_rate is not None else None,
+                    "seconds_per_char": round(health.seconds_per_char, 5) if health.seconds_per_char else None,
+                    "last_latency": round(health.last_latency, 3) if health.last_latency is not None else None,
+                    "demoted": health.demoted_at is not None
+                })
+        return {"chain": self.chain, "engines": engines}
+
+    def _record(self, name, ok, seconds, characters):
+        with self.lock:
+            health = self.health[name]
+            if health.probing and ok:
+                # The engine recovered; judge it on fresh requests only, so one slow probe
+                # cannot demote it again
+                health.outcomes.clear()
+                health.seconds_per_char = None
+                health.latency_samples = 0
+                health.demoted_at = None
+            health.probing = False
+            health.record(ok, seconds, characters)
+
+    def _degraded(self, health):
+        if len(health.outcomes) >= MIN_SAMPLES and health.error_rate() > self.max_error_rate:
+            return True
+        return (health.latency_samples >= MIN_LATENCY_SAMPLES
+                and health.seconds_per_char > self.max_seconds_per_char)
+
+    def _is_available(self, name):
+        if name not in self._available:
+            self._available[name] = self.backends[name].available()
+        return self._available[name]
+
+def parse_chain(value):
+    """Split a comma-separated engine list ("piper,espeak")"""
+    return [name.strip() for name in value.split(",") if name.strip()] if value else None
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router(chain=None):
+    """Return the process-wide TTSRouter; chain defaults to $TTS_FALLBACK_CHAIN or DEFAULT_CHAIN"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = TTSRouter(chain or parse_chain(os.environ.get("TTS_FALLBACK_CHAIN")))
+        return _router
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Synthesize speech with the first healthy TTS engine")
+    parser.add_argument("text", help="Text to convert to speech")
+    parser.add_argument("voice", nargs="?", default="en_US-kristin-medium", help="Voice name")
+    parser.add_argument("output_dir", nargs="?", default="./uploads/audio", help="Output directory")
+    parser.add_argument("--chain", help=f"Comma-separated engines to try (default: {','.join(DEFAULT_CHAIN)})")
+    args = parser.parse_args()
+
+    # Keep stdout for the JSON result
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        router = get_router(parse_chain(args.chain))
+    except ValueError as e:
+        parser.error(str(e))
+    result = router.synthesize(args.text, args.voice, os.path.abspath(args.output_dir))
+    protocol_out.write(json.dumps(result, ensure_ascii=True) + "\n")
+    if not result.get("success"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Subtitles from TTS synthesis timings
+Turns the per-sentence audio offsets and phoneme alignments reported by the Piper engine
+into Whisper-shaped segments with word timings, so narration we synthesize ourselves can
+be subtitled without transcribing it again
+"""
+
+import os
+import sys
+import json
+
+import subtitle_writer
+
+# Phonemes that do not belong to any word: eSpeak punctuation plus Piper's pad/BOS/EOS symbols
+NON_WORD_PHONEMES = set(".,;:!?¡¿—…\"«»“”()-_^$")
+WORD_SEPARATOR = " "
+
+def proportional_word_timings(text, start, duration):
+    """
+    Spread a sentence's duration over its words by character count
+
+    Args:
+        text (str): Sentence text
+        start (float): Sentence offset in the audio (seconds)
+        duration (float): Sentence duration (seconds)
+
+    Returns:
+        list: Word timings ({'word', 'start', 'end'})
+    """
+    words = text.split()
+    total = sum(len(word) for word in words)
+    timings = []
+    position = 0
+    for word in words:
+        word_start = start + duration * position / total
+        position += len(word)
+        timings.append({
+            'word': word,
+            'start': round(word_start, 3),
+            'end': round(start + duration * position / total, 3)
+        })
+    return timings
+
+def aligned_word_timings(text, alignments, sample_rate, start):
+    """
+    Word timings from Piper phoneme alignments
+
+    eSpeak separates words with a space phoneme, so the phonemes between two spaces are
+    one word. Punctuation-only words (a dash between words) are not spoken; they get a
+    zero-length timing at the end of the previous word. Numbers and abbreviations can
+    phonemize into a different word count than the text has; those sentences return None
+    and fall back to proportional timings.
+
+    Args:
+        text (str): Sentence text
+        alignments (list): (phoneme, num_samples) pairs covering the sentence audio
+        sample_rate (int): Sample rate of the audio
+        start (float): Sentence offset in the audio (seconds)
+
+    Returns:
+        list: Word timings ({'word', 'start', 'end'}), or None if words cannot be matched
+    """
+    spans = []
+    word_start = word_end = None
+    position = 0
+    for phoneme, num_samples in alignments:
+        if phoneme == WORD_SEPARATOR:
+            if word_start is not None:
+                spans.append((word_start, word_end))
+                word_start = None
+        elif phoneme not in NON_WORD_PHONEMES:
+            if word_start is None:
+                word_start = position
+            # Pauses for punctuation after the last spoken phoneme are not part of the word
+            word_end = position + num_samples
+        position += num_samples
+    if word_start is not None:
+        spans.append((word_start, word_end))
+
+    words = text.split()
+    spoken = [index for index, word in enumerate(words) if any(char.isalnum() for char in word)]
+    if not spoken or len(spans) != len(spoken):
+        return None
+
+    word_spans = dict(zip(spoken, spans))
+    timings = []
+    previous_end = spans[0][0]
+    for index, word in enumerate(words):
+        span_start, span_end = word_spans.get(index, (previous_end, previous_end))
+        previous_end = span_end
+        timings.append({
+            'word': word,
+            'start': round(start + span_start / float(sample_rate), 3),
+            'end': round(start + span_end / float(sample_rate), 3)
+        })
+    return timings
+
+def estimate_timings(sentences, duration):
+    """
+    Sentence map with proportional word timings for audio without engine timings
+
+    Used when speech came from the `python -m piper` subprocess or another engine.
+    The duration is split between sentences by character count (evenly if they are all empty).
+
+    Args:
+        sentences (list): Sentence texts, in order
+        duration (float): Audio duration (seconds)
+
+    Returns:
+        list: Sentences ({'index', 'text', 'offset', 'duration', 'words', 'timing'})
+    """
+    weights = [len(sentence) for sentence in sentences]
+    if not any(weights):
+        weights = [1] * len(sentences)
+    total = sum(weights)
+    result = []
+    offset = 0.0
+    for index, sentence in enumerate(sentences):
+        sentence_duration = duration * weights[index] / total
+        result.append({
+            'index': index,
+            'text': sentence,
+            'offset': round(offset, 3),
+            'duration': round(sentence_duration, 3),
+            'words': proportional_word_timings(sentence, offset, sentence_duration),
+            'timing': 'estimated'
+        })
+        offset += sentence_duration
+    return result
+
+def speech_segments(sentences):
+    """
+    Whisper-shaped segments from a synthesis sentence map
+
+    Args:
+        sentences (list): Sentences as returned by piper_tts.generate_speech(timings=True)
+
+    Returns:
+        list: Segments with start, end, text and words, as TinyWhisper.transcribe(timestamps='word')
+    """
+    segments = []
+    for sentence in sentences:
+        words = sentence.get('words') or []
+        segments.append({
+            'start': round(sentence['offset'], 3),
+            'end': round(sentence['offset'] + sentence['duration'], 3),
+            'text': sentence['text'],
+            'words': [{'word': word['word'], 'start': word['start'], 'end': word['end']} for word in words]
+        })
+    return segments
+
+def captions_from_speech(result, words_per_caption=None):
+    """Captions for a generate_speech(timings=True) result, optionally regrouped by word count"""
+    segments = speech_segments(result.get('sentences') or [])
+    if words_per_caption:
+        return subtitle_writer.chunk_words(segments, words_per_caption)
+    return segments
+
+def generate_subtitles(result, subtitle_format='srt', words_per_caption=None):
+    """
+    Render subtitles for synthesized speech
+
+    Args:
+        result (dict): piper_tts.generate_speech(..., timings=True) result
+        subtitle_format (str): Subtitle format ('srt', 'vtt', 'ass', 'jsonl')
+        words_per_caption (int): Build captions of this many words instead of one per sentence
+
+    Returns:
+        dict: Subtitle result with content and format, as TinyWhisper.generate_subtitles
+    """
+    if not result.get('success'):
+        return result
+    if not result.get('sentences'):
+        return {'success': False, 'error': 'Speech result has no timings (synthesize with timings=True)'}
+    if subtitle_format.lower() not in subtitle_writer.WRITERS:
+        return {'success': False, 'error': f"Unsupported subtitle format: {subtitle_format}"}
+
+    captions = captions_from_speech(result, words_per_caption)
+    return {
+        'success': True,
+        'format': subtitle_format,
+        'content': subtitle_writer.render(captions, subtitle_format.lower()),
+        'segments_count': len(captions),
+        'language': result.get('language'),
+        'timing_source': result.get('timing_source')
+    }
+
+def export_subtitles(result, outputs, words_per_caption=None):
+    """
+    Write several subtitle formats for synthesized speech
+
+    Args:
+        result (dict): piper_tts.generate_speech(..., timings=True) result
+        outputs (dict): Mapping of format ('srt', 'vtt', 'ass', 'jsonl') to output path
+        words_per_caption (int): Build captions of this many words instead of one per sentence
+
+    Returns:
+        dict: Result with the written paths per format
+    """
+    if not result.get('success'):
+        return result
+    if not result.get('sentences'):
+        return {'success': False, 'error': 'Speech result has no timings (synthesize with timings=True)'}
+
+    try:
+        captions = captions_from_speech(result, words_per_caption)
+        written = subtitle_writer.write_subtitles(captions, outputs)
+    except (OSError, ValueError) as e:
+        print(f"Error exporting subtitles: {e}", file=sys.stderr)
+        return {'success': False, 'error': str(e)}
+    return {
+        'success': True,
+        'outputs': written,
+        'segments_count': len(captions),
+        'timing_source': result.get('timing_source')
+    }
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Synthesize speech with Piper and write subtitles from its timings")
+    parser.add_argument("text", help="Text to speak")
+    parser.add_argument("--voice", default="en_US-kristin-medium", help="Piper voice name")
+    parser.add_argument("--output-dir", default=".", help="Directory for the audio and subtitle files")
+    parser.add_argument("--formats", default="srt", help="Comma-separated subtitle formats (srt, vtt, ass, jsonl)")
+    parser.add_argument("--words-per-caption", type=int, help="Words per caption (default: one caption per sentence)")
+    args = parser.parse_args()
+
+    formats = [fmt.strip().lower() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in subtitle_writer.SUBTITLE_FORMATS]
+    if unknown:
+        parser.error(f"Unsupported subtitle format: {', '.join(unknown)}")
+
+    # Keep stdout for the JSON result
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    import piper_tts
+    speech = piper_tts.generate_speech(args.text, args.voice, data_dir=args.output_dir, timings=True)
+    if speech.get("success"):
+        stem = os.path.splitext(speech["audio_file"])[0]
+        speech["subtitles"] = export_subtitles(
+            speech, {fmt: f"{stem}.{fmt}" for fmt in formats}, args.words_per_caption
+        )
+    protocol_out.write(json.dumps(speech, ensure_ascii=False) + "\n")
+    if not speech.get("success"):
+        sys.exit(1)
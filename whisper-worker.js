@@ -0,0 +1,53 @@
+const path = require('path');
+const { PiperWorkerClient } = require('./piper-worker');
+
+// e.g. WHISPER_MAX_MEMORY_MB=1500 WHISPER_IDLE_TIMEOUT=600 bound the models kept resident
+function whisperArgs() {
+    const args = [];
+    if (process.env.WHISPER_MAX_MEMORY_MB) {
+        args.push('--max-memory-mb', process.env.WHISPER_MAX_MEMORY_MB);
+    }
+    if (process.env.WHISPER_IDLE_TIMEOUT) {
+        args.push('--idle-timeout', process.env.WHISPER_IDLE_TIMEOUT);
+    }
+    return args;
+}
+
+/**
+ * Whisper Worker Client
+ * پروسه‌ی دائمی tiny_whisper.py --serve که مدل‌های Whisper را بین درخواست‌ها در حافظه نگه می‌دارد
+ * تا هر رونویسی هزینه‌ی بارگذاری مدل را دوباره نپردازد
+ */
+class WhisperWorkerClient extends PiperWorkerClient {
+    constructor(jobTimeoutMs = 600000) {
+        super(jobTimeoutMs, {
+            script: 'tiny_whisper.py',
+            label: 'Whisper Worker',
+            args: whisperArgs
+        });
+    }
+
+    /**
+     * رونویسی یا ساخت زیرنویس با worker دائمی
+     * @param {String} audioPath - مسیر فایل صوتی
+     * @param {Object} options - {language, model, subtitles, format, timestamps}
+     * @returns {Promise<Object>} همان خروجی JSON اسکریپت tiny_whisper.py
+     */
+    transcribe(audioPath, options = {}) {
+        const { language = 'auto', model = 'tiny', subtitles = false, format = 'json', timestamps = 'segment' } = options;
+        return this.request({
+            audio_file: path.resolve(audioPath),
+            language,
+            model,
+            subtitles,
+            format,
+            timestamps
+        });
+    }
+}
+
+// Singleton instance
+const whisperWorker = new WhisperWorkerClient();
+
+module.exports = whisperWorker;
+module.exports.WhisperWorkerClient = WhisperWorkerClient;